@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from LEXER import LexerError, create_lexer
+import LL1_PARSER as ll1
+from PARSE_TABLES import token_ids
+import SLR1_PARSER as slr1
+import TABLE_CACHE as table_cache
+
+# Parser letter -> (parser name in TABLE_CACHE.GENERATORS, table driver)
+PARSERS = {
+    'T': ("LL(1)", ll1.parse_ids),
+    'B': ("SLR(1)", slr1.parse_ids),
+    'L': ("LALR(1)", slr1.parse_ids),
+    'R': ("LR(1)", slr1.parse_ids),
+}
+
+# Set once per worker process by init_worker
+worker_table = None
+worker_parse = None
+worker_lexer = None
+
+
+def init_worker(table_source, parser_choice, lexer=None):
+    # table_source is (cache file, grammar): every worker maps the file so
+    # they all share one copy of the table, and builds the table from the
+    # grammar if the file is gone or damaged by then. It is the table itself
+    # if it was not cached. Token grammars also ship their lexer
+    global worker_table, worker_parse, worker_lexer
+    name, worker_parse = PARSERS[parser_choice]
+    worker_lexer = lexer
+
+    if isinstance(table_source, tuple):
+        path, grammar_data = table_source
+        cached = table_cache.read_tables(path)
+        if cached is not None and name in cached.tables:
+            table_source = cached.tables[name]
+        else:
+            table_source = table_cache.GENERATORS[name][2](grammar_data)
+    worker_table = table_source
+
+
+def validate_chunk(chunk):
+    terminal_index = worker_table.terminal_index
+    if worker_lexer is None:
+        return [worker_parse(worker_table, token_ids(string, terminal_index)) for string in chunk]
+
+    results = []
+    for string in chunk:
+        try:
+            ids = list(worker_lexer.ids(string, terminal_index))
+        except LexerError:
+            results.append(False)
+            continue
+        results.append(worker_parse(worker_table, ids))
+    return results
+
+
+def read_chunks(lines, chunk_size):
+    strings = (normalize(line) for line in lines)
+    while True:
+        chunk = list(islice(strings, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize(line):
+    string = line.rstrip("\r\n")
+    return "" if string == "/eps" else string
+
+
+def validate_strings(grammar_data, parser_choice, lines, workers=None, chunk_size=10000):
+    # Yields one bool per input line, in input order. The dense table is
+    # loaded (or built) here, and each worker maps the cache file once
+    # through the pool initializer
+    dense_table = table_cache.load_or_build(grammar_data).tables[PARSERS[parser_choice][0]]
+    path = table_cache.cache_path(grammar_data)
+    if os.path.exists(path):
+        grammar = {key: value for key, value in grammar_data.items() if key != 'compiled'}
+        table_source = (path, grammar)
+    else:
+        table_source = dense_table
+    lexer = create_lexer(grammar_data) if 'tokens' in grammar_data else None
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        init_worker(dense_table, parser_choice, lexer)
+        for chunk in read_chunks(lines, chunk_size):
+            yield from validate_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(table_source, parser_choice, lexer)) as pool:
+        # Keep a bounded window of chunks in flight so results stream back
+        # in order without reading the whole input up front
+        pending = deque()
+        for chunk in read_chunks(lines, chunk_size):
+            pending.append(pool.submit(validate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    import main as menu
+
+    parser = argparse.ArgumentParser(
+        description="Validate many strings against one grammar from grammars.txt.")
+    parser.add_argument("grammar", type=int, help="grammar number, as listed by main.py")
+    parser.add_argument("parser", choices=sorted(PARSERS),
+                        help="T: LL(1), B: SLR(1), L: LALR(1), R: LR(1)")
+    parser.add_argument("input", nargs="?", help="file with one string per line (default: stdin)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="strings sent to a worker at a time")
+    args = parser.parse_args(argv)
+
+    menu.read_grammars()
+    if not 1 <= args.grammar <= len(menu.grammars):
+        parser.error(f"grammar must be between 1 and {len(menu.grammars)}")
+
+    grammar_data = menu.grammars[args.grammar - 1]
+    name = PARSERS[args.parser][0]
+    if not table_cache.load_or_build(grammar_data).valid[name]:
+        parser.error(f"grammar {args.grammar} is not {name}")
+
+    lines = open(args.input, 'r') if args.input else sys.stdin
+    try:
+        output = sys.stdout
+        for accepted in validate_strings(grammar_data, args.parser, lines,
+                                         args.workers, args.chunk_size):
+            output.write("yes\n" if accepted else "no\n")
+    finally:
+        if args.input:
+            lines.close()
+
+
+if __name__ == "__main__":
+    main()
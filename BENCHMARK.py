@@ -0,0 +1,702 @@
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from tabulate import tabulate
+
+import CODEGEN as codegen
+import EARLEY_PARSER as earley
+import GLR_PARSER as glr
+import LALR1_PARSER as lalr1
+import LL1_PARSER as ll1
+import LR1_PARSER as lr1
+import SLR1_PARSER as slr1
+from COMPILED_GRAMMAR import compile_grammar
+from FIRST_FOLLOW import (compute_first_masks, compute_first_sets,
+                          compute_first_sets_fixpoint, compute_follow_masks,
+                          compute_follow_sets, compute_follow_sets_fixpoint,
+                          intern_terminals, strongly_connected_components)
+from SYNTAX_TREE import SyntaxTree
+
+# Synthetic grammars need more symbols than ASCII offers, so non-terminals
+# and terminals are drawn from two disjoint Unicode blocks
+NON_TERMINAL_BASE = 0x4E00
+TERMINAL_BASE = 0xAC00
+
+
+def make_grammar_data(grammar):
+    non_terminals = set(grammar)
+    symbols = set()
+
+    for productions in grammar.values():
+        for production in productions:
+            for symbol in production:
+                symbols.add(symbol)
+
+    return {
+        'grammar': grammar,
+        'terminals': symbols - non_terminals,
+        'non_terminals': non_terminals
+    }
+
+
+def expression_grammar(levels):
+    non_terminals = [chr(NON_TERMINAL_BASE + i) for i in range(levels)]
+    operators = [chr(TERMINAL_BASE + i) for i in range(levels)]
+
+    grammar = {}
+    for i in range(levels - 1):
+        nt, next_nt = non_terminals[i], non_terminals[i + 1]
+        grammar[nt] = [nt + operators[i] + next_nt, next_nt]
+
+    grammar[non_terminals[-1]] = ['(' + non_terminals[0] + ')', 'i']
+
+    return make_grammar_data(grammar)
+
+
+def ll_expression_grammar(levels):
+    # expression_grammar(levels) with the left recursion removed:
+    # E -> T R, R -> + T R | ε at every level
+    non_terminals = [chr(NON_TERMINAL_BASE + i) for i in range(levels)]
+    rests = [chr(NON_TERMINAL_BASE + levels + i) for i in range(levels - 1)]
+    operators = [chr(TERMINAL_BASE + i) for i in range(levels)]
+
+    grammar = {}
+    for i in range(levels - 1):
+        nt, next_nt, rest = non_terminals[i], non_terminals[i + 1], rests[i]
+        grammar[nt] = [next_nt + rest]
+        grammar[rest] = [operators[i] + next_nt + rest, 'ε']
+
+    grammar[non_terminals[-1]] = ['(' + non_terminals[0] + ')', 'i']
+
+    return make_grammar_data(grammar)
+
+
+def expression_input(levels, operands, seed=0):
+    # A sentence of both expression grammars with about this many operands
+    rng = random.Random(seed)
+    operators = [chr(TERMINAL_BASE + i) for i in range(levels - 1)]
+    parts = []
+    depth = 0
+
+    for i in range(operands):
+        if i:
+            parts.append(rng.choice(operators))
+        while depth < 20 and rng.random() < 0.2:
+            parts.append('(')
+            depth += 1
+        parts.append('i')
+        while depth and rng.random() < 0.2:
+            parts.append(')')
+            depth -= 1
+
+    parts.append(')' * depth)
+    return ''.join(parts)
+
+
+def random_grammar(num_non_terminals, num_terminals, alternatives=3,
+                   max_length=4, epsilon_rate=0.1, seed=0):
+    rng = random.Random(seed)
+    non_terminals = [chr(NON_TERMINAL_BASE + i) for i in range(num_non_terminals)]
+    terminals = [chr(TERMINAL_BASE + i) for i in range(num_terminals)]
+    symbols = non_terminals + terminals
+
+    grammar = {}
+    for nt in non_terminals:
+        productions = []
+        for _ in range(alternatives):
+            if rng.random() < epsilon_rate:
+                production = 'ε'
+            else:
+                length = rng.randint(1, max_length)
+                production = ''.join(rng.choice(symbols) for _ in range(length))
+            if production not in productions:
+                productions.append(production)
+        grammar[nt] = productions
+
+    return make_grammar_data(grammar)
+
+
+def ll1_grammar(num_non_terminals, num_terminals, alternatives=3, max_length=4, seed=0):
+    # A random simple grammar: the alternatives of each non-terminal start
+    # with distinct terminals and none is ε, so it is LL(1) whatever follows
+    # them. The first alternative is all terminals, so that every
+    # non-terminal derives some string
+    rng = random.Random(seed)
+    non_terminals = [chr(NON_TERMINAL_BASE + i) for i in range(num_non_terminals)]
+    terminals = [chr(TERMINAL_BASE + i) for i in range(max(num_terminals, alternatives))]
+    symbols = non_terminals + terminals
+
+    grammar = {}
+    for nt in non_terminals:
+        productions = []
+        for i, first in enumerate(rng.sample(terminals, alternatives)):
+            pool = terminals if i == 0 else symbols
+            length = rng.randint(0, max_length - 1)
+            productions.append(first + ''.join(rng.choice(pool) for _ in range(length)))
+        grammar[nt] = productions
+
+    return make_grammar_data(grammar)
+
+
+def slr1_grammar(num_non_terminals, num_terminals, alternatives=3, max_length=4, seed=0):
+    # A random grammar whose productions open and close with terminals of
+    # their own, and the last alternative of each non-terminal is left
+    # recursive, so it is not LL(1). A state is only entered on the closing
+    # terminal of a production from that production's item, so every
+    # complete item is alone in its state and the grammar is SLR(1)
+    rng = random.Random(seed)
+    non_terminals = [chr(NON_TERMINAL_BASE + i) for i in range(num_non_terminals)]
+    terminals = [chr(TERMINAL_BASE + i) for i in range(num_terminals)]
+    symbols = non_terminals + terminals
+    brackets = iter(chr(TERMINAL_BASE + num_terminals + i)
+                    for i in range(2 * num_non_terminals * alternatives))
+
+    grammar = {}
+    for nt in non_terminals:
+        productions = []
+        for i in range(alternatives):
+            pool = terminals if i == 0 else symbols
+            length = rng.randint(0, max_length - 2)
+            body = ''.join(rng.choice(pool) for _ in range(length))
+            production = next(brackets) + body + next(brackets)
+            if i and i == alternatives - 1:
+                production = nt + production
+            productions.append(production)
+        grammar[nt] = productions
+
+    return make_grammar_data(grammar)
+
+
+def shortest_derivations(grammar_data):
+    # Length of the shortest string each non-terminal derives and the
+    # alternative that starts it (Knuth's generalization of Dijkstra's
+    # algorithm). That alternative only refers to non-terminals settled
+    # before, so always expanding it terminates. Non-productive
+    # non-terminals are left out
+    grammar = grammar_data['grammar']
+    non_terminals = grammar_data['non_terminals']
+
+    shortest = {}
+    best = {}
+    waiting = {}
+    unsettled = []
+    heap = []
+
+    for nt, productions in grammar.items():
+        for production in productions:
+            symbols = [] if production == 'ε' else [s for s in production if s in non_terminals]
+            index = len(unsettled)
+            unsettled.append(len(symbols))
+            for symbol in symbols:
+                waiting.setdefault(symbol, []).append((nt, production, index))
+            if not symbols:
+                heapq.heappush(heap, (0 if production == 'ε' else len(production), nt, index, production))
+
+    while heap:
+        length, nt, _, production = heapq.heappop(heap)
+        if nt in shortest:
+            continue
+        shortest[nt] = length
+        best[nt] = production
+
+        for left, production, index in waiting.get(nt, ()):
+            unsettled[index] -= 1
+            if not unsettled[index] and left not in shortest:
+                heapq.heappush(heap, (sum(shortest.get(s, 1) for s in production), left, index, production))
+
+    return shortest, best
+
+
+def unbounded_non_terminals(grammar, shortest):
+    # The productive non-terminals that derive strings of any length: those
+    # on a cycle of productive alternatives and those that reach one
+    relation = {nt: {s for production in grammar[nt] if production != 'ε'
+                     and all(s in shortest or s not in grammar for s in production)
+                     for s in production if s in grammar}
+                for nt in shortest}
+
+    unbounded = set()
+    # Components come out before any component that reaches them
+    for component in strongly_connected_components(list(shortest), relation):
+        successors = set().union(*(relation[nt] for nt in component))
+        if len(component) > 1 or component[0] in successors or successors & unbounded:
+            unbounded.update(component)
+    return unbounded
+
+
+def random_sentence(grammar_data, length, seed=0):
+    # A sentence of at most length tokens (or the shortest one, if that is
+    # longer) made by a random leftmost derivation. Each alternative is
+    # picked among those that still fit in length once every pending
+    # non-terminal gets its shortest string. While there is room, the last
+    # pending non-terminal that derives strings of any length picks an
+    # alternative with another one, so the sentence ends close to length
+    # whenever the grammar has long sentences
+    rng = random.Random(seed)
+    grammar = grammar_data['grammar']
+    shortest, best = shortest_derivations(grammar_data)
+    start_symbol = next(iter(grammar))
+    if start_symbol not in shortest:
+        raise ValueError("The start symbol derives no string")
+    unbounded = unbounded_non_terminals(grammar, shortest)
+
+    def cost(production):
+        return 0 if production == 'ε' else sum(shortest.get(s, 1) for s in production)
+
+    def growing(production):
+        return 0 if production == 'ε' else sum(s in unbounded for s in production)
+
+    choices = {nt: [(production, cost(production) - shortest[nt], growing(production))
+                    for production in grammar[nt]
+                    if production == 'ε' or all(s in shortest or s not in grammar for s in production)]
+               for nt in shortest}
+
+    sentence = []
+    stack = [start_symbol]
+    pending = shortest[start_symbol]
+    alive = growing((start_symbol,))
+    # Unit and ε cycles can expand without growing; past this many steps
+    # only the shortest alternatives are taken
+    steps = 8 * length + 100
+
+    while stack:
+        symbol = stack.pop()
+        if symbol not in grammar:
+            sentence.append(symbol)
+            pending -= 1
+            continue
+
+        alive -= symbol in unbounded
+        room = length - len(sentence) - pending
+        steps -= 1
+        if steps > 0 and room > 0:
+            fitting = [(production, count) for production, extra, count in choices[symbol] if extra <= room]
+            if not alive:
+                fitting = [choice for choice in fitting if choice[1]] or fitting
+            production = rng.choice(fitting)[0]
+        else:
+            production = best[symbol]
+
+        alive += growing(production)
+        pending += cost(production) - shortest[symbol]
+        if production != 'ε':
+            stack.extend(reversed(production))
+
+    return sentence
+
+
+def invalid_sentence(grammar_data, length, errors=1, seed=0):
+    # random_sentence with errors tokens replaced, deleted or inserted,
+    # retried until the Earley parser (which takes any grammar) rejects it
+    rng = random.Random(seed)
+    terminals = sorted(grammar_data['terminals'] - {'ε'})
+
+    for attempt in range(100):
+        sentence = random_sentence(grammar_data, length, seed + attempt)
+        for _ in range(errors):
+            position = rng.randrange(len(sentence) + 1)
+            edit = rng.choice(('replace', 'delete', 'insert') if position < len(sentence) else ('insert',))
+            if edit == 'replace':
+                sentence[position] = rng.choice(terminals)
+            elif edit == 'delete':
+                del sentence[position]
+            else:
+                sentence.insert(position, rng.choice(terminals))
+
+        if not earley.parse(grammar_data, sentence):
+            return sentence
+
+    raise ValueError("No invalid sentence found")
+
+
+def fresh(grammar_data):
+    # A copy without the cached CompiledGrammar, so every timing starts cold
+    return {key: grammar_data[key] for key in ('grammar', 'terminals', 'non_terminals')}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_first_follow(grammars):
+    table = []
+
+    for name, grammar_data in grammars:
+        old_first, old_first_time = timed(compute_first_sets_fixpoint, grammar_data)
+        new_first, new_first_time = timed(compute_first_sets, grammar_data)
+        old_follow, old_follow_time = timed(compute_follow_sets_fixpoint, grammar_data, old_first)
+        new_follow, new_follow_time = timed(compute_follow_sets, grammar_data, new_first)
+
+        if old_first != new_first or old_follow != new_follow:
+            raise AssertionError(f"Digraph and fixpoint results differ on {name}")
+
+        # The set-returning functions decode bitmasks; time the masks alone too
+        _, terminal_index = intern_terminals(grammar_data)
+        first_masks, mask_first_time = timed(compute_first_masks, grammar_data, terminal_index)
+        _, mask_follow_time = timed(compute_follow_masks, grammar_data, first_masks, terminal_index)
+
+        table.append([name,
+                      f"{old_first_time * 1000:.1f}", f"{new_first_time * 1000:.1f}",
+                      f"{mask_first_time * 1000:.1f}",
+                      f"{old_follow_time * 1000:.1f}", f"{new_follow_time * 1000:.1f}",
+                      f"{mask_follow_time * 1000:.1f}"])
+
+    print("\nFIRST/FOLLOW: round-robin fixpoint vs SCC digraph (ms)")
+    print(tabulate(table, headers=["Grammar", "FIRST fixpoint", "FIRST digraph", "FIRST bitmask",
+                                   "FOLLOW fixpoint", "FOLLOW digraph", "FOLLOW bitmask"],
+                   tablefmt="grid"))
+
+
+def benchmark_lr_tables(grammars):
+    generators = [
+        ("SLR", slr1.create_slr_table, 'slr_conflicts'),
+        ("LALR", lalr1.create_lalr_table, 'lalr_conflicts'),
+        ("LR(1)", lr1.create_lr1_table, 'lr1_conflicts'),
+    ]
+    table = []
+
+    for name, grammar_data in grammars:
+        row = [name]
+
+        for _, create_table, conflicts_attribute in generators:
+            grammar_copy = fresh(grammar_data)
+            (action, goto_table, states), build_time = timed(create_table, grammar_copy)
+            conflicts = getattr(grammar_copy['compiled'], conflicts_attribute)
+            row += [len(states), len(action) + len(goto_table), len(conflicts), f"{build_time * 1000:.1f}"]
+
+        # Canonical LR(1) without state merging, for scale
+        (canonical_states, _), canonical_time = timed(lr1.lr1_collection, fresh(grammar_data), False)
+        row += [len(canonical_states), f"{canonical_time * 1000:.1f}"]
+
+        table.append(row)
+
+    headers = ["Grammar"]
+    for label, _, _ in generators:
+        headers += [f"{label} states", f"{label} entries", f"{label} conflicts", f"{label} ms"]
+    headers += ["Canonical LR(1) states", "Canonical LR(1) ms"]
+
+    print("\nLR tables: SLR(1) vs LALR(1) vs LR(1) with Pager merging")
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+
+def benchmark_codegen(levels, operands):
+    # Throughput in tokens per second of the printing drivers, the dense
+    # table drivers and the modules generated by CODEGEN
+    cases = [
+        ("LL(1)", ll_expression_grammar(levels), ll1.print_derivation,
+         ll1.parse, codegen.generate_ll1),
+        ("SLR(1)", expression_grammar(levels), slr1.print_reduction,
+         slr1.parse, codegen.generate_slr1),
+    ]
+    table = []
+
+    for name, grammar_data, print_driver, parse, generate in cases:
+        module = codegen.load_module(generate(grammar_data))
+        row = [f"{name} expression({levels})"]
+
+        # The printing drivers redraw the whole remaining input at every
+        # step, so they only get a short sentence
+        short_text = expression_input(levels, max(operands // 1000, 1))
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, print_time = timed(print_driver, grammar_data, short_text)
+        row.append(f"{len(short_text) / print_time:,.0f}")
+
+        text = expression_input(levels, operands)
+        accepted, parse_time = timed(parse, grammar_data, text)
+        generated, generated_time = timed(module.parse, text)
+        if not accepted or not generated:
+            raise AssertionError(f"{name} drivers rejected a generated sentence")
+
+        row += [len(text), f"{len(text) / parse_time:,.0f}", f"{len(text) / generated_time:,.0f}",
+                f"{parse_time / generated_time:.1f}x"]
+
+        table.append(row)
+
+    print("\nGenerated parsers vs interpreted drivers (tokens/s)")
+    print(tabulate(table, headers=["Grammar", "print driver", "Tokens", "dense parse()",
+                                   "generated", "speedup over dense"],
+                   tablefmt="grid"))
+
+
+def ambiguous_expression_grammar(levels):
+    # One non-terminal with every operator of expression_grammar(levels) as
+    # E -> E op E, so any sentence with two operators is ambiguous
+    operators = [chr(TERMINAL_BASE + i) for i in range(levels - 1)]
+    return make_grammar_data({'E': ['E' + operator + 'E' for operator in operators] + ['(E)', 'i']})
+
+
+def benchmark_glr(levels, operand_counts):
+    # GLR against the deterministic SLR(1) driver on the same sentences:
+    # on a conflict-free table every cell has one action, so the GLR stack
+    # stays a single path. The ambiguous grammar shows the cost of forking
+    table = []
+
+    for operands in operand_counts:
+        text = expression_input(levels, operands)
+        row = [f"expression({levels})", len(text)]
+
+        grammar_data = expression_grammar(levels)
+        slr1.create_dense_table(grammar_data)
+        glr.create_glr_table(grammar_data)
+        accepted, slr_time = timed(slr1.parse, grammar_data, text)
+        recognized, glr_time = timed(glr.parse, grammar_data, text)
+        parsed, forest_time = timed(glr.parse, grammar_data, text, glr.Forest())
+        if not accepted or not recognized or not parsed:
+            raise AssertionError("A parser rejected a generated sentence")
+
+        row += [f"{len(text) / slr_time:,.0f}", f"{len(text) / glr_time:,.0f}",
+                f"{len(text) / forest_time:,.0f}", f"{glr_time / slr_time:.1f}x"]
+        table.append(row)
+
+    # Fewer operands: the number of parses grows like the Catalan numbers,
+    # which the forest shares in polynomial space
+    for operands in operand_counts:
+        operands = max(operands // 1000, 2)
+        text = expression_input(levels, operands)
+        grammar_data = ambiguous_expression_grammar(levels)
+        glr.create_glr_table(grammar_data)
+        forest = glr.Forest()
+        recognized, glr_time = timed(glr.parse, grammar_data, text)
+        parsed, forest_time = timed(glr.parse, grammar_data, text, forest)
+        if not recognized or not parsed:
+            raise AssertionError("GLR rejected a generated sentence")
+
+        table.append([f"ambiguous({levels})", len(text), "-", f"{len(text) / glr_time:,.0f}",
+                      f"{len(text) / forest_time:,.0f}", "-"])
+
+    print("\nGLR vs deterministic SLR(1) driver (tokens/s)")
+    print(tabulate(table, headers=["Grammar", "Tokens", "SLR(1) parse()", "GLR parse()",
+                                   "GLR with forest", "GLR slowdown"],
+                   tablefmt="grid"))
+
+
+def benchmark_earley(levels, operand_counts):
+    # The Earley parser on the sentences of benchmark_glr, plus a right-
+    # recursive grammar, where Leo's optimization keeps the chart linear
+    table = []
+
+    inputs = []
+    for operands in operand_counts:
+        inputs.append((f"expression({levels})", expression_grammar(levels),
+                       expression_input(levels, operands)))
+        operands = max(operands // 1000, 2)
+        inputs.append((f"ambiguous({levels})", ambiguous_expression_grammar(levels),
+                       expression_input(levels, operands)))
+        inputs.append(("right recursive", make_grammar_data({'S': ['aS', 'b']}),
+                       ['a'] * operands * 1000 + ['b']))
+
+    for name, grammar_data, text in inputs:
+        earley.create_earley_grammar(grammar_data)
+        glr.create_glr_table(grammar_data)
+        recognized, earley_time = timed(earley.parse, grammar_data, text)
+        parsed, tree_time = timed(earley.parse, grammar_data, text, SyntaxTree())
+        accepted, glr_time = timed(glr.parse, grammar_data, text)
+        if not recognized or not parsed or not accepted:
+            raise AssertionError("A parser rejected a generated sentence")
+
+        table.append([name, len(text), f"{len(text) / earley_time:,.0f}",
+                      f"{len(text) / tree_time:,.0f}", f"{len(text) / glr_time:,.0f}"])
+
+    print("\nEarley parser vs GLR (tokens/s)")
+    print(tabulate(table, headers=["Grammar", "Tokens", "Earley parse()", "Earley with tree",
+                                   "GLR parse()"],
+                   tablefmt="grid"))
+
+
+
+def best_time(function, repeat, setup=None):
+    # Fastest of repeat runs; setup() makes the arguments of each run
+    # outside the timing
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        _, seconds = timed(function, *args)
+        times.append(seconds)
+    return min(times)
+
+
+def cold(*prepare):
+    # Setup for best_time: a grammar without cached tables, compiled and
+    # with the prepare functions already run on it, so only the timed phase
+    # starts from nothing
+    def setup(grammar_data):
+        compiled = compile_grammar(fresh(grammar_data))
+        for function in prepare:
+            function(compiled)
+        return (compiled,)
+    return setup
+
+
+def suite_grammars(scale):
+    return [
+        (f"expression({10 * scale})", expression_grammar(10 * scale)),
+        (f"ll_expression({10 * scale})", ll_expression_grammar(10 * scale)),
+        (f"random({100 * scale})", random_grammar(100 * scale, 50 * scale, seed=scale)),
+        (f"ll1({200 * scale})", ll1_grammar(200 * scale, 50 * scale, seed=scale)),
+        (f"slr1({200 * scale})", slr1_grammar(200 * scale, 50 * scale, seed=scale)),
+    ]
+
+
+def benchmark_suite(scale=1, repeat=3, tokens=10000, printed_tokens=200, errors=10):
+    # Times every phase of table construction on fresh copies of the suite
+    # grammars and, where the grammar is LL(1) or SLR(1), both drivers on
+    # valid and invalid sentences made by random derivation. Results are
+    # keyed "grammar/phase" with the best time in seconds, plus the number
+    # of tokens parsed for the drivers
+    results = {}
+
+    for name, grammar_data in suite_grammars(scale):
+        def record(phase, seconds, **extra):
+            results[f"{name}/{phase}"] = dict(seconds=seconds, **extra)
+
+        record("compute_first_sets", best_time(compute_first_sets, repeat,
+                                               lambda: (fresh(grammar_data),)))
+        record("compute_follow_sets", best_time(compute_follow_sets, repeat,
+                                                lambda: (fresh(grammar_data),)))
+        setup = cold()
+        record("create_parsing_table", best_time(ll1.create_parsing_table, repeat,
+                                                 lambda: setup(grammar_data)))
+        record("canonical_collection", best_time(slr1.canonical_collection, repeat,
+                                                 lambda: setup(grammar_data)))
+        setup = cold(slr1.canonical_collection)
+        record("create_slr_table", best_time(slr1.create_slr_table, repeat,
+                                             lambda: setup(grammar_data)))
+
+        drivers = []
+        if ll1.is_ll1(grammar_data):
+            drivers.append(("LL(1)", ll1.parse, ll1.print_derivation))
+        if slr1.is_slr1(grammar_data):
+            drivers.append(("SLR(1)", slr1.parse, slr1.print_reduction))
+        if not drivers:
+            continue
+
+        valid = random_sentence(grammar_data, tokens)
+        invalid = invalid_sentence(grammar_data, tokens, errors)
+        short = random_sentence(grammar_data, printed_tokens)
+
+        for label, parse, print_driver in drivers:
+            # Also builds the tables error recovery uses, outside the timing
+            if not parse(grammar_data, valid) or parse(grammar_data, invalid, errors=[]):
+                raise AssertionError(f"{label} parse() misjudged a generated sentence of {name}")
+
+            record(f"{label} parse valid", best_time(lambda: parse(grammar_data, valid), repeat),
+                   tokens=len(valid))
+            record(f"{label} parse invalid", best_time(lambda: parse(grammar_data, invalid, errors=[]),
+                                                       repeat), tokens=len(invalid))
+
+            # The printing drivers redraw the whole remaining input at every
+            # step, so they only get a short sentence
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds = best_time(lambda: print_driver(grammar_data, short), repeat)
+            record(f"{label} print", seconds, tokens=len(short))
+
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def unit_time(result):
+    # Seconds per token for the drivers, so that runs on sentences of
+    # other lengths compare
+    return result['seconds'] / result['tokens'] if 'tokens' in result else result['seconds']
+
+
+def format_result(result):
+    if 'tokens' in result:
+        return f"{result['tokens'] / result['seconds']:,.0f} tok/s"
+    return f"{result['seconds'] * 1000:.2f} ms"
+
+
+def print_suite(results):
+    table = [[key, format_result(result)] for key, result in results.items()]
+    print(tabulate(table, headers=["Grammar/phase", "Time"], tablefmt="grid"))
+
+
+def compare_suite(baseline, results, threshold=0.1):
+    # Prints each measurement next to the one in baseline and returns the
+    # keys that got slower by more than threshold (a fraction)
+    table = []
+    slower = []
+
+    for key, result in results.items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        ratio = unit_time(result) / unit_time(old)
+        flag = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        if flag == "slower":
+            slower.append(key)
+        table.append([key, format_result(old), format_result(result), f"{(ratio - 1) * 100:+.1f}%", flag])
+
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'}")
+    print(tabulate(table, headers=["Grammar/phase", "Baseline", "Now", "Time change", ""],
+                   tablefmt="grid"))
+    return slower
+
+
+def run_comparisons():
+    benchmark_first_follow(
+        [(f"expression({n})", expression_grammar(n)) for n in (10, 50, 200)] +
+        [(f"random({n})", random_grammar(n, n // 2, seed=n)) for n in (100, 500, 2000)]
+    )
+    benchmark_lr_tables(
+        [(f"expression({n})", expression_grammar(n)) for n in (10, 50, 200)] +
+        [(f"random({n})", random_grammar(n, n // 2, seed=n)) for n in (20, 50, 100)]
+    )
+    benchmark_codegen(10, 200000)
+    benchmark_glr(10, (10000, 100000))
+    benchmark_earley(10, (10000, 40000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time table construction and parsing on synthetic grammars.")
+    parser.add_argument("--scale", type=int, default=1, help="multiplies the size of the suite grammars")
+    parser.add_argument("--tokens", type=int, default=10000, help="length of the sentences parsed")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest is kept")
+    parser.add_argument("--json", metavar="FILE", help="write the results to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="compare with results written by --json")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown (as a fraction) that --compare reports as a regression")
+    parser.add_argument("--comparisons", action="store_true",
+                        help="run the implementation comparisons instead of the suite")
+    args = parser.parse_args(argv)
+
+    if args.comparisons:
+        run_comparisons()
+        return 0
+
+    results = benchmark_suite(args.scale, args.repeat, args.tokens)
+    print_suite(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'commit': current_commit(), 'python': platform.python_version(),
+                       'scale': args.scale, 'tokens': args.tokens, 'results': results}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            if compare_suite(json.load(file), results, args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import argparse
+import sys
+import types
+
+from COMPILED_GRAMMAR import compile_grammar, format_production
+import LL1_PARSER as ll1
+from PARSE_TABLES import END_MARKER
+import SLR1_PARSER as slr1
+
+# Emits a standalone Python module for one grammar: recursive descent for
+# LL(1) grammars and a table-inlined driver for SLR(1) grammars. Generated
+# modules import nothing and need Python 3.10 (for match); they expose
+# TERMINALS, parse(tokens) and parse_ids(ids), with the same token ids as
+# the dense tables
+
+# States are dispatched with a binary search of 'if state < k' tests down to
+# groups of at most this many, which are then matched directly
+DISPATCH_GROUP = 4
+
+HEADER = '''# Generated by CODEGEN.py ({kind}); do not edit.
+#
+{grammar}
+
+TERMINALS = {terminals!r}
+END_MARKER = {end_marker}
+
+
+def parse(tokens):
+    return parse_ids([TERMINALS.get(token, 0) for token in tokens])'''
+
+
+# Fallback of the recursive-descent modules: the LL(1) driver over the
+# table (rows of non-terminals, production + 1 per cell) and the reversed
+# right sides, with an explicit stack so that nesting depth is unbounded
+STACK_PARSER = '''
+
+def _parse_stack(ids):
+    stack = [END_MARKER, {start}]
+    pos = 0
+    while True:
+        top = stack.pop()
+        if top >= {terminal_count}:
+            cell = _TABLE[(top - {terminal_count}) * {columns} + ids[pos]]
+            if not cell:
+                return False
+            stack.extend(_EXPANSIONS[cell - 1])
+        elif top != ids[pos]:
+            return False
+        elif top == END_MARKER:
+            return pos == len(ids) - 1
+        else:
+            pos += 1'''
+
+
+def grammar_comment(compiled):
+    return "\n".join(f"#   {left} -> {format_production(right)}" for left, right in compiled.productions[1:])
+
+
+def case_pattern(values):
+    return " | ".join(str(value) for value in sorted(values))
+
+
+def generate_ll1(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if not ll1.is_ll1(compiled):
+        raise ValueError("Grammar is not LL(1)")
+
+    dense = ll1.create_dense_table(compiled)
+    terminal_count = dense.terminal_count
+    non_terminal_list = dense.non_terminal_list
+
+    lines = [HEADER.format(kind="LL(1) recursive descent", grammar=grammar_comment(compiled),
+                           terminals=compiled.terminal_index, end_marker=END_MARKER)]
+
+    # A production ending in its own non-terminal loops instead of
+    # recursing; input nested deeper than the recursion limit allows is
+    # parsed again by the table-driven loop below
+    for row, nt in enumerate(non_terminal_list):
+        choices = {}
+        for column in range(terminal_count):
+            cell = dense.table.get(row, column)
+            if cell:
+                choices.setdefault(cell - 1, []).append(column)
+
+        symbol_id = terminal_count + row
+        tail_recursive = any(dense.expansions[production][:1] == (symbol_id,)
+                             for production in choices)
+        indent = "        " if tail_recursive else "    "
+
+        lines.append("")
+        lines.append("")
+        lines.append(f"def _parse_{row}(ids, pos):")
+        lines.append(f"    # {nt}")
+        if tail_recursive:
+            lines.append("    while True:")
+        lines.append(f"{indent}match ids[pos]:")
+
+        for production, columns in sorted(choices.items()):
+            left, right = dense.productions[production]
+            symbols = list(reversed(dense.expansions[production]))
+
+            lines.append(f"{indent}    case {case_pattern(columns)}:")
+            lines.append(f"{indent}        # {left} -> {format_production(right)}")
+
+            loop = tail_recursive and symbols and symbols[-1] == symbol_id
+            if loop:
+                symbols = symbols[:-1]
+
+            for i, symbol in enumerate(symbols):
+                if symbol < terminal_count:
+                    # The first terminal was already checked by the dispatch
+                    if i:
+                        lines.append(f"{indent}        if ids[pos] != {symbol}:")
+                        lines.append(f"{indent}            return -1")
+                    lines.append(f"{indent}        pos += 1")
+                else:
+                    lines.append(f"{indent}        pos = _parse_{symbol - terminal_count}(ids, pos)")
+                    lines.append(f"{indent}        if pos < 0:")
+                    lines.append(f"{indent}            return pos")
+
+            lines.append(f"{indent}        {'continue' if loop else 'return pos'}")
+
+        lines.append(f"{indent}    case _:")
+        lines.append(f"{indent}        return -1")
+
+    lines.append("")
+    lines.append("")
+    lines.append(f"_TABLE = {tuple(dense.table.data)!r}")
+    lines.append(f"_EXPANSIONS = {tuple(dense.expansions)!r}")
+    lines.append(STACK_PARSER.format(terminal_count=terminal_count, columns=dense.table.columns,
+                                     start=dense.start))
+
+    start_row = dense.start - terminal_count
+    lines.append("")
+    lines.append("")
+    lines.append("def parse_ids(ids):")
+    lines.append("    ids = list(ids)")
+    lines.append("    ids.append(END_MARKER)")
+    lines.append("    try:")
+    lines.append(f"        return _parse_{start_row}(ids, 0) == len(ids) - 1")
+    lines.append("    except RecursionError:")
+    lines.append("        return _parse_stack(ids)")
+    lines.append("")
+
+    return "\n".join(lines)
+
+
+def emit_state_dispatch(lines, indent, variable, states, emit_case):
+    # Binary search over sorted state numbers, ending in match statements
+    if len(states) <= DISPATCH_GROUP:
+        lines.append(f"{indent}match {variable}:")
+        for state in states:
+            lines.append(f"{indent}    case {state}:")
+            emit_case(lines, indent + "        ", state)
+        return
+
+    middle = len(states) // 2
+    lines.append(f"{indent}if {variable} < {states[middle]}:")
+    emit_state_dispatch(lines, indent + "    ", variable, states[:middle], emit_case)
+    lines.append(f"{indent}else:")
+    emit_state_dispatch(lines, indent + "    ", variable, states[middle:], emit_case)
+
+
+def generate_slr1(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if not slr1.is_slr1(compiled):
+        raise ValueError("Grammar is not SLR(1)")
+
+    dense = slr1.create_dense_table(compiled)
+
+    table = dense.table
+    terminal_count = dense.terminal_count
+
+    # Goto columns, grouped by target state: {column: {target: [states]}}
+    gotos = {}
+    for state in range(table.rows):
+        for column in range(terminal_count, table.columns):
+            cell = table.get(state, column)
+            if cell:
+                gotos.setdefault(column, {}).setdefault(cell - 1, []).append(state)
+
+    # States whose only action is one reduction reduce without looking at
+    # the token; an error is then caught before the next shift
+    default_reductions = {}
+    for state in range(table.rows):
+        cells = {table.get(state, column) for column in range(terminal_count)} - {0}
+        if len(cells) == 1 and min(cells) < -1:
+            default_reductions[state] = -min(cells) - 1
+
+    def emit_enter(lines, body, state):
+        lines.append(f"{body}state = {state}")
+        lines.append(f"{body}push(state)")
+
+    def emit_reduce(lines, body, production):
+        left, right = dense.productions[production]
+        length = dense.production_length[production]
+        lines.append(f"{body}# reduce {left} -> {format_production(right)}")
+        if length:
+            lines.append(f"{body}del stack[-{length}:]")
+
+        # The goto after a reduction is always defined, so the target
+        # reached from most states needs no test
+        targets = sorted(gotos[dense.production_left[production]].items(),
+                         key=lambda entry: (-len(entry[1]), entry[0]))
+        if len(targets) == 1:
+            emit_enter(lines, body, targets[0][0])
+            return
+
+        lines.append(f"{body}match stack[-1]:")
+        for target, states in targets[1:]:
+            lines.append(f"{body}    case {case_pattern(states)}:")
+            emit_enter(lines, body + "        ", target)
+        lines.append(f"{body}    case _:")
+        emit_enter(lines, body + "        ", targets[0][0])
+
+    def emit_actions(lines, indent, state):
+        if state in default_reductions:
+            emit_reduce(lines, indent, default_reductions[state])
+            return
+
+        actions = {}
+        for column in range(terminal_count):
+            cell = table.get(state, column)
+            if cell:
+                actions.setdefault(cell, []).append(column)
+
+        lines.append(f"{indent}match token:")
+        for cell, columns in sorted(actions.items(), key=lambda entry: min(entry[1])):
+            lines.append(f"{indent}    case {case_pattern(columns)}:")
+            body = indent + "        "
+
+            if cell > 0:
+                lines.append(f"{body}pos += 1")
+                lines.append(f"{body}token = ids[pos]")
+                emit_enter(lines, body, cell - 1)
+            elif cell == -1:
+                lines.append(f"{body}return pos == last")
+            else:
+                emit_reduce(lines, body, -cell - 1)
+
+        lines.append(f"{indent}    case _:")
+        lines.append(f"{indent}        return False")
+
+    lines = [HEADER.format(kind="table-inlined LR driver", grammar=grammar_comment(compiled),
+                           terminals=compiled.terminal_index, end_marker=END_MARKER)]
+    lines.append("")
+    lines.append("")
+    lines.append("def parse_ids(ids):")
+    lines.append("    ids = list(ids)")
+    lines.append("    last = len(ids)")
+    lines.append("    ids.append(END_MARKER)")
+    lines.append("    stack = [0]")
+    lines.append("    push = stack.append")
+    lines.append("    state = 0")
+    lines.append("    pos = 0")
+    lines.append("    token = ids[0]")
+    lines.append("")
+    lines.append("    while True:")
+    emit_state_dispatch(lines, "        ", "state", list(range(table.rows)), emit_actions)
+    lines.append("")
+
+    return "\n".join(lines)
+
+
+def load_module(source, name="generated_parser"):
+    module = types.ModuleType(name)
+    exec(compile(source, f"<{name}>", "exec"), module.__dict__)
+    return module
+
+
+def main(argv=None):
+    import main as menu
+
+    generators = {'T': ("LL(1)", generate_ll1), 'B': ("SLR(1)", generate_slr1)}
+
+    parser = argparse.ArgumentParser(
+        description="Generate a standalone parser module for a grammar from grammars.txt.")
+    parser.add_argument("grammar", type=int, help="grammar number, as listed by main.py")
+    parser.add_argument("parser", choices=sorted(generators), help="T: LL(1), B: SLR(1)")
+    parser.add_argument("output", nargs="?", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    menu.read_grammars()
+    if not 1 <= args.grammar <= len(menu.grammars):
+        parser.error(f"grammar must be between 1 and {len(menu.grammars)}")
+
+    name, generate = generators[args.parser]
+    try:
+        source = generate(menu.grammars[args.grammar - 1])
+    except ValueError:
+        parser.error(f"grammar {args.grammar} is not {name}")
+
+    if args.output:
+        with open(args.output, 'w', encoding="utf-8") as file:
+            file.write(source)
+    else:
+        sys.stdout.write(source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from FIRST_FOLLOW import (FIRST_MASK, compute_first_masks, compute_follow_masks,
+                          compute_nullable, intern_terminals, mask_to_set)
+
+
+class CompiledGrammar:
+    # sets, when given, is (terminal_list, terminal_index, nullable,
+    # first_masks, follow_masks) already computed for this grammar, as kept
+    # up to date by EDITABLE_GRAMMAR
+    def __init__(self, grammar_data, sets=None):
+        self.grammar_data = grammar_data
+        self.grammar = grammar_data['grammar']
+        self.terminals = grammar_data['terminals']
+        self.non_terminals = grammar_data['non_terminals']
+        self.start_symbol = next(iter(self.grammar))
+
+        # Numbered productions shared by the table builders; production 0 is
+        # the augmented S' -> S and ε right sides are empty strings. A right
+        # side is a string of one-character symbols or a tuple of symbol names
+        self.productions = [("S'", (self.start_symbol,))]
+        for nt, productions in self.grammar.items():
+            for production in productions:
+                self.productions.append((nt, '' if production == 'ε' else production))
+
+        # FIRST/FOLLOW are computed once, as bitmasks over interned
+        # terminals, and shared by every parser
+        if sets is not None:
+            (self.terminal_list, self.terminal_index, self.nullable,
+             self.first_masks, self.follow_masks) = sets
+        else:
+            self.terminal_list, self.terminal_index = intern_terminals(grammar_data)
+            self.nullable = compute_nullable(grammar_data)
+            self.first_masks = compute_first_masks(grammar_data, self.terminal_index, self.nullable)
+            self.follow_masks = compute_follow_masks(grammar_data, self.first_masks, self.terminal_index)
+
+        # Parse tables are filled in lazily by the parser modules
+        self.ll_table = None
+        self.ll_conflicts = None
+        self.lr0_items = None
+        self.lr0_automaton = None
+        self.slr_table = None
+        self.slr_conflicts = None
+        self.lalr_table = None
+        self.lalr_conflicts = None
+        self.lr1_table = None
+        self.lr1_conflicts = None
+        self.lr1_stats = None
+        self.dense_tables = {}
+        self.lexer = None
+        self.earley = None
+
+    def first_mask(self, string):
+        return FIRST_MASK(string, self.first_masks)
+
+    def follow_mask(self, symbol):
+        return self.follow_masks.get(symbol, 0)
+
+    def first(self, string):
+        return mask_to_set(self.first_mask(string), self.terminal_list)
+
+    def follow(self, symbol):
+        return mask_to_set(self.follow_mask(symbol), self.terminal_list)
+
+
+def compile_grammar(grammar_data):
+    if isinstance(grammar_data, CompiledGrammar):
+        return grammar_data
+
+    compiled = grammar_data.get('compiled')
+    if compiled is None:
+        compiled = CompiledGrammar(grammar_data)
+        grammar_data['compiled'] = compiled
+
+    return compiled
+
+
+def symbol_separator(grammar_data):
+    # Symbols of token grammars are names and are written apart; one-character
+    # symbols are written run together, as in grammars.txt
+    return ' ' if 'tokens' in compile_grammar(grammar_data).grammar_data else ''
+
+
+def format_symbols(symbols, separator=''):
+    return separator.join(symbols)
+
+
+def format_production(production):
+    if not production or production == 'ε':
+        return 'ε'
+    if isinstance(production, tuple):
+        return ' '.join(production)
+    return production
@@ -0,0 +1,502 @@
+import argparse
+import heapq
+import time
+
+from COMPILED_GRAMMAR import compile_grammar, format_production, format_symbols, symbol_separator
+import LALR1_PARSER as lalr1
+import LR1_PARSER as lr1
+import SLR1_PARSER as slr1
+
+# Conflict reports for the LR tables. Each conflict comes with the items
+# behind the competing actions and an example input: the cheapest viable
+# prefix reaching the conflict state, then the lookahead and, when one is
+# found in time, a suffix that both actions complete. Such an input has two
+# parses, so the grammar is ambiguous; otherwise each action gets its own
+# shortest completion, if it has one within the search bounds
+
+# Parser letter -> (name, table builder, conflicts attribute of the compiled grammar)
+TABLES = {
+    'B': ("SLR(1)", slr1.create_slr_table, 'slr_conflicts'),
+    'L': ("LALR(1)", lalr1.create_lalr_table, 'lalr_conflicts'),
+    'R': ("LR(1)", lr1.create_lr1_table, 'lr1_conflicts'),
+}
+
+# Seconds spent searching for the examples of one conflict, and of all of
+# them; conflicts left when the total runs out only get their items and prefix
+TIME_LIMIT = 0.5
+TOTAL_TIME_LIMIT = 10.0
+
+# Configurations deeper than the prefix by more than STACK_LIMIT are dropped,
+# which keeps the search finite when ε-reductions can grow the stack
+# forever, and a search step reaching more than CONFIGURATION_LIMIT of them
+# gives up: heavily ambiguous grammars can otherwise exhaust memory
+STACK_LIMIT = 30
+CONFIGURATION_LIMIT = 2000
+
+# Reductions before a shift may leave a stack at most this much deeper than
+# it was: ε-reductions stacked on one another rarely matter to the shortest
+# examples and multiply the configurations
+REDUCTION_GROWTH = 2
+
+
+class SearchLimit(Exception):
+    pass
+
+
+def shortest_yields(compiled):
+    # A shortest terminal string derived from every productive symbol, by
+    # Knuth's generalization of Dijkstra's algorithm: a production is
+    # priced once all its non-terminals are final
+    non_terminals = compiled.non_terminals
+    yields = {terminal: (terminal,) for terminal in compiled.terminals if terminal != 'ε'}
+
+    pending = []
+    uses = {nt: [] for nt in non_terminals}
+    heap = []
+
+    for index, (left, right) in enumerate(compiled.productions[1:], 1):
+        count = 0
+        for symbol in right:
+            if symbol in non_terminals:
+                uses[symbol].append(index)
+                count += 1
+        pending.append(count)
+        if count == 0:
+            heapq.heappush(heap, (len(right), index))
+
+    while heap:
+        _, index = heapq.heappop(heap)
+        left, right = compiled.productions[index]
+        if left in yields:
+            continue
+
+        yields[left] = tuple(terminal for symbol in right for terminal in yields[symbol])
+
+        for use in uses[left]:
+            pending[use - 1] -= 1
+            if pending[use - 1] == 0:
+                _, use_right = compiled.productions[use]
+                heapq.heappush(heap, (sum(len(yields[symbol]) for symbol in use_right), use))
+
+    return yields
+
+
+def cheapest_prefixes(transitions, yields):
+    # Dijkstra over the automaton from state 0, an edge costing the length
+    # of the shortest yield of its symbol. parents[state] is the
+    # (previous state, symbol) of the cheapest path
+    edges = {}
+    for (state, symbol), target in transitions.items():
+        if symbol in yields:
+            edges.setdefault(state, []).append((len(yields[symbol]), symbol, target))
+
+    parents = {0: None}
+    cost = {0: 0}
+    heap = [(0, 0)]
+    while heap:
+        distance, state = heapq.heappop(heap)
+        if distance > cost[state]:
+            continue
+
+        for weight, symbol, target in edges.get(state, ()):
+            if target not in cost or distance + weight < cost[target]:
+                cost[target] = distance + weight
+                parents[target] = (state, symbol)
+                heapq.heappush(heap, (distance + weight, target))
+
+    return parents
+
+
+def viable_prefix(parents, state):
+    # The state stack of the cheapest path to state
+    stack = [state]
+    while parents[state] is not None:
+        state, _ = parents[state]
+        stack.append(state)
+
+    stack.reverse()
+    return tuple(stack)
+
+
+class ConfigurationParser:
+    # Runs an LR table nondeterministically: where a cell holds several
+    # actions every one of them is followed. A configuration is the state
+    # stack as a tuple, and each step maps a set of them to the next set
+    def __init__(self, action, goto_table, conflicts):
+        self.cells = {key: [act] for key, act in action.items()}
+        for conflict in conflicts:
+            cell = self.cells.setdefault((conflict.state, conflict.terminal), [])
+            for act in conflict.actions:
+                if act not in cell:
+                    cell.append(act)
+
+        self.goto_table = goto_table
+
+        # Set before each search
+        self.stack_limit = 0
+        self.deadline = 0
+
+    def reduce(self, stack, production, limit=None):
+        left, right = production
+        base = stack[:len(stack) - len(right)]
+        target = self.goto_table.get((base[-1], left)) if base else None
+        if target is None or len(base) >= (limit or self.stack_limit):
+            return None
+        return base + (target,)
+
+    def reductions(self, stacks, terminal):
+        # Every configuration reachable from stacks by reducing on terminal
+        seen = set(stacks)
+        work = list(stacks)
+        cells = self.cells
+        limit = min(self.stack_limit, max(map(len, stacks), default=0) + REDUCTION_GROWTH)
+
+        while work:
+            stack = work.pop()
+            for act, value in cells.get((stack[-1], terminal), ()):
+                if act != 'reduce':
+                    continue
+                reduced = self.reduce(stack, value, limit)
+                if reduced is not None and reduced not in seen:
+                    seen.add(reduced)
+                    work.append(reduced)
+
+            if len(seen) > CONFIGURATION_LIMIT or time.perf_counter() > self.deadline:
+                raise SearchLimit()
+
+        return seen
+
+    def shift(self, stacks, terminal):
+        result = set()
+        for stack in self.reductions(stacks, terminal):
+            for act, value in self.cells.get((stack[-1], terminal), ()):
+                if act == 'shift' and len(stack) < self.stack_limit:
+                    result.add(stack + (value,))
+        return frozenset(result)
+
+    def accepts(self, stacks):
+        return any(('accept', '') in self.cells.get((stack[-1], '$'), ())
+                   for stack in self.reductions(stacks, '$'))
+
+    def take(self, stack, act, terminal):
+        # The configurations after choosing act for terminal in stack's top
+        # state and then consuming terminal. For the end marker the result
+        # is only tested for being empty: it holds the stack if act leads
+        # to acceptance
+        kind, value = act
+        if kind == 'shift':
+            return frozenset({stack + (value,)})
+        if kind == 'accept':
+            return frozenset({stack})
+
+        reduced = self.reduce(stack, value)
+        if reduced is None:
+            return frozenset()
+        if terminal == '$':
+            return frozenset({stack}) if self.accepts({reduced}) else frozenset()
+        return self.shift({reduced}, terminal)
+
+
+def live_prefix(parser, conflict, predecessors, accessing, yields):
+    # The cheapest stack (by the yields of its symbols) ending in the
+    # conflict state on which every competing action can consume the
+    # lookahead, or None. Stacks are grown downwards from the conflict state
+    # through the automaton's predecessors until they reach state 0, so
+    # each one is a viable prefix
+    counter = 0
+    heap = [(0, counter, (conflict.state,))]
+    seen = {(conflict.state,)}
+
+    while heap:
+        cost, _, stack = heapq.heappop(heap)
+        if time.perf_counter() > parser.deadline:
+            raise SearchLimit()
+
+        if stack[0] == 0:
+            branches = [parser.take(stack, act, conflict.terminal) for act in conflict.actions]
+            if all(branches):
+                return stack, branches
+            continue
+
+        symbol = accessing[stack[0]]
+        if symbol not in yields or len(stack) >= parser.stack_limit:
+            continue
+        for state in predecessors.get(stack[0], ()):
+            extended = (state,) + stack
+            if extended not in seen:
+                seen.add(extended)
+                counter += 1
+                heapq.heappush(heap, (cost + len(yields[symbol]), counter, extended))
+
+    return None
+
+
+def complete(parser, branches, words):
+    # The shortest terminal string that takes every branch (a set of
+    # configurations) to an accepted input, or None. Strings are built from
+    # words (the terminals and the shortest yields of the non-terminals) by
+    # uniform-cost search, each word consumed a terminal at a time in every
+    # branch at once
+    start = tuple(branches)
+    if all(parser.accepts(branch) for branch in start):
+        return []
+
+    parents = {start: None}
+    costs = {start: 0}
+    counter = 0
+    heap = [(0, counter, start)]
+    while heap:
+        cost, _, node = heapq.heappop(heap)
+        if cost > costs[node]:
+            continue
+        if all(parser.accepts(branch) for branch in node):
+            string = []
+            while parents[node] is not None:
+                node, word = parents[node]
+                string[:0] = word
+            return string
+
+        for word in words:
+            successor = node
+            for terminal in word:
+                successor = tuple(parser.shift(branch, terminal) for branch in successor)
+                if not all(successor):
+                    break
+            else:
+                if successor not in costs or cost + len(word) < costs[successor]:
+                    costs[successor] = cost + len(word)
+                    parents[successor] = (node, word)
+                    counter += 1
+                    heapq.heappush(heap, (cost + len(word), counter, successor))
+
+    return None
+
+
+def describe_action(act):
+    kind, value = act
+    if kind == 'shift':
+        return f"shift {value}"
+    if kind == 'reduce':
+        left, right = value
+        return f"reduce {left} -> {format_production(right)}"
+    return "accept"
+
+
+def action_items(state, act, terminal):
+    # The items of state that put act in the cell for terminal
+    kind, value = act
+    items = []
+    for item in state:
+        if kind == 'shift':
+            if item.next_sym == terminal:
+                items.append(item)
+        elif item.next_sym is None:
+            if kind == 'accept' and item.production == 0:
+                items.append(item)
+            elif kind == 'reduce' and item.production and (item.left, item.right) == value:
+                items.append(item)
+    return items
+
+
+class ConflictReport:
+    def __init__(self, conflict, items, prefix_symbols, prefix):
+        self.conflict = conflict
+        # items[i] lists the items behind conflict.actions[i]
+        self.items = items
+        # None when the state is only reached through non-terminals that
+        # derive no terminal string
+        self.prefix_symbols = prefix_symbols
+        self.prefix = prefix
+        # Set when an input accepted through both actions was found
+        self.ambiguous = False
+        self.suffix = None
+        # Otherwise, the shortest completion after each action (None if it
+        # has none within the search bounds)
+        self.completions = [None, None]
+        self.timed_out = False
+
+    def input(self, suffix):
+        # The example input for a completion; '$' is not part of it
+        if self.conflict.terminal == '$':
+            return list(self.prefix)
+        return list(self.prefix) + [self.conflict.terminal] + suffix
+
+    @property
+    def example(self):
+        return self.input(self.suffix) if self.ambiguous else None
+
+    def format(self, separator=''):
+        conflict = self.conflict
+        lines = [f"Conflict in state {conflict.state}, terminal '{conflict.terminal}': {conflict.kind}"]
+
+        for act, items in zip(conflict.actions, self.items):
+            lines.append(f"  {describe_action(act)}:")
+            for item in items:
+                lines.append(f"      {item}")
+
+        if self.prefix is None:
+            lines.append("  The state is only reached through non-terminals that derive no string")
+            return "\n".join(lines)
+
+        lines.append(f"  Viable prefix: {format_symbols(self.prefix_symbols, separator) or 'ε'}")
+
+        # '•' marks where the parser has to choose
+        def example(suffix):
+            tokens = self.input(suffix)
+            tokens.insert(len(self.prefix), '•')
+            return format_symbols(tokens, separator)
+
+        if self.ambiguous:
+            lines.append(f"  Ambiguous input: {example(self.suffix)}")
+            return "\n".join(lines)
+
+        lines.append("  No input accepted through both actions was found"
+                     + (" in time" if self.timed_out else ""))
+        for act, suffix in zip(conflict.actions, self.completions):
+            if suffix is None:
+                lines.append(f"  {describe_action(act)}: no accepted input found")
+            else:
+                lines.append(f"  {describe_action(act)}: {example(suffix)}")
+        return "\n".join(lines)
+
+
+def diagnose_conflicts(grammar_data, parser_choice='B', time_limit=TIME_LIMIT,
+                       total_time_limit=TOTAL_TIME_LIMIT):
+    _, create_table, conflicts_attribute = TABLES[parser_choice]
+    compiled = compile_grammar(grammar_data)
+    action, goto_table, states = create_table(compiled)
+    conflicts = getattr(compiled, conflicts_attribute)
+    if not conflicts:
+        return []
+
+    # The automaton's transitions, including shifts that lost a conflict.
+    # Every transition into a state is on the same symbol
+    transitions = dict(goto_table)
+    for (state, terminal), (act, value) in action.items():
+        if act == 'shift':
+            transitions[(state, terminal)] = value
+    for conflict in conflicts:
+        for act, value in conflict.actions:
+            if act == 'shift':
+                transitions[(conflict.state, conflict.terminal)] = value
+    accessing = {}
+    predecessors = {}
+    for (state, symbol), target in transitions.items():
+        accessing[target] = symbol
+        predecessors.setdefault(target, set()).add(state)
+
+    yields = shortest_yields(compiled)
+    parents = cheapest_prefixes(transitions, yields)
+    words = [(terminal,) for terminal in sorted(compiled.terminals - {'ε', '$'})]
+    words += sorted({yields[nt] for nt in compiled.non_terminals
+                     if nt in yields and len(yields[nt]) > 1})
+    parser = ConfigurationParser(action, goto_table, conflicts)
+    end = time.perf_counter() + total_time_limit
+
+    reports = []
+    reported = set()
+    for conflict in conflicts:
+        # Several items can record the same clash
+        key = (conflict.state, conflict.terminal, conflict.existing, conflict.incoming)
+        if key in reported:
+            continue
+        reported.add(key)
+
+        items = [action_items(states[conflict.state], act, conflict.terminal)
+                 for act in conflict.actions]
+
+        if conflict.state not in parents:
+            reports.append(ConflictReport(conflict, items, None, None))
+            continue
+
+        stack = viable_prefix(parents, conflict.state)
+        prefix_symbols = [accessing[state] for state in stack[1:]]
+        prefix = [terminal for symbol in prefix_symbols for terminal in yields[symbol]]
+        report = ConflictReport(conflict, items, prefix_symbols, prefix)
+        reports.append(report)
+
+        start = time.perf_counter()
+        if start > end:
+            report.timed_out = True
+            continue
+
+        # Half the time goes to the search for an input both actions accept,
+        # the rest to one completion per action
+        parser.stack_limit = len(stack) + STACK_LIMIT
+        parser.deadline = min(start + time_limit / 2, end)
+        branches = [frozenset()] * len(conflict.actions)
+        try:
+            branches = [parser.take(stack, act, conflict.terminal) for act in conflict.actions]
+
+            # The cheapest prefix may leave an action nothing to do (it can
+            # need a longer one, or be possible only in another context)
+            if not all(branches):
+                found = live_prefix(parser, conflict, predecessors, accessing, yields)
+                if found is not None:
+                    stack, branches = found
+                    report.prefix_symbols = [accessing[state] for state in stack[1:]]
+                    report.prefix = [terminal for symbol in report.prefix_symbols
+                                     for terminal in yields[symbol]]
+
+            if all(branches):
+                parser.stack_limit = len(stack) + STACK_LIMIT
+                suffix = [] if conflict.terminal == '$' else complete(parser, branches, words)
+                if suffix is not None:
+                    report.ambiguous = True
+                    report.suffix = suffix
+                    continue
+        except SearchLimit:
+            report.timed_out = True
+
+        parser.stack_limit = len(stack) + STACK_LIMIT
+        parser.deadline = min(start + time_limit, end)
+        for i, branch in enumerate(branches):
+            if not branch:
+                continue
+            try:
+                report.completions[i] = [] if conflict.terminal == '$' else complete(parser, [branch], words)
+            except SearchLimit:
+                report.timed_out = True
+
+    return reports
+
+
+def print_conflicts(grammar_data, parser_choice='B', time_limit=TIME_LIMIT):
+    separator = symbol_separator(grammar_data)
+    for report in diagnose_conflicts(grammar_data, parser_choice, time_limit):
+        print()
+        print(report.format(separator))
+
+
+def main(argv=None):
+    import main as menu
+
+    parser = argparse.ArgumentParser(
+        description="Explain the conflicts of a grammar from grammars.txt with example inputs.")
+    parser.add_argument("grammar", type=int, help="grammar number, as listed by main.py")
+    parser.add_argument("parser", nargs="?", default='B', choices=sorted(TABLES),
+                        help="B: SLR(1) (default), L: LALR(1), R: LR(1)")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT,
+                        help="seconds spent searching for the examples of each conflict")
+    args = parser.parse_args(argv)
+
+    menu.read_grammars()
+    if not 1 <= args.grammar <= len(menu.grammars):
+        parser.error(f"grammar must be between 1 and {len(menu.grammars)}")
+
+    grammar_data = menu.grammars[args.grammar - 1]
+    name = TABLES[args.parser][0]
+    reports = diagnose_conflicts(grammar_data, args.parser, args.time_limit)
+    if not reports:
+        print(f"Grammar {args.grammar} is {name}: no conflicts.")
+        return
+
+    print(f"{len(reports)} {name} conflicts:")
+    separator = symbol_separator(grammar_data)
+    for report in reports:
+        print()
+        print(report.format(separator))
+
+
+if __name__ == "__main__":
+    main()
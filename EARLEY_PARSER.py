@@ -0,0 +1,452 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from COMPILED_GRAMMAR import compile_grammar, format_symbols, symbol_separator
+from FIRST_FOLLOW import EPSILON
+from PARSE_TABLES import END_MARKER, token_ids
+from SYNTAX_TREE import SyntaxTree
+
+# Earley's chart parser, for grammars without a parse table: any context-free
+# grammar, built the moment it is entered. Items are numbered like LR0Items
+# (first_item[production] + dot) and the chart is kept as parallel int
+# arrays, one entry (item, origin) per Earley item, with set i occupying
+# entries [set_start[i], set_start[i + 1]). Three refinements keep it fast:
+#
+# - Aycock and Horspool's nullable rule: an item before a nullable
+#   non-terminal is also advanced past it when predicted, so completion
+#   never has to look into the set being built;
+# - prediction is filtered with FIRST: a production is only predicted when
+#   it can start with the next token (or derive ε);
+# - Leo's right-recursion optimization: when an origin set has exactly one
+#   item waiting for the completed symbol, and that item becomes complete,
+#   only the topmost item of the chain is added. Right-recursive input then
+#   costs a constant number of items per token instead of one per pending
+#   completion
+
+NO_SYMBOL = -1
+
+# Kinds of the parts split() finds in a completed item
+TERMINAL = 0
+EMPTY = 1
+NON_TERMINAL = 2
+
+
+class EarleyGrammar:
+    # The grammar as int arrays. Symbol ids are those of the dense tables:
+    # terminals first, then terminal_count + row of each non-terminal
+    def __init__(self, compiled):
+        self.productions = compiled.productions
+        self.terminal_list = compiled.terminal_list
+        self.terminal_index = compiled.terminal_index
+        self.terminal_count = len(self.terminal_list)
+        self.non_terminal_list = sorted(compiled.non_terminals)
+
+        symbol_ids = dict(self.terminal_index)
+        for row, nt in enumerate(self.non_terminal_list):
+            symbol_ids[nt] = self.terminal_count + row
+        self.symbol_ids = symbol_ids
+        self.symbol_count = self.terminal_count + len(self.non_terminal_list)
+
+        # item_symbol[item] is the symbol after the dot, NO_SYMBOL at the end
+        self.first_item = array('i')
+        self.item_symbol = array('i')
+        self.item_production = array('i')
+        for index, (_, right) in enumerate(self.productions):
+            self.first_item.append(len(self.item_symbol))
+            for symbol in right:
+                self.item_symbol.append(symbol_ids[symbol])
+                self.item_production.append(index)
+            self.item_symbol.append(NO_SYMBOL)
+            self.item_production.append(index)
+
+        # The augmented S' has no id; its completion is the accepting item
+        self.production_left = array('i', [symbol_ids.get(left, NO_SYMBOL)
+                                           for left, _ in self.productions])
+
+        # Per non-terminal row: (first item, FIRST mask) of each production
+        self.predictions = [[] for _ in self.non_terminal_list]
+        for index, (left, right) in enumerate(self.productions[1:], 1):
+            self.predictions[symbol_ids[left] - self.terminal_count].append(
+                (self.first_item[index], compiled.first_mask(right)))
+
+        self.nullable = bytearray(self.symbol_count)
+        for nt in compiled.nullable:
+            self.nullable[symbol_ids[nt]] = 1
+
+        # A production deriving ε for each nullable non-terminal, using only
+        # non-terminals given one before it, so empty subtrees are finite
+        self.empty_production = {}
+        changed = True
+        while changed:
+            changed = False
+            for index, (left, right) in enumerate(self.productions[1:], 1):
+                symbol = symbol_ids[left]
+                if symbol in self.empty_production:
+                    continue
+                if all(symbol_ids[s] in self.empty_production for s in right):
+                    self.empty_production[symbol] = index
+                    changed = True
+
+
+def create_earley_grammar(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if compiled.earley is None:
+        compiled.earley = EarleyGrammar(compiled)
+    return compiled.earley
+
+
+class Chart:
+    # The item sets of one parse. waiting_* index every finished set's
+    # entries whose dot is before a non-terminal, sorted by that non-terminal
+    def __init__(self, grammar, ids):
+        self.grammar = grammar
+        self.ids = ids
+        self.entry_item = array('i')
+        self.entry_origin = array('i')
+        self.set_start = array('i', [0])
+        self.waiting_symbol = array('i')
+        self.waiting_entry = array('i')
+        self.waiting_start = array('i', [0])
+        self.accepted = False
+        # Per-set lookups, built on demand when a tree is extracted
+        self.indexes = {}
+        self.completions = {}
+        # For each item Leo's optimization added, keyed by (item, origin,
+        # position) packed like leo_items, the completed entry it stands for
+        self.leo_bottoms = {}
+        self.links = {}
+
+    def __len__(self):
+        return self.set_start[-1]
+
+    def waiting(self, position, symbol):
+        # Range of waiting_entry holding the entries of set position that
+        # wait for symbol
+        lo = self.waiting_start[position]
+        hi = self.waiting_start[position + 1]
+        return (bisect_left(self.waiting_symbol, symbol, lo, hi),
+                bisect_right(self.waiting_symbol, symbol, lo, hi))
+
+    def index(self, position):
+        index = self.indexes.get(position)
+        if index is None:
+            item_count = len(self.grammar.item_symbol)
+            index = {}
+            for entry in range(self.set_start[position], self.set_start[position + 1]):
+                index[self.entry_origin[entry] * item_count + self.entry_item[entry]] = entry
+            self.indexes[position] = index
+        return index
+
+    def completed(self, position):
+        # Complete entries of set position by left side: (origin, entry) pairs
+        completed = self.completions.get(position)
+        if completed is None:
+            grammar = self.grammar
+            completed = {}
+            for entry in range(self.set_start[position], self.set_start[position + 1]):
+                item = self.entry_item[entry]
+                if grammar.item_symbol[item] == NO_SYMBOL:
+                    left = grammar.production_left[grammar.item_production[item]]
+                    completed.setdefault(left, []).append((self.entry_origin[entry], entry))
+            self.completions[position] = completed
+        return completed
+
+    def link(self, entry, position):
+        # (child, predecessor) of an item added by Leo's optimization, or of
+        # one of the completion chain items it skipped. The chain is put back
+        # the first time it is asked for, as entries past the last set, so a
+        # tree only pays for the chains it goes through
+        link = self.links.get(entry)
+        if link is not None or entry >= self.set_start[-1]:
+            return link
+
+        span = len(self.ids) + 1
+        item = self.entry_item[entry]
+        origin = self.entry_origin[entry]
+        child = self.leo_bottoms.get((item * span + origin) * span + position)
+        if child is None:
+            return None
+
+        grammar = self.grammar
+        while True:
+            start = self.entry_origin[child]
+            symbol = grammar.production_left[grammar.item_production[self.entry_item[child]]]
+            predecessor = self.waiting_entry[self.waiting(start, symbol)[0]]
+            parent_item = self.entry_item[predecessor] + 1
+            parent_origin = self.entry_origin[predecessor]
+            if parent_item == item and parent_origin == origin:
+                self.links[entry] = (child, predecessor)
+                return self.links[entry]
+
+            parent = len(self.entry_item)
+            self.entry_item.append(parent_item)
+            self.entry_origin.append(parent_origin)
+            self.links[parent] = (child, predecessor)
+            child = parent
+
+    def split(self, entry, position):
+        # The parts of one derivation of a complete entry of set position,
+        # right to left: an item's predecessor (dot one symbol back) and the
+        # entries it is completed with always come before it in the chart,
+        # so requiring smaller entry numbers keeps the choice well-founded
+        grammar = self.grammar
+        item_count = len(grammar.item_symbol)
+        item = self.entry_item[entry]
+        origin = self.entry_origin[entry]
+        first = grammar.first_item[grammar.item_production[item]]
+
+        parts = []
+        bound = entry
+        link = self.link(entry, position)
+        if link is not None:
+            child, bound = link
+            item -= 1
+            parts.append((NON_TERMINAL, child, position))
+            position = self.entry_origin[child]
+
+        while item > first:
+            item -= 1
+            symbol = grammar.item_symbol[item]
+            key = origin * item_count + item
+
+            if symbol < grammar.terminal_count:
+                position -= 1
+                parts.append((TERMINAL, position))
+                bound = self.index(position)[key]
+                continue
+
+            if grammar.nullable[symbol]:
+                previous = self.index(position).get(key)
+                if previous is not None and previous < bound:
+                    parts.append((EMPTY, symbol, position))
+                    bound = previous
+                    continue
+
+            for start, child in self.completed(position).get(symbol, ()):
+                if start < origin or start == position or child >= bound:
+                    continue
+                previous = self.index(start).get(key)
+                if previous is not None:
+                    parts.append((NON_TERMINAL, child, position))
+                    position = start
+                    bound = previous
+                    break
+
+        parts.reverse()
+        return parts
+
+
+def recognize(grammar, ids, leo=True):
+    # Fills a Chart for ids; chart.accepted tells whether they are a
+    # sentence. Parsing stops at the first token no item can shift
+    terminal_count = grammar.terminal_count
+    symbol_count = grammar.symbol_count
+    item_count = len(grammar.item_symbol)
+    item_symbol = grammar.item_symbol
+    item_production = grammar.item_production
+    production_left = grammar.production_left
+    predictions = grammar.predictions
+    nullable = grammar.nullable
+
+    chart = Chart(grammar, ids)
+    entry_item = chart.entry_item
+    entry_origin = chart.entry_origin
+    set_start = chart.set_start
+    waiting_symbol = chart.waiting_symbol
+    waiting_entry = chart.waiting_entry
+    waiting_start = chart.waiting_start
+
+    # leo_items[origin * symbol_count + symbol] is the topmost item of the
+    # completion chain, packed as item * (length + 1) + origin, or -1
+    leo_items = {}
+    leo_bottoms = chart.leo_bottoms
+    length = len(ids)
+    span = length + 1
+
+    def leo_item(origin, symbol):
+        keys = []
+        candidates = []
+        chain = set()
+        result = -1
+        while True:
+            key = origin * symbol_count + symbol
+            if key in leo_items:
+                result = leo_items[key]
+                break
+            if key in chain:
+                break
+            lo, hi = chart.waiting(origin, symbol)
+            if hi - lo != 1:
+                leo_items[key] = -1
+                break
+            entry = waiting_entry[lo]
+            item = entry_item[entry] + 1
+            if item_symbol[item] != NO_SYMBOL:
+                leo_items[key] = -1
+                break
+
+            chain.add(key)
+            keys.append(key)
+            candidates.append(item * span + entry_origin[entry])
+            origin = entry_origin[entry]
+            symbol = production_left[item_production[item]]
+            if symbol == NO_SYMBOL:
+                break
+
+        # Every item of the chain leads to the same topmost one
+        for key, candidate in zip(reversed(keys), reversed(candidates)):
+            if result == -1:
+                result = candidate
+            leo_items[key] = result
+        return result
+
+    scanned = [(grammar.first_item[0], 0)]
+    for position in range(length + 1):
+        token = ids[position] if position < length else END_MARKER
+        bit = 1 << token
+        seen = set()
+        predicted = set()
+        next_scanned = []
+
+        def add(item, origin):
+            key = origin * item_count + item
+            if key not in seen:
+                seen.add(key)
+                entry_item.append(item)
+                entry_origin.append(origin)
+
+        for item, origin in scanned:
+            add(item, origin)
+
+        entry = set_start[position]
+        while entry < len(entry_item):
+            item = entry_item[entry]
+            origin = entry_origin[entry]
+            entry += 1
+            symbol = item_symbol[item]
+
+            if symbol == NO_SYMBOL:
+                # Completions within this set were made by the nullable rule
+                left = production_left[item_production[item]]
+                if origin == position or left == NO_SYMBOL:
+                    continue
+
+                if leo:
+                    top = leo_item(origin, left)
+                    if top != -1:
+                        # Remembered only when this adds the item: an older
+                        # entry was derived otherwise, maybe from this one
+                        count = len(entry_item)
+                        add(top // span, top % span)
+                        if len(entry_item) > count:
+                            leo_bottoms[top * span + position] = entry - 1
+                        continue
+
+                lo, hi = chart.waiting(origin, left)
+                for waiting in range(lo, hi):
+                    parent = waiting_entry[waiting]
+                    add(entry_item[parent] + 1, entry_origin[parent])
+
+            elif symbol < terminal_count:
+                if symbol == token:
+                    next_scanned.append((item + 1, origin))
+
+            else:
+                if symbol not in predicted:
+                    predicted.add(symbol)
+                    for first, mask in predictions[symbol - terminal_count]:
+                        if mask & bit or mask & EPSILON:
+                            add(first, position)
+                if nullable[symbol]:
+                    add(item + 1, origin)
+
+        # Index the finished set's entries by the non-terminal they wait for
+        start = set_start[position]
+        pending = sorted((item_symbol[entry_item[entry]], entry)
+                         for entry in range(start, len(entry_item))
+                         if item_symbol[entry_item[entry]] >= terminal_count)
+        for symbol, entry in pending:
+            waiting_symbol.append(symbol)
+            waiting_entry.append(entry)
+        waiting_start.append(len(waiting_symbol))
+        set_start.append(len(entry_item))
+
+        if position == length:
+            # S' -> S• from the first set
+            chart.accepted = grammar.first_item[0] + 1 in seen
+        elif not next_scanned:
+            break
+        scanned = next_scanned
+
+    return chart
+
+
+def build_tree(chart, tree):
+    # One derivation of an accepted chart as a SyntaxTree, built bottom-up
+    # without recursion
+    grammar = chart.grammar
+    ids = chart.ids
+    tree.clear(grammar)
+
+    def empty_tree(symbol, position):
+        production = grammar.empty_production[symbol]
+        _, right = grammar.productions[production]
+        children = [empty_tree(grammar.symbol_ids[child], position) for child in right]
+        return tree.reduce(symbol, production, children, position)
+
+    length = len(ids)
+    accept = chart.index(length)[grammar.first_item[0] + 1]
+    stack = [[accept, length, chart.split(accept, length), 0, []]]
+    while True:
+        frame = stack[-1]
+        entry, position, parts, k, built = frame
+        if k < len(parts):
+            frame[3] += 1
+            part = parts[k]
+            if part[0] == TERMINAL:
+                built.append(tree.leaf(ids[part[1]], part[1]))
+            elif part[0] == EMPTY:
+                built.append(empty_tree(part[1], part[2]))
+            else:
+                stack.append([part[1], part[2], chart.split(part[1], part[2]), 0, []])
+            continue
+
+        stack.pop()
+        if not stack:
+            tree.root = built[0]
+            return tree
+
+        production = grammar.item_production[chart.entry_item[entry]]
+        stack[-1][4].append(tree.reduce(grammar.production_left[production], production,
+                                        built, position))
+
+
+def parse(grammar_data, tokens, tree=None):
+    # Quiet counterpart of print_parse, like the parse() functions of the
+    # table-driven parsers; tokens missing from the grammar are rejected
+    grammar = create_earley_grammar(grammar_data)
+    return parse_ids(grammar, token_ids(tokens, grammar.terminal_index), tree)
+
+
+def parse_ids(grammar, ids, tree=None):
+    chart = recognize(grammar, ids)
+    if chart.accepted and tree is not None:
+        build_tree(chart, tree)
+    return chart.accepted
+
+
+def print_parse(grammar_data, input_string):
+    grammar = create_earley_grammar(grammar_data)
+    tokens = list(input_string)
+    tree = SyntaxTree()
+    chart = recognize(grammar, token_ids(tokens, grammar.terminal_index))
+    separator = symbol_separator(grammar_data)
+
+    print(f"\nEarley chart: {len(chart)} items in {len(chart.set_start) - 1} sets")
+    if not chart.accepted:
+        print(f"No parse for '{format_symbols(tokens, separator)}'.")
+        return False
+
+    build_tree(chart, tree)
+    print(tree.format(tokens=tokens))
+    return True
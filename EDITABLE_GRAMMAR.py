@@ -0,0 +1,458 @@
+import time
+
+from COMPILED_GRAMMAR import CompiledGrammar
+from FIRST_FOLLOW import EPSILON, FIRST_MASK, digraph
+from SLR1_PARSER import LR0Items, build_lr_table
+
+
+class KernelInfo:
+    # What the LR(0) automaton and the SLR(1) table remember about one state,
+    # identified across edits by its kernel. Kernels hold item numbers that
+    # EditableGrammar gives each production once, so they survive edits
+    __slots__ = ('successors', 'symbols', 'completed', 'row')
+
+    def __init__(self, successors, symbols, completed):
+        # successors: (symbol, successor kernel) pairs in sorted symbol order
+        # symbols: non-terminals closed over, kernel left sides and every
+        # symbol after a dot; an edit touching one of them invalidates the state
+        # completed: left sides of the completed items, whose FOLLOW sets
+        # decide the reductions
+        # row: the state's reductions as (terminal, action) pairs, kept only
+        # for conflict-free rows
+        self.successors = successors
+        self.symbols = symbols
+        self.completed = completed
+        self.row = None
+
+
+class EditableGrammar:
+    # A grammar that can be edited one production at a time. After an edit
+    # only the affected part of the analysis is recomputed: nullable, FIRST
+    # and FOLLOW over the non-terminals that depend on the edited ones, and
+    # the LR(0) states and SLR(1) rows whose items involve them
+    def __init__(self, grammar_data):
+        self.grammar = {nt: list(productions) for nt, productions in grammar_data['grammar'].items()}
+        self.tokens = grammar_data.get('tokens')
+
+        # occurrences[symbol] holds every (left, production) using symbol
+        self.occurrences = {}
+        for nt, productions in self.grammar.items():
+            for production in productions:
+                self._index(nt, production, True)
+
+        self.kernels = {}
+        self.item_bases = {}
+        self.next_item = 0
+        self.last_update = {}
+        self._analyze()
+
+    def _index(self, nt, production, add):
+        for symbol in set(production):
+            uses = self.occurrences.setdefault(symbol, {})
+            if add:
+                uses[(nt, production)] = True
+            else:
+                del uses[(nt, production)]
+                if not uses:
+                    del self.occurrences[symbol]
+
+    def _grammar_data(self):
+        non_terminals = set(self.grammar)
+        grammar_data = {
+            'grammar': self.grammar,
+            'terminals': set(self.occurrences) - non_terminals,
+            'non_terminals': non_terminals
+        }
+        if self.tokens is not None:
+            grammar_data['tokens'] = self.tokens
+        return grammar_data
+
+    def _analyze(self):
+        # Full analysis, used at the start and when the start symbol changes
+        grammar_data = self._grammar_data()
+        compiled = CompiledGrammar(grammar_data)
+        self.start_symbol = compiled.start_symbol
+        self.terminal_list = list(compiled.terminal_list)
+        self.terminal_index = dict(compiled.terminal_index)
+        self.nullable = set(compiled.nullable)
+        self.first_masks = dict(compiled.first_masks)
+        self.follow_masks = dict(compiled.follow_masks)
+
+        self.kernels = {}
+        self.pending_symbols = set()
+        self.pending_follow = set()
+        self._compile(grammar_data)
+
+    def _compile(self, grammar_data):
+        sets = (self.terminal_list, self.terminal_index, self.nullable,
+                self.first_masks, self.follow_masks)
+        self.compiled = CompiledGrammar(grammar_data, sets)
+        grammar_data['compiled'] = self.compiled
+        self.grammar_data = grammar_data
+
+    def add_production(self, nt, production):
+        if production in self.grammar.get(nt, ()):
+            return False
+
+        self.grammar.setdefault(nt, []).append(production)
+        self._index(nt, production, True)
+        self._edited(nt, production)
+        return True
+
+    def remove_production(self, nt, production):
+        if production not in self.grammar.get(nt, ()):
+            return False
+        if len(self.grammar) == 1 and len(self.grammar[nt]) == 1:
+            raise ValueError("Cannot remove the last production of the grammar")
+
+        self.grammar[nt].remove(production)
+        if not self.grammar[nt]:
+            del self.grammar[nt]
+        self._index(nt, production, False)
+        self._edited(nt, production)
+        return True
+
+    def _edited(self, nt, production):
+        start = time.perf_counter()
+
+        if next(iter(self.grammar)) != self.start_symbol:
+            self._analyze()
+            self.last_update = {'full': True, 'time': time.perf_counter() - start}
+            return
+
+        grammar_data = self._grammar_data()
+        non_terminals = grammar_data['non_terminals']
+
+        # A symbol that gained its first production or lost its last one
+        # switches between terminal and non-terminal
+        flipped = {symbol for symbol in set(production) | {nt}
+                   if (symbol in non_terminals) != (symbol in self.follow_masks)}
+
+        for symbol in set(production) | flipped:
+            if symbol in non_terminals:
+                if symbol in flipped:
+                    self.first_masks[symbol] = 0
+                    self.follow_masks[symbol] = 0
+            elif symbol in self.occurrences:
+                if symbol not in self.terminal_index:
+                    self.terminal_index[symbol] = len(self.terminal_list)
+                    self.terminal_list.append(symbol)
+                self.first_masks[symbol] = 1 << self.terminal_index[symbol]
+                self.follow_masks.pop(symbol, None)
+                self.nullable.discard(symbol)
+            else:
+                # No longer used anywhere; its terminal bit stays allocated
+                self.first_masks.pop(symbol, None)
+                self.follow_masks.pop(symbol, None)
+                self.nullable.discard(symbol)
+
+        changed = {nt} | flipped
+        changed_nullable = self._update_nullable(changed, non_terminals)
+        changed_first = self._update_first(changed | changed_nullable, non_terminals)
+        changed_follow = self._update_follow(changed_first | flipped, production, non_terminals)
+
+        # Remembered until the tables are next rebuilt
+        self.pending_symbols |= changed
+        self.pending_follow |= changed_follow
+
+        self._compile(grammar_data)
+        self.last_update = {
+            'full': False,
+            'nullable': len(changed_nullable),
+            'first': len(changed_first),
+            'follow': len(changed_follow),
+            'time': time.perf_counter() - start
+        }
+
+    def _users(self, symbols, non_terminals):
+        # Non-terminals with a production using one of symbols
+        return {left for symbol in symbols for left, _ in self.occurrences.get(symbol, ())
+                if left in non_terminals}
+
+    def _closure(self, seeds, dependents):
+        region = set(seeds)
+        work = list(seeds)
+        while work:
+            for dependent in dependents(work.pop()):
+                if dependent not in region:
+                    region.add(dependent)
+                    work.append(dependent)
+        return region
+
+    def _update_nullable(self, changed, non_terminals):
+        # Only non-terminals whose productions (transitively) use a changed
+        # symbol can change; symbols outside that region keep their value
+        region = self._closure(
+            self._users(changed, non_terminals) | (changed & non_terminals),
+            lambda symbol: self._users((symbol,), non_terminals))
+
+        before = self.nullable & region
+        self.nullable -= region
+
+        pending = []
+        uses = {nt: [] for nt in region}
+        worklist = []
+        for nt in region:
+            for production in self.grammar[nt]:
+                index = len(pending)
+                if production == 'ε':
+                    pending.append((nt, 0))
+                    worklist.append(nt)
+                    continue
+
+                count = 0
+                for symbol in production:
+                    if symbol in region:
+                        uses[symbol].append(index)
+                        count += 1
+                    elif symbol not in self.nullable:
+                        count = -1
+                        break
+
+                pending.append((nt, count))
+                if count == 0:
+                    worklist.append(nt)
+
+        while worklist:
+            nt = worklist.pop()
+            if nt in self.nullable:
+                continue
+            self.nullable.add(nt)
+
+            for index in uses[nt]:
+                left, count = pending[index]
+                if count <= 0:
+                    continue
+                count -= 1
+                pending[index] = (left, count)
+                if count == 0 and left not in self.nullable:
+                    worklist.append(left)
+
+        return before ^ (self.nullable & region)
+
+    def _first_users(self, symbol, non_terminals):
+        # Non-terminals whose FIRST includes FIRST(symbol): symbol follows a
+        # nullable prefix in one of their productions
+        for left, production in self.occurrences.get(symbol, ()):
+            if left not in non_terminals or production == 'ε':
+                continue
+            for other in production:
+                if other == symbol:
+                    yield left
+                    break
+                if other not in self.nullable:
+                    break
+
+    def _update_first(self, changed, non_terminals):
+        # A changed symbol alters the FIRST contribution of every production
+        # using it; the change then flows up through FIRST inclusion
+        seeds = (changed & non_terminals) | self._users(changed, non_terminals)
+        region = self._closure(seeds, lambda symbol: self._first_users(symbol, non_terminals))
+
+        first_masks = self.first_masks
+        before = {nt: first_masks[nt] for nt in region}
+        includes = {nt: set() for nt in region}
+
+        for nt in region:
+            first_masks[nt] = 0
+        for nt in region:
+            for production in self.grammar[nt]:
+                if production == 'ε':
+                    continue
+                for symbol in production:
+                    if symbol in region:
+                        includes[nt].add(symbol)
+                    else:
+                        first_masks[nt] |= first_masks[symbol] & ~EPSILON
+                    if symbol not in self.nullable:
+                        break
+
+        digraph(list(region), includes, first_masks)
+
+        for nt in region & self.nullable:
+            first_masks[nt] |= EPSILON
+
+        return {nt for nt in region if first_masks[nt] != before[nt]} | (changed - non_terminals)
+
+    def _follow_users(self, symbol, non_terminals):
+        # Non-terminals whose FOLLOW includes FOLLOW(symbol): they end one of
+        # its productions, up to a nullable suffix
+        for production in self.grammar.get(symbol, ()):
+            if production == 'ε':
+                continue
+            for other in reversed(production):
+                if other in non_terminals:
+                    yield other
+                if other not in self.nullable:
+                    break
+
+    def _update_follow(self, changed, production, non_terminals):
+        # FOLLOW(B) depends on the symbols after B in the productions using
+        # it, so every non-terminal sharing a production with a changed
+        # symbol is a seed, as is every symbol of the edited production
+        seeds = {symbol for symbol in production if symbol in non_terminals}
+        for symbol in changed:
+            for _, user in self.occurrences.get(symbol, ()):
+                seeds.update(other for other in user if other in non_terminals)
+            if symbol in non_terminals:
+                seeds.add(symbol)
+
+        region = self._closure(seeds, lambda symbol: self._follow_users(symbol, non_terminals))
+
+        follow_masks = self.follow_masks
+        first_masks = self.first_masks
+        before = {nt: follow_masks.get(nt) for nt in region}
+        includes = {nt: set() for nt in region}
+        end_marker = 1 << self.terminal_index['$']
+
+        for nt in region:
+            follow_masks[nt] = end_marker if nt == self.start_symbol else 0
+        for nt in region:
+            for left, user in self.occurrences.get(nt, ()):
+                if left not in non_terminals or user == 'ε':
+                    continue
+                for i, symbol in enumerate(user):
+                    if symbol != nt:
+                        continue
+                    rest = FIRST_MASK(user[i + 1:], first_masks)
+                    follow_masks[nt] |= rest & ~EPSILON
+                    if rest & EPSILON:
+                        if left in region:
+                            includes[nt].add(left)
+                        else:
+                            follow_masks[nt] |= follow_masks[left]
+
+        digraph(list(region), includes, follow_masks)
+
+        return {nt for nt in region if follow_masks[nt] != before[nt]}
+
+    def slr_table(self):
+        # Rebuilds the LR(0) automaton and SLR(1) table into the current
+        # compiled grammar, reusing the successors and rows of every state
+        # the edits since the last call did not touch
+        start = time.perf_counter()
+        compiled = self.compiled
+        if compiled.slr_table is not None:
+            return compiled.slr_table
+
+        item_table = LR0Items(compiled)
+        compiled.lr0_items = item_table
+
+        # Kernels are sets of stable item numbers, which survive edits
+        item_keys = []
+        for left, right in compiled.productions:
+            base = self._item_base(left, right)
+            item_keys.extend(range(base, base + len(right) + 1))
+        items_by_key = dict(zip(item_keys, item_table.items))
+
+        pending = self.pending_symbols
+        old_kernels = self.kernels
+        kernels = {}
+        reused_states = 0
+
+        initial = frozenset({item_keys[0]})
+        order = [initial]
+        state_index = {initial: 0}
+        states = []
+        transitions = {}
+
+        i = 0
+        while i < len(order):
+            kernel = order[i]
+            closure = item_table.closure([items_by_key[key] for key in kernel])
+            states.append(closure)
+
+            info = old_kernels.get(kernel)
+            if info is not None and info.symbols.isdisjoint(pending):
+                reused_states += 1
+            else:
+                info = self._kernel_info(closure, item_keys)
+            kernels[kernel] = info
+
+            for symbol, successor in info.successors:
+                if successor not in state_index:
+                    state_index[successor] = len(order)
+                    order.append(successor)
+                transitions[(i, symbol)] = state_index[successor]
+
+            i += 1
+
+        compiled.lr0_automaton = (states, transitions)
+
+        # Reused rows keep their reductions; shifts and gotos come from the
+        # transitions, whose state numbers may have moved
+        non_terminals = compiled.non_terminals
+        action = {}
+        goto_table = {}
+        rebuild = []
+        for i, kernel in enumerate(order):
+            info = kernels[kernel]
+            if (info.row is None or kernel not in old_kernels or old_kernels[kernel] is not info
+                    or not info.completed.isdisjoint(self.pending_follow)):
+                info.row = None
+                rebuild.append(i)
+                continue
+
+            for terminal, act in info.row:
+                action[(i, terminal)] = act
+            for symbol, _ in info.successors:
+                if symbol in non_terminals:
+                    goto_table[(i, symbol)] = transitions[(i, symbol)]
+                else:
+                    action[(i, symbol)] = ('shift', transitions[(i, symbol)])
+
+        new_action, new_goto, conflicts = build_lr_table(
+            compiled, states, transitions,
+            lambda state, item: compiled.follow_mask(item.left), rebuild)
+        action.update(new_action)
+        goto_table.update(new_goto)
+
+        rows = {i: [] for i in rebuild}
+        for (i, terminal), act in new_action.items():
+            if act[0] != 'shift':
+                rows[i].append((terminal, act))
+        for conflict in conflicts:
+            rows.pop(conflict.state, None)
+        for i, row in rows.items():
+            kernels[order[i]].row = row
+
+        self.kernels = kernels
+        self.pending_symbols = set()
+        self.pending_follow = set()
+
+        compiled.grammar_data['conflicts'] = conflicts
+        compiled.slr_conflicts = conflicts
+        compiled.slr_table = (action, goto_table, states)
+
+        self.last_update.update({
+            'states': len(states),
+            'reused_states': reused_states,
+            'rebuilt_rows': len(rebuild),
+            'table_time': time.perf_counter() - start
+        })
+        return compiled.slr_table
+
+    def _item_base(self, left, right):
+        # Numbers the items of a production the first time it is seen
+        base = self.item_bases.get((left, right))
+        if base is None:
+            base = self.item_bases[(left, right)] = self.next_item
+            self.next_item += len(right) + 1
+        return base
+
+    def _kernel_info(self, closure, item_keys):
+        successors = {}
+        symbols = set()
+        completed = set()
+
+        for item in closure:
+            symbols.add(item.left)
+            next_sym = item.next_sym
+            if next_sym is None:
+                completed.add(item.left)
+            else:
+                symbols.add(next_sym)
+                successors.setdefault(next_sym, set()).add(item_keys[item.id] + 1)
+
+        return KernelInfo([(symbol, frozenset(successors[symbol])) for symbol in sorted(successors)],
+                          symbols, completed)
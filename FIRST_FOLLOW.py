@@ -1,5 +1,261 @@
+import INSTRUMENTATION as instrumentation
+
+# FIRST/FOLLOW sets are kept as integer bitmasks over interned terminals;
+# the set-returning functions below are thin adapters over them
+EPSILON = 1
+
+
+def compute_nullable(grammar_data):
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
+    grammar = grammar_data['grammar']
+    non_terminals = grammar_data['non_terminals']
+
+    nullable = set()
+
+    # For every production, count the symbols not yet known to be nullable
+    # and remember which productions each non-terminal occurs in
+    pending = []
+    occurrences = {nt: [] for nt in non_terminals}
+    worklist = []
+
+    for nt in non_terminals:
+        for production in grammar[nt]:
+            index = len(pending)
+            if production == 'ε':
+                pending.append((nt, 0))
+                worklist.append(nt)
+                continue
+
+            count = 0
+            for symbol in production:
+                if symbol in non_terminals:
+                    occurrences[symbol].append(index)
+                    count += 1
+                else:
+                    # A terminal can never vanish
+                    count = -1
+                    break
+
+            pending.append((nt, count))
+            if count == 0:
+                worklist.append(nt)
+
+    while worklist:
+        nt = worklist.pop()
+        if nt in nullable:
+            continue
+        nullable.add(nt)
+
+        for index in occurrences[nt]:
+            left, count = pending[index]
+            if count <= 0:
+                continue
+            count -= 1
+            pending[index] = (left, count)
+            if count == 0 and left not in nullable:
+                worklist.append(left)
+
+    if stats is not None:
+        stats.phase('nullable', started, productions=len(pending), nullable=len(nullable))
+
+    return nullable
+
+
+def digraph(nodes, relation, values):
+    # DeRemer & Pennello's digraph algorithm: makes values[x] (a bitmask) the
+    # union of its initial value and values[y] for every y reachable from x
+    # through relation, visiting each edge once and collapsing strongly
+    # connected components so that their members share one result
+    infinity = len(nodes) + 1
+    depth = {node: 0 for node in nodes}
+    stack = []
+
+    for root in nodes:
+        if depth[root]:
+            continue
+
+        stack.append(root)
+        depth[root] = len(stack)
+        work = [(root, iter(relation[root]), depth[root])]
+
+        while work:
+            node, successors, node_depth = work[-1]
+
+            for successor in successors:
+                if depth[successor] == 0:
+                    stack.append(successor)
+                    depth[successor] = len(stack)
+                    work.append((successor, iter(relation[successor]), depth[successor]))
+                    break
+
+                depth[node] = min(depth[node], depth[successor])
+                values[node] |= values[successor]
+            else:
+                work.pop()
+
+                if depth[node] == node_depth:
+                    while True:
+                        top = stack.pop()
+                        depth[top] = infinity
+                        if top == node:
+                            break
+                        values[top] = values[node]
+
+                if work:
+                    parent = work[-1][0]
+                    depth[parent] = min(depth[parent], depth[node])
+                    values[parent] |= values[node]
+
+    return values
+
+
+def strongly_connected_components(nodes, relation):
+    # Tarjan's algorithm without recursion. Components come out in reverse
+    # topological order (a component before any that can reach it)
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(relation[root]))]
+
+        while work:
+            node, successors = work[-1]
+
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(relation[successor])))
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        top = stack.pop()
+                        on_stack.discard(top)
+                        component.append(top)
+                        if top == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def intern_terminals(grammar_data):
+
+    # Bit 0 is reserved for ε and bit 1 for the end marker '$'
+    terminal_list = ['ε', '$'] + sorted(grammar_data['terminals'] - {'ε', '$'})
+    terminal_index = {terminal: i for i, terminal in enumerate(terminal_list)}
+
+    return terminal_list, terminal_index
+
+
+def mask_to_set(mask, terminal_list):
+
+    result = set()
+    while mask:
+        lowest = mask & -mask
+        result.add(terminal_list[lowest.bit_length() - 1])
+        mask ^= lowest
+
+    return result
+
+
+def set_to_mask(symbols, terminal_index):
+
+    mask = 0
+    for symbol in symbols:
+        mask |= 1 << terminal_index[symbol]
+
+    return mask
+
+
+def compute_first_masks(grammar_data, terminal_index, nullable=None):
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
+    grammar = grammar_data['grammar']
+    terminals = grammar_data['terminals']
+    non_terminals = grammar_data['non_terminals']
+
+    if nullable is None:
+        nullable = compute_nullable(grammar_data)
+
+    first_masks = {}
+
+    for terminal in terminals:
+        first_masks[terminal] = 1 << terminal_index[terminal]
+
+    for nt in non_terminals:
+        first_masks[nt] = 0
+
+    # FIRST(A) includes FIRST(X) for every production A -> αXβ with α nullable
+    includes = {nt: set() for nt in non_terminals}
+
+    for nt in non_terminals:
+        for production in grammar[nt]:
+            if production == 'ε':
+                continue
+
+            for symbol in production:
+                if symbol in non_terminals:
+                    includes[nt].add(symbol)
+                else:
+                    first_masks[nt] |= first_masks[symbol]
+
+                if symbol not in nullable:
+                    break
+
+    digraph(non_terminals, includes, first_masks)
+
+    for nt in nullable:
+        first_masks[nt] |= EPSILON
+
+    # The digraph pass visits each node and edge of the relation once
+    if stats is not None:
+        stats.phase('first', started, nodes=len(non_terminals),
+                    edges=sum(len(successors) for successors in includes.values()))
+
+    return first_masks
+
+
 def compute_first_sets(grammar_data):
 
+    terminal_list, terminal_index = intern_terminals(grammar_data)
+    first_masks = compute_first_masks(grammar_data, terminal_index)
+
+    return {symbol: mask_to_set(mask, terminal_list) for symbol, mask in first_masks.items()}
+
+
+def compute_first_sets_fixpoint(grammar_data):
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
     grammar = grammar_data['grammar']
     terminals = grammar_data['terminals']
     non_terminals = grammar_data['non_terminals']
@@ -12,15 +268,17 @@ def compute_first_sets(grammar_data):
     for nt in non_terminals:
         first_sets[nt] = set()
 
+    passes = 0
     changed = True
     while changed:
         changed = False
+        passes += 1
 
         for nt in non_terminals:
             for production in grammar[nt]:
                 all_can_derive_epsilon = True
                 for symbol in production:
-                    new_symbols = first_sets[symbol]
+                    new_symbols = first_sets[symbol] - {'ε'}
                     old_size = len(first_sets[nt])
                     first_sets[nt].update(new_symbols)
                     if len(first_sets[nt]) > old_size:
@@ -34,9 +292,28 @@ def compute_first_sets(grammar_data):
                     first_sets[nt].add('ε')
                     changed = True
 
+    if stats is not None:
+        stats.phase('first_fixpoint', started, passes=passes)
+
     return first_sets
 
 
+def FIRST_MASK(string, first_masks):
+
+    if not string:
+        return EPSILON
+
+    result = 0
+    for symbol in string:
+        symbol_first = first_masks[symbol]
+        result |= symbol_first & ~EPSILON
+
+        if not symbol_first & EPSILON:
+            return result
+
+    return result | EPSILON
+
+
 def FIRST(grammar_data, string, first_sets=None):
 
     if first_sets is None:
@@ -46,7 +323,8 @@ def FIRST(grammar_data, string, first_sets=None):
         return {'ε'}
 
     if len(string) == 1:
-        return first_sets.get(string, {string})
+        symbol = string[0]
+        return first_sets.get(symbol, {symbol})
 
     result = set()
     all_can_derive_epsilon = True
@@ -66,22 +344,91 @@ def FIRST(grammar_data, string, first_sets=None):
     return result
 
 
+def compute_follow_masks(grammar_data, first_masks, terminal_index):
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
+    grammar = grammar_data['grammar']
+    non_terminals = grammar_data['non_terminals']
+
+    follow_masks = {nt: 0 for nt in non_terminals}
+
+    start_symbol = list(grammar.keys())[0]
+    follow_masks[start_symbol] |= 1 << terminal_index['$']
+
+    # FOLLOW(B) includes FOLLOW(A) for every production A -> αBβ with β nullable
+    includes = {nt: set() for nt in non_terminals}
+
+    for nt in non_terminals:
+        for production in grammar[nt]:
+            if production == 'ε':
+                continue
+
+            # Walk right to left, carrying FIRST of the suffix after each symbol
+            trailer = 0
+            rest_is_nullable = True
+
+            for symbol in reversed(production):
+                if symbol in non_terminals:
+                    follow_masks[symbol] |= trailer
+                    if rest_is_nullable:
+                        includes[symbol].add(nt)
+
+                symbol_first = first_masks[symbol]
+                if symbol_first & EPSILON:
+                    trailer |= symbol_first & ~EPSILON
+                else:
+                    trailer = symbol_first
+                    rest_is_nullable = False
+
+    digraph(non_terminals, includes, follow_masks)
+
+    if stats is not None:
+        stats.phase('follow', started, nodes=len(non_terminals),
+                    edges=sum(len(successors) for successors in includes.values()))
+
+    return follow_masks
+
+
 def compute_follow_sets(grammar_data, first_sets=None):
 
+    terminal_list, terminal_index = intern_terminals(grammar_data)
+
+    if first_sets is None:
+        first_masks = compute_first_masks(grammar_data, terminal_index)
+    else:
+        first_masks = {symbol: set_to_mask(first, terminal_index)
+                       for symbol, first in first_sets.items()}
+
+    follow_masks = compute_follow_masks(grammar_data, first_masks, terminal_index)
+
+    return {nt: mask_to_set(mask, terminal_list) for nt, mask in follow_masks.items()}
+
+
+def compute_follow_sets_fixpoint(grammar_data, first_sets=None):
+
     grammar = grammar_data['grammar']
     non_terminals = grammar_data['non_terminals']
 
     if first_sets is None:
-        first_sets = compute_first_sets(grammar_data)
+        first_sets = compute_first_sets_fixpoint(grammar_data)
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
 
     follow_sets = {nt: set() for nt in non_terminals}
 
     start_symbol = list(grammar.keys())[0]
     follow_sets[start_symbol].add('$')
 
+    passes = 0
     changed = True
     while changed:
         changed = False
+        passes += 1
 
         for nt in non_terminals:
             for production in grammar[nt]:
@@ -113,6 +460,9 @@ def compute_follow_sets(grammar_data, first_sets=None):
                             if len(follow_sets[symbol]) > old_size:
                                 changed = True
 
+    if stats is not None:
+        stats.phase('follow_fixpoint', started, passes=passes)
+
     return follow_sets
 
 
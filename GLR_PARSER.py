@@ -0,0 +1,381 @@
+from array import array
+
+from tabulate import tabulate
+
+from COMPILED_GRAMMAR import compile_grammar, format_production, format_symbols, symbol_separator
+from PARSE_TABLES import END_MARKER, token_ids
+import SLR1_PARSER as slr1
+
+NO_NODE = -1
+
+# Generalized LR parsing (Tomita's algorithm, in the formulation of Rekers
+# that also handles ε-productions) over the SLR(1) automaton. Conflicting
+# cells are kept instead of resolved: every action is tried, and the stacks
+# that result share their common parts in a graph-structured stack whose
+# nodes are [state, position, links, done]. A link (node, tree) points one
+# symbol down the stack; tree is that symbol's forest node when a Forest is
+# being built and None otherwise
+
+
+class GLRTable:
+    # The dense SLR(1) table (see PARSE_TABLES) plus, for each cell with a
+    # conflict, all of its actions in the same encoding
+    def __init__(self, dense, actions):
+        self.dense = dense
+        self.actions = actions
+
+
+def create_glr_table(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if 'glr' in compiled.dense_tables:
+        return compiled.dense_tables['glr']
+
+    dense = slr1.create_dense_table(compiled)
+    columns = dense.table.columns
+    numbering = {production: i for i, production in enumerate(compiled.productions)}
+
+    def encode(action):
+        act, value = action
+        if act == 'shift':
+            return value + 1
+        if act == 'reduce':
+            return -(numbering[value] + 1)
+        return -1
+
+    actions = {}
+    for conflict in compiled.slr_conflicts:
+        index = conflict.state * columns + dense.terminal_index[conflict.terminal]
+        cell = actions.setdefault(index, [encode(conflict.existing)])
+        code = encode(conflict.incoming)
+        if code not in cell:
+            cell.append(code)
+
+    table = GLRTable(dense, {index: tuple(cell) for index, cell in actions.items()})
+    compiled.dense_tables['glr'] = table
+    return table
+
+
+class Forest:
+    # Shared packed parse forest. A node is a symbol over a span of token
+    # positions, created once per (symbol, start, end) no matter how many
+    # stacks reach it; alternatives[n] lists the (production, children)
+    # pairs deriving it, so ambiguity costs one entry per extra derivation.
+    # Symbol ids are those of the dense tables, as in SyntaxTree
+    def __init__(self):
+        self.clear()
+
+    def clear(self, dense=None):
+        self.symbol_names = []
+        self.terminal_count = 0
+        self.productions = []
+        if dense is not None:
+            self.symbol_names = list(dense.terminal_list) + list(dense.non_terminal_list)
+            self.terminal_count = dense.terminal_count
+            self.productions = dense.productions
+
+        self.symbol = array('i')
+        self.start = array('i')
+        self.end = array('i')
+        self.alternatives = []
+        self.index = {}
+        self.index_end = 0
+        self.root = NO_NODE
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def node(self, symbol, start, end):
+        # The parser creates nodes in order of their end position, so only
+        # the nodes ending at the current one need to be looked up
+        if end != self.index_end:
+            self.index = {}
+            self.index_end = end
+
+        key = start * len(self.symbol_names) + symbol
+        node = self.index.get(key)
+        if node is None:
+            node = len(self.symbol)
+            self.index[key] = node
+            self.symbol.append(symbol)
+            self.start.append(start)
+            self.end.append(end)
+            self.alternatives.append([])
+        return node
+
+    def leaf(self, symbol, position):
+        return self.node(symbol, position, position + 1)
+
+    def add(self, symbol, production, children, start, end):
+        node = self.node(symbol, start, end)
+        packed = (production, children)
+        if packed not in self.alternatives[node]:
+            self.alternatives[node].append(packed)
+        return node
+
+    def name(self, node):
+        return self.symbol_names[self.symbol[node]]
+
+    def is_leaf(self, node):
+        return self.symbol[node] < self.terminal_count
+
+    def span(self, node):
+        return self.start[node], self.end[node]
+
+    def is_ambiguous(self, node):
+        return len(self.alternatives[node]) > 1
+
+    def reachable(self, node=None):
+        # Nodes reachable from node (the root by default), in preorder
+        if node is None:
+            node = self.root
+        if node == NO_NODE:
+            return []
+
+        seen = {node}
+        order = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for _, children in reversed(self.alternatives[node]):
+                for child in reversed(children):
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+
+        return order
+
+    def count_trees(self, node=None):
+        # Number of parse trees below node; None when a cyclic grammar makes
+        # it infinite. Children are counted before their parents
+        order = self.reachable(node)
+        if not order:
+            return 0
+
+        counts = {}
+        visiting = set()
+        stack = [(order[0], False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in counts:
+                continue
+            if expanded:
+                visiting.discard(node)
+                total = 0 if self.alternatives[node] else 1
+                for _, children in self.alternatives[node]:
+                    product = 1
+                    for child in children:
+                        product *= counts[child]
+                    total += product
+                counts[node] = total
+                continue
+            if node in visiting:
+                return None
+            visiting.add(node)
+            stack.append((node, True))
+            for _, children in self.alternatives[node]:
+                for child in children:
+                    if child not in counts:
+                        if child in visiting:
+                            return None
+                        stack.append((child, False))
+
+        return counts[order[0]]
+
+    def label(self, node):
+        start, end = self.span(node)
+        if self.is_leaf(node):
+            return self.name(node)
+        return f"{self.name(node)}[{start}:{end}]"
+
+
+def parse(grammar_data, tokens, forest=None):
+    # Quiet counterpart of print_parse, like the parse() functions of the
+    # deterministic parsers; the forest is built only when one is given
+    table = create_glr_table(grammar_data)
+    return parse_ids(table, token_ids(tokens, table.dense.terminal_index), forest)
+
+
+def parse_ids(table, ids, forest=None):
+    dense = table.dense
+    data = dense.table.data
+    columns = dense.table.columns
+    production_left = dense.production_left
+    production_length = dense.production_length
+    multiple = table.actions
+
+    if forest is not None:
+        forest.clear(dense)
+
+    length = len(ids)
+    position = 0
+    current = ids[0] if length else END_MARKER
+
+    bottom = [0, 0, [], False]
+    active = {0: bottom}
+    pending = [bottom]
+    # Reductions through a link added to an already processed node, the
+    # (state, id of the node below) pairs linked at this position and the
+    # ids of the nodes with a link to another node of this position
+    limited = []
+    linked = set()
+    local = set()
+    shifts = []
+    accepting = []
+
+    def actions(state):
+        index = state * columns + current
+        if index in multiple:
+            return multiple[index]
+        cell = data[index]
+        return (cell,) if cell else ()
+
+    def reducer(below, production, children):
+        goto_state = data[below[0] * columns + production_left[production]]
+        if not goto_state:
+            return
+
+        tree = None
+        if forest is not None:
+            tree = forest.add(production_left[production], production, children, below[1], position)
+
+        key = (goto_state - 1, id(below))
+        if key in linked:
+            # Same link, so the same forest node: the derivation was packed
+            # into it above
+            return
+        linked.add(key)
+
+        node = active.get(goto_state - 1)
+        if node is None:
+            node = [goto_state - 1, position, [(below, tree)], False]
+            active[goto_state - 1] = node
+            pending.append(node)
+        else:
+            link = (below, tree)
+            node[2].append(link)
+
+            # Stacks already processed at this position may reduce through
+            # the new link; the pending ones will find it by themselves
+            for other in active.values():
+                if other[3]:
+                    for code in actions(other[0]):
+                        if code < -1:
+                            limited.append((other, -code - 1, link, node))
+
+        if below[1] == position:
+            local.add(id(node))
+
+    def reductions(node, production, link, owner):
+        # Every path of the production's length down from node, only those
+        # through link (a link of owner) when one is given. Links lead to
+        # earlier positions except those made by ε-reductions, so a path
+        # that has not taken link yet only continues along the latter
+        remaining = production_length[production]
+
+        # A path without branches, the only kind in deterministic stretches
+        # of the input, is walked without the search below
+        if link is None:
+            children = ()
+            below = node
+            while remaining and len(below[2]) == 1:
+                target, tree = below[2][0]
+                children = (tree,) + children
+                below = target
+                remaining -= 1
+            if not remaining:
+                reducer(below, production, children)
+                return
+            node, trail = below, children
+        else:
+            trail = ()
+
+        work = [(node, remaining, trail, link is None)]
+        while work:
+            below, remaining, children, through = work.pop()
+            if not remaining:
+                if through:
+                    reducer(below, production, children)
+                continue
+            links = below[2]
+            if not through and id(below) not in local:
+                links = (link,) if below is owner else ()
+            for next_link in links:
+                if through or next_link is link or next_link[0][1] == position:
+                    work.append((next_link[0], remaining - 1, (next_link[1],) + children,
+                                 through or next_link is link))
+
+    while True:
+        while pending or limited:
+            if limited:
+                reductions(*limited.pop())
+                continue
+            node = pending.pop()
+            node[3] = True
+            for code in actions(node[0]):
+                if code > 0:
+                    shifts.append((node, code - 1))
+                elif code == -1:
+                    accepting.append(node)
+                else:
+                    reductions(node, -code - 1, None, None)
+
+        if current == END_MARKER:
+            if not accepting:
+                return False
+            if forest is not None:
+                forest.root = accepting[0][2][0][1]
+            return True
+
+        if not shifts:
+            return False
+
+        leaf = forest.leaf(current, position) if forest is not None else None
+        position += 1
+        current = ids[position] if position < length else END_MARKER
+
+        active = {}
+        linked = set()
+        local = set()
+        for below, state in shifts:
+            node = active.get(state)
+            if node is None:
+                node = [state, position, [], False]
+                active[state] = node
+                pending.append(node)
+            node[2].append((below, leaf))
+        shifts = []
+
+
+def print_forest(forest):
+    table = []
+
+    for node in forest.reachable():
+        if forest.is_leaf(node):
+            continue
+        for number, (production, children) in enumerate(forest.alternatives[node]):
+            left, right = forest.productions[production]
+            labels = [forest.label(child) for child in children]
+            table.append([forest.label(node) if number == 0 else "",
+                          f"{left} → {format_production(right)}",
+                          format_symbols(labels, ' ') if labels else 'ε'])
+
+    print(tabulate(table, headers=["Node", "Production", "Children"], tablefmt="grid"))
+
+
+def print_parse(grammar_data, input_string):
+    forest = Forest()
+    if not parse(grammar_data, list(input_string), forest):
+        separator = symbol_separator(grammar_data)
+        print(f"No parse for '{format_symbols(input_string, separator)}'.")
+        return False
+
+    print("\nShared packed parse forest:")
+    print_forest(forest)
+
+    count = forest.count_trees()
+    if count is None:
+        print("Infinitely many parse trees (the grammar has a cycle).")
+    elif count > 1:
+        print(f"{count} parse trees: the input is ambiguous.")
+    return True
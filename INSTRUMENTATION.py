@@ -0,0 +1,96 @@
+import json
+import time
+from contextlib import contextmanager
+
+from tabulate import tabulate
+
+# Opt-in instrumentation of table construction and parsing. Instrumented
+# functions read active once per call and only time and count when it is a
+# Stats; while it is None (the default) no clock is read and no event is
+# built. The drivers count their steps in a local int, guarded by the same
+# check on a local, and run on the same code path either way. Phases are
+# named after the dense_tables key of their table ('LL', 'create_slr_table',
+# 'create_lalr_table', 'create_lr1_table', each with ' comb' appended for a
+# compressed table), as in "create_slr_table parse"
+active = None
+
+
+class Stats:
+    # Totals of an instrumented run. phases maps a phase name to its calls,
+    # seconds and the counts it reported, summed over calls, and the density
+    # of the last table it built. Phases nest (create_slr_table runs
+    # canonical_collection, which may compute FIRST/FOLLOW), and their times
+    # include the phases they run. events, when given, is a text file that
+    # gets one JSON object per line for every phase run
+    def __init__(self, events=None):
+        self.phases = {}
+        self.events = events
+
+    def start(self):
+        return time.perf_counter()
+
+    def phase(self, name, started, **counts):
+        seconds = time.perf_counter() - started
+        totals = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        for key, value in counts.items():
+            if key == 'density':
+                totals[key] = value
+            else:
+                totals[key] = totals.get(key, 0) + value
+
+        if self.events is not None:
+            event = {'phase': name, 'seconds': seconds}
+            event.update(counts)
+            if counts.get('tokens'):
+                event['steps_per_token'] = counts['steps'] / counts['tokens']
+            self.events.write(json.dumps(event) + "\n")
+
+    def parsed(self, parser, started, tokens, steps):
+        # Called by the drivers' parse_ids on every return, with the steps
+        # they counted: derives and matches, or shifts and reduces, plus
+        # recovery steps
+        self.phase(f"{parser} parse", started, tokens=tokens, steps=steps)
+
+    def steps_per_token(self, parser):
+        totals = self.phases.get(f"{parser} parse")
+        if not totals or not totals['tokens']:
+            return None
+        return totals['steps'] / totals['tokens']
+
+    def as_dict(self):
+        return {name: dict(totals) for name, totals in self.phases.items()}
+
+    def __str__(self):
+        rows = []
+        for name, totals in self.phases.items():
+            counts = ", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                               for key, value in totals.items() if key not in ('calls', 'seconds'))
+            rows.append([name, totals['calls'], f"{totals['seconds'] * 1000:.2f}", counts])
+        return tabulate(rows, headers=["Phase", "Calls", "ms", "Counts"], tablefmt="grid")
+
+
+def enable(events=None):
+    # Starts collecting into a new Stats, for long-running processes;
+    # instrument() is the scoped form
+    global active
+    active = Stats(events)
+    return active
+
+
+def disable():
+    global active
+    stats, active = active, None
+    return stats
+
+
+@contextmanager
+def instrument(events=None):
+    global active
+    previous = active
+    active = stats = Stats(events)
+    try:
+        yield stats
+    finally:
+        active = previous
@@ -0,0 +1,135 @@
+from COMPILED_GRAMMAR import compile_grammar
+from FIRST_FOLLOW import digraph
+import SLR1_PARSER as slr1
+
+
+def compute_lalr_lookaheads(grammar_data):
+    # DeRemer & Pennello's LALR(1) lookahead computation over the LR(0)
+    # automaton. Returns {(state, production index): lookahead bitmask}
+    compiled = compile_grammar(grammar_data)
+    non_terminals = compiled.non_terminals
+    nullable = compiled.nullable
+    terminal_index = compiled.terminal_index
+
+    states, transitions = slr1.canonical_collection(compiled)
+    productions = slr1.lr0_items(compiled).productions
+
+    productions_of = {nt: [] for nt in non_terminals}
+    for index, (left, _) in enumerate(productions[1:], 1):
+        productions_of[left].append(index)
+
+    symbols_from = {}
+    for (state, symbol) in transitions:
+        symbols_from.setdefault(state, []).append(symbol)
+
+    nt_transitions = [key for key in transitions if key[1] in non_terminals]
+
+    # Read(p, A): terminals shifted right after the A transition, directly
+    # (DR) or through nullable non-terminals (the reads relation)
+    read_masks = {}
+    reads = {}
+
+    for (p, A) in nt_transitions:
+        r = transitions[(p, A)]
+        mask = 0
+        reads[(p, A)] = []
+
+        for symbol in symbols_from.get(r, ()):
+            if symbol in non_terminals:
+                if symbol in nullable:
+                    reads[(p, A)].append((r, symbol))
+            else:
+                mask |= 1 << terminal_index[symbol]
+
+        # S' -> S• accepts on the end marker
+        if p == 0 and A == compiled.start_symbol:
+            mask |= 1 << terminal_index['$']
+
+        read_masks[(p, A)] = mask
+
+    digraph(nt_transitions, reads, read_masks)
+
+    # Follow(p, A) adds Follow(p', B) for every B -> βAγ with γ nullable and
+    # p' --β--> p (the includes relation). Walking each production from p'
+    # also yields the lookback state where B -> ω is reduced
+    includes = {key: [] for key in nt_transitions}
+    lookback = {}
+
+    for (p, B) in nt_transitions:
+        for index in productions_of[B]:
+            right = productions[index][1]
+
+            path = []
+            state = p
+            for symbol in right:
+                path.append(state)
+                state = transitions[(state, symbol)]
+
+            rest_is_nullable = True
+            for j in range(len(right) - 1, -1, -1):
+                symbol = right[j]
+                if symbol in non_terminals and rest_is_nullable:
+                    includes[(path[j], symbol)].append((p, B))
+                if symbol not in nullable:
+                    rest_is_nullable = False
+
+            lookback.setdefault((state, index), []).append((p, B))
+
+    follow_masks = read_masks
+    digraph(nt_transitions, includes, follow_masks)
+
+    lookaheads = {}
+    for key, sources in lookback.items():
+        mask = 0
+        for source in sources:
+            mask |= follow_masks[source]
+        lookaheads[key] = mask
+
+    return lookaheads
+
+
+def create_lalr_table(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if compiled.lalr_table is not None:
+        return compiled.lalr_table
+
+    states, transitions = slr1.canonical_collection(compiled)
+    lookaheads = compute_lalr_lookaheads(compiled)
+
+    action, goto_table, conflicts = slr1.build_lr_table(
+        compiled, states, transitions,
+        lambda state, item: lookaheads.get((state, item.production), 0))
+
+    compiled.lalr_conflicts = conflicts
+    compiled.lalr_table = (action, goto_table, states)
+    return compiled.lalr_table
+
+
+def print_lalr_table(grammar_data):
+    slr1.print_slr_table(grammar_data, create_lalr_table, "LALR(1)")
+
+
+def print_reduction(grammar_data, input_string):
+    return slr1.print_reduction(grammar_data, input_string, create_lalr_table)
+
+
+def create_dense_table(grammar_data, compressed=False):
+    return slr1.create_dense_table(grammar_data, create_lalr_table, compressed)
+
+
+def parse(grammar_data, tokens, trace=None, tree=None, errors=None, compressed=False):
+    return slr1.parse(grammar_data, tokens, create_lalr_table, trace, tree, errors, compressed)
+
+
+def stream_parser(grammar_data):
+    return slr1.LRStreamParser(grammar_data, create_lalr_table)
+
+
+def is_lalr1(grammar_data):
+
+    create_lalr_table(grammar_data)
+
+    if compile_grammar(grammar_data).lalr_conflicts:
+        return False
+
+    return True
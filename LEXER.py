@@ -0,0 +1,329 @@
+from COMPILED_GRAMMAR import compile_grammar
+from PARSE_TABLES import ERROR_TOKEN
+
+# Table-driven lexer for grammars whose terminals are multi-character tokens.
+# Token definitions are regular expressions compiled to one Thompson NFA;
+# its DFA is built lazily by subset construction, one transition the first
+# time it is taken, so scanning costs one dict lookup per character.
+#
+# Supported syntax: literals, '.', escapes (\d \w \s \n \t \r and escaped
+# metacharacters), classes such as [a-z_] and [^"], grouping, '|', '*', '+'
+# and '?'.
+
+WHITESPACE = r'\s+'
+METACHARACTERS = set('\\.[]()|*+?^$')
+
+CLASS_ESCAPES = {
+    'd': frozenset('0123456789'),
+    'w': frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'),
+    's': frozenset(' \t\r\n\f\v'),
+}
+CHARACTER_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+
+
+class LexerError(ValueError):
+    def __init__(self, message, position):
+        super().__init__(message)
+        self.position = position
+
+
+class NFA:
+    # Edges carry character sets as (negated, frozenset) pairs
+    def __init__(self):
+        self.edges = []
+        self.epsilon = []
+        self.accept = {}
+
+    def new_state(self):
+        self.edges.append([])
+        self.epsilon.append([])
+        return len(self.edges) - 1
+
+
+class RegexParser:
+    # Recursive descent over the pattern, returning (start, end) fragments
+    def __init__(self, nfa, pattern):
+        self.nfa = nfa
+        self.pattern = pattern
+        self.pos = 0
+
+    def error(self, message):
+        return LexerError(f"{message} in pattern {self.pattern!r} at {self.pos}", self.pos)
+
+    def peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def parse(self):
+        fragment = self.alternation()
+        if self.pos < len(self.pattern):
+            raise self.error(f"Unexpected {self.peek()!r}")
+        return fragment
+
+    def alternation(self):
+        fragments = [self.concatenation()]
+        while self.peek() == '|':
+            self.pos += 1
+            fragments.append(self.concatenation())
+
+        if len(fragments) == 1:
+            return fragments[0]
+
+        nfa = self.nfa
+        start, end = nfa.new_state(), nfa.new_state()
+        for fragment_start, fragment_end in fragments:
+            nfa.epsilon[start].append(fragment_start)
+            nfa.epsilon[fragment_end].append(end)
+        return start, end
+
+    def concatenation(self):
+        nfa = self.nfa
+        start = end = nfa.new_state()
+        while self.peek() not in (None, '|', ')'):
+            fragment_start, fragment_end = self.repetition()
+            nfa.epsilon[end].append(fragment_start)
+            end = fragment_end
+        return start, end
+
+    def repetition(self):
+        nfa = self.nfa
+        start, end = self.atom()
+        while self.peek() in ('*', '+', '?'):
+            operator = self.pattern[self.pos]
+            self.pos += 1
+
+            new_start, new_end = nfa.new_state(), nfa.new_state()
+            nfa.epsilon[new_start].append(start)
+            nfa.epsilon[end].append(new_end)
+            if operator != '+':
+                nfa.epsilon[new_start].append(new_end)
+            if operator != '?':
+                nfa.epsilon[end].append(start)
+            start, end = new_start, new_end
+
+        return start, end
+
+    def atom(self):
+        char = self.peek()
+        if char is None:
+            raise self.error("Unexpected end")
+
+        if char == '(':
+            self.pos += 1
+            fragment = self.alternation()
+            if self.peek() != ')':
+                raise self.error("Missing ')'")
+            self.pos += 1
+            return fragment
+
+        if char in ('*', '+', '?', ')'):
+            raise self.error(f"Unexpected {char!r}")
+
+        if char == '[':
+            charset = self.character_class()
+        elif char == '.':
+            self.pos += 1
+            charset = (True, frozenset('\n'))
+        elif char == '\\':
+            charset = self.escape()
+        else:
+            self.pos += 1
+            charset = (False, frozenset(char))
+
+        nfa = self.nfa
+        start, end = nfa.new_state(), nfa.new_state()
+        nfa.edges[start].append((charset, end))
+        return start, end
+
+    def escape(self):
+        self.pos += 1
+        char = self.peek()
+        if char is None:
+            raise self.error("Dangling '\\'")
+        self.pos += 1
+
+        if char in CLASS_ESCAPES:
+            return False, CLASS_ESCAPES[char]
+        return False, frozenset(CHARACTER_ESCAPES.get(char, char))
+
+    def character_class(self):
+        self.pos += 1
+        negated = self.peek() == '^'
+        if negated:
+            self.pos += 1
+
+        chars = set()
+        first = True
+        while self.peek() != ']' or first:
+            first = False
+            char = self.peek()
+            if char is None:
+                raise self.error("Missing ']'")
+
+            if char == '\\':
+                _, escaped = self.escape()
+                if len(escaped) > 1:
+                    chars.update(escaped)
+                    continue
+                low = next(iter(escaped))
+            else:
+                low = char
+                self.pos += 1
+
+            # A range such as a-z; a trailing '-' is a literal
+            if self.peek() == '-' and self.pos + 1 < len(self.pattern) and self.pattern[self.pos + 1] != ']':
+                self.pos += 1
+                high = self.peek()
+                if high == '\\':
+                    _, escaped = self.escape()
+                    high = next(iter(escaped))
+                else:
+                    self.pos += 1
+                if ord(high) < ord(low):
+                    raise self.error(f"Bad range {low}-{high}")
+                chars.update(chr(code) for code in range(ord(low), ord(high) + 1))
+            else:
+                chars.add(low)
+
+        self.pos += 1
+        return negated, frozenset(chars)
+
+
+def escape(literal):
+    return ''.join('\\' + char if char in METACHARACTERS else char for char in literal)
+
+
+class Lexer:
+    # definitions is a list of (name, pattern); a None name marks text that
+    # is skipped, such as whitespace. On equal-length matches the earlier
+    # definition wins
+    def __init__(self, definitions):
+        self.names = [name for name, _ in definitions]
+        self.nfa = NFA()
+
+        start = self.nfa.new_state()
+        for index, (_, pattern) in enumerate(definitions):
+            fragment_start, fragment_end = RegexParser(self.nfa, pattern).parse()
+            self.nfa.epsilon[start].append(fragment_start)
+            self.nfa.accept[fragment_end] = index
+
+        # DFA states are numbered as they are discovered; dfa_moves[state]
+        # maps a character to the next state, or -1 when there is none
+        self.dfa_states = []
+        self.dfa_index = {}
+        self.dfa_accept = []
+        self.dfa_moves = []
+        self.start = self.dfa_state(self.closure({start}))
+
+    def closure(self, states):
+        epsilon = self.nfa.epsilon
+        closure = set(states)
+        work = list(states)
+        while work:
+            for target in epsilon[work.pop()]:
+                if target not in closure:
+                    closure.add(target)
+                    work.append(target)
+        return frozenset(closure)
+
+    def dfa_state(self, nfa_states):
+        state = self.dfa_index.get(nfa_states)
+        if state is None:
+            state = len(self.dfa_states)
+            self.dfa_index[nfa_states] = state
+            self.dfa_states.append(nfa_states)
+            accepted = [self.nfa.accept[s] for s in nfa_states if s in self.nfa.accept]
+            self.dfa_accept.append(min(accepted) if accepted else -1)
+            self.dfa_moves.append({})
+        return state
+
+    def move(self, state, char):
+        targets = set()
+        edges = self.nfa.edges
+        for nfa_state in self.dfa_states[state]:
+            for (negated, chars), target in edges[nfa_state]:
+                if (char in chars) != negated:
+                    targets.add(target)
+
+        next_state = self.dfa_state(self.closure(targets)) if targets else -1
+        self.dfa_moves[state][char] = next_state
+        return next_state
+
+    def matches(self, text):
+        # Yields (definition index, start, end) by maximal munch. (state, position)
+        # pairs from which no token end was reachable are remembered, so a
+        # failed lookahead is never repeated and scanning stays linear
+        length = len(text)
+        position = 0
+        dead = set()
+        dfa_moves = self.dfa_moves
+        dfa_accept = self.dfa_accept
+
+        while position < length:
+            state = self.start
+            i = position
+            token = -1
+            token_end = position
+            trail = []
+
+            while i < length and (state, i) not in dead:
+                next_state = dfa_moves[state].get(text[i])
+                if next_state is None:
+                    next_state = self.move(state, text[i])
+                if next_state < 0:
+                    break
+
+                state = next_state
+                i += 1
+                if dfa_accept[state] >= 0:
+                    token = dfa_accept[state]
+                    token_end = i
+                    trail.clear()
+                else:
+                    trail.append((state, i))
+
+            dead.update(trail)
+
+            if token < 0:
+                raise LexerError(f"Unexpected character {text[position]!r} at {position}", position)
+
+            if self.names[token] is not None:
+                yield token, position, token_end
+            position = token_end
+
+    def scan(self, text):
+        # Yields (name, lexeme, position) for every token that is not skipped
+        names = self.names
+        for token, start, end in self.matches(text):
+            yield names[token], text[start:end], start
+
+    def tokens(self, text):
+        return [name for name, _, _ in self.scan(text)]
+
+    def ids(self, text, terminal_index):
+        # Token ids for the dense drivers; names the grammar does not use map
+        # to the empty ε column, as in PARSE_TABLES.token_ids
+        kinds = [terminal_index.get(name, 0) for name in self.names]
+        for token, _, _ in self.matches(text):
+            yield kinds[token]
+
+
+def create_lexer(grammar_data):
+    # Terminals without a %token definition match their own spelling and are
+    # tried first, so keywords win over identifier patterns of equal length.
+    # The error token of error productions is never read from the input
+    compiled = compile_grammar(grammar_data)
+    if compiled.lexer is not None:
+        return compiled.lexer
+
+    definitions = compiled.grammar_data.get('tokens', [])
+    defined = {name for name, _ in definitions}
+    literals = sorted(compiled.terminals - defined - {'ε', '$', ERROR_TOKEN})
+
+    compiled.lexer = Lexer([(terminal, escape(terminal)) for terminal in literals]
+                           + list(definitions)
+                           + [(None, WHITESPACE)])
+    return compiled.lexer
+
+
+def tokenize(grammar_data, text):
+    return create_lexer(grammar_data).tokens(text)
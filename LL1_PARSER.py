@@ -1,8 +1,21 @@
-from FIRST_FOLLOW import FIRST, FOLLOW
+import INSTRUMENTATION as instrumentation
+from COMPILED_GRAMMAR import compile_grammar, format_production, format_symbols, symbol_separator
+from FIRST_FOLLOW import EPSILON, mask_to_set, strongly_connected_components
+from PARSE_TABLES import (END_MARKER, CombTable, DenseLLTable, DenseTable, ParseError,
+                          expected_terminals, ll_expansions, token_ids)
 from tabulate import tabulate
 
 
 def create_parsing_table(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if compiled.ll_table is not None:
+        return compiled.ll_table
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
+    grammar_data = compiled.grammar_data
     grammar = grammar_data['grammar']
     terminals = grammar_data['terminals'].copy()
     terminals.discard("ε")
@@ -12,18 +25,25 @@ def create_parsing_table(grammar_data):
     parsing_table = {nt: {t: None for t in terminals} for nt in non_terminals}
     for nt in non_terminals:
         for production in grammar[nt]:
-            first_set = FIRST(grammar_data, production)
+            first_set = compiled.first(production)
             for terminal in first_set:
                 if terminal != 'ε':
                     parsing_table[nt][terminal] = production
                 else:
-                    follow_set = FOLLOW(grammar_data, nt)
+                    follow_set = compiled.follow(nt)
                     for follow in follow_set:
                         parsing_table[nt][follow] = production
 
+    if stats is not None:
+        cells = len(non_terminals) * len(terminals)
+        filled = sum(1 for row in parsing_table.values() for production in row.values() if production)
+        stats.phase('ll_table', started, cells=cells, density=filled / cells if cells else 0.0)
+
+    compiled.ll_table = parsing_table
     return parsing_table
 
 def print_ll_table(grammar_data):
+    grammar_data = compile_grammar(grammar_data).grammar_data
     terminals = grammar_data['terminals'].copy()
     terminals.discard("ε")
     terminals.add("$")
@@ -34,7 +54,8 @@ def print_ll_table(grammar_data):
     table = []
 
     for r in non_terminals:
-        row = [r] + [parsing_table[r][c] for c in sorted(terminals)]
+        row = [r] + [format_production(parsing_table[r][c]) if parsing_table[r][c] else None
+                     for c in sorted(terminals)]
         table.append(row)
 
     print(tabulate(table, headers=headers, tablefmt="grid"))
@@ -42,6 +63,7 @@ def print_ll_table(grammar_data):
     return parsing_table
 
 def print_derivation(grammar_data, input):
+    grammar_data = compile_grammar(grammar_data).grammar_data
     grammar = grammar_data['grammar']
     terminals = grammar_data['terminals'].copy()
     terminals.discard("ε")
@@ -50,63 +72,510 @@ def print_derivation(grammar_data, input):
     start_symbol = next(iter(grammar.keys()))
 
     parsing_table = create_parsing_table(grammar_data)
-    input_string = input + "$"
+    compiled = compile_grammar(grammar_data)
+    input_string = list(input) + ["$"]
+    separator = symbol_separator(grammar_data)
+    input_pos = 0
     stack = ["$", start_symbol]
 
     derivation_table = []
 
+    # Syntax errors are recovered from in panic mode, as in parse_ids, so
+    # that one run lists all of them
+    errors = []
+    matched = True
+
+    def report(expected):
+        nonlocal matched
+        if matched:
+            errors.append(ParseError(input_pos, current_input, sorted(expected)))
+        matched = False
+
+    def recover(step, symbol):
+        errors[-1].recovery.append((step, symbol))
+        derivation_table.append([stack_str, input_str, f"Error: {step} '{symbol}'"])
+
     while True:
         stack_top = stack[-1]
-        current_input = input_string[0]
+        current_input = input_string[input_pos]
 
-        stack_str = "".join(stack)
+        stack_str = format_symbols(stack, separator)
+        input_str = format_symbols(input_string[input_pos:], separator)
 
         if stack_top == "$" and current_input == "$":
-            derivation_table.append([stack_str, input_string, "Accept"])
+            derivation_table.append([stack_str, input_str, "Reject" if errors else "Accept"])
             print(tabulate(derivation_table, headers=["Stack", "Input", "Action"], tablefmt="grid"))
-            return True
+            for error in errors:
+                print(error)
+            return not errors
 
         elif stack_top in terminals:
             if stack_top == current_input:
                 action = f"Match '{stack_top}'"
                 stack.pop()
 
-                derivation_table.append([stack_str, input_string, action])
-                input_string = input_string[1:]
+                derivation_table.append([stack_str, input_str, action])
+                input_pos += 1
+                matched = True
             else:
-                derivation_table.append([stack_str, input_string, "Reject"])
-                print(tabulate(derivation_table, headers=["Stack", "Input", "Action"], tablefmt="grid"))
-                return False
+                # A missing terminal is popped as if it had been read, but
+                # nothing can be read in place of the end marker: the rest
+                # of the input is parsed as a new sentence
+                report([stack_top])
+                if stack_top != "$":
+                    recover("pop", stack_top)
+                    stack.pop()
+                elif current_input in compiled.first((start_symbol,)) - {'ε'}:
+                    recover("resume", start_symbol)
+                    stack.append(start_symbol)
+                else:
+                    recover("skip", current_input)
+                    input_pos += 1
 
         elif stack_top in non_terminals:
             if parsing_table[stack_top].get(current_input):
                 production = parsing_table[stack_top][current_input]
-                action = f"Derive {stack_top} → {production}"
+                action = f"Derive {stack_top} → {format_production(production)}"
 
                 stack.pop()
                 if production != "ε":
                     for symbol in reversed(production):
                         stack.append(symbol)
 
-                derivation_table.append([stack_str, input_string, action])
+                derivation_table.append([stack_str, input_str, action])
             else:
-                derivation_table.append([stack_str, input_string, "Reject"])
-                print(tabulate(derivation_table, headers=["Stack", "Input", "Action"], tablefmt="grid"))
-                return False
+                # Input is skipped up to a token that can follow stack_top
+                report([t for t, production in parsing_table[stack_top].items() if production])
+                if current_input == "$" or current_input in compiled.follow(stack_top):
+                    recover("pop", stack_top)
+                    stack.pop()
+                else:
+                    recover("skip", current_input)
+                    input_pos += 1
 
         else:
-            derivation_table.append([stack_str, input_string, "Reject"])
+            derivation_table.append([stack_str, input_str, "Reject"])
             print(tabulate(derivation_table, headers=["Stack", "Input", "Action"], tablefmt="grid"))
             return False
 
+class LLConflict:
+    # kind is 'FIRST/FIRST' or 'FIRST/FOLLOW', for two alternatives of
+    # non_terminal that both predict terminals ('ε' when both are
+    # nullable), or 'left recursion', with cycle the non-terminals of one
+    # strongly connected component of the left-corner relation
+    def __init__(self, kind, non_terminal, productions=(), terminals=(), cycle=()):
+        self.kind = kind
+        self.non_terminal = non_terminal
+        self.productions = productions
+        self.terminals = terminals
+        self.cycle = cycle
+
+    def __repr__(self):
+        return (f"LLConflict({self.kind!r}, {self.non_terminal!r}, {self.productions!r}, "
+                f"{self.terminals!r}, {self.cycle!r})")
+
+    def __str__(self):
+        if self.kind == 'left recursion':
+            return f"Left recursion: {' -> '.join(list(self.cycle) + [self.cycle[0]])}"
+
+        first, second = (f"{self.non_terminal} -> {format_production(production)}"
+                         for production in self.productions)
+        return f"{self.kind} conflict: {first} and {second} both predict {', '.join(self.terminals)}"
+
+
+def ll1_conflicts(grammar_data):
+    # Every reason the grammar is not LL(1), from the FIRST/FOLLOW bitmasks:
+    # one predict mask per production, checked against the union of the
+    # masks of the earlier alternatives, so pairs are only compared once a
+    # clash is known. Linear in the grammar size when there is none
+    compiled = compile_grammar(grammar_data)
+    if compiled.ll_conflicts is not None:
+        return compiled.ll_conflicts
+
+    grammar = compiled.grammar
+    non_terminals = compiled.non_terminals
+    terminal_list = compiled.terminal_list
+    conflicts = []
+
+    def terminals(mask):
+        return sorted(mask_to_set(mask, terminal_list))
+
+    for nt, productions in grammar.items():
+        follow = compiled.follow_mask(nt)
+        firsts = []
+        predicts = []
+        seen = 0
+
+        for production in productions:
+            first = compiled.first_mask(production)
+            # A nullable alternative is also predicted by FOLLOW(nt); ε
+            # stays in the mask so that two nullable alternatives clash
+            predict = first | follow if first & EPSILON else first
+
+            if predict & seen:
+                for other, other_first, other_predict in zip(productions, firsts, predicts):
+                    common_first = first & other_first
+                    if common_first:
+                        conflicts.append(LLConflict('FIRST/FIRST', nt, (other, production),
+                                                    terminals(common_first)))
+                    common_follow = predict & other_predict & ~common_first
+                    if common_follow:
+                        conflicts.append(LLConflict('FIRST/FOLLOW', nt, (other, production),
+                                                    terminals(common_follow)))
+
+            firsts.append(first)
+            predicts.append(predict)
+            seen |= predict
+
+    # A is left-recursive when it reaches itself through the non-terminals
+    # that can begin its productions (after a nullable prefix)
+    left_corners = {nt: set() for nt in non_terminals}
+    for nt, productions in grammar.items():
+        for production in productions:
+            if production == 'ε':
+                continue
+            for symbol in production:
+                if symbol in non_terminals:
+                    left_corners[nt].add(symbol)
+                if symbol not in compiled.nullable:
+                    break
+
+    order = {nt: i for i, nt in enumerate(grammar)}
+    for component in strongly_connected_components(list(grammar), left_corners):
+        if len(component) > 1 or component[0] in left_corners[component[0]]:
+            cycle = sorted(component, key=order.get)
+            conflicts.append(LLConflict('left recursion', cycle[0], cycle=cycle))
+
+    compiled.ll_conflicts = conflicts
+    return conflicts
+
+
 def is_ll1(grammar_data):
-    for nt, productions in grammar_data['grammar'].items():
-        for p1 in range(len(productions)-1):
-            production1 = productions[p1]
-            if nt == production1[0]:
+    return not ll1_conflicts(grammar_data)
+
+
+def recovery_sets(dense):
+    # Panic-mode synchronizing set of each non-terminal row (its FOLLOW set
+    # and the end marker) and the terminals a new sentence can start with
+    # (FIRST of the start symbol), as bitmasks. They are recomputed from the
+    # productions, since a table mapped from TABLE_CACHE has no grammar
+    if dense.sync is None:
+        grammar = {}
+        for left, right in dense.productions[1:]:
+            grammar.setdefault(left, []).append(right or 'ε')
+        compiled = compile_grammar({'grammar': grammar,
+                                    'terminals': set(dense.terminal_list) - {'$'},
+                                    'non_terminals': set(dense.non_terminal_list)})
+        start_symbol = dense.non_terminal_list[dense.start - dense.terminal_count]
+        dense.sync = ([compiled.follow_mask(nt) | (1 << END_MARKER) for nt in dense.non_terminal_list],
+                      compiled.first_mask((start_symbol,)) & ~EPSILON)
+    return dense.sync
+
+
+def create_dense_table(grammar_data, compressed=False):
+    # compressed=True gives the same table with its rows overlaid in a
+    # CombTable, for grammars whose table is large and sparse
+    compiled = compile_grammar(grammar_data)
+    if compressed:
+        if 'LL comb' not in compiled.dense_tables:
+            dense = create_dense_table(compiled)
+            compiled.dense_tables['LL comb'] = DenseLLTable(
+                dense.table.compress(), dense.terminal_list, dense.non_terminal_list,
+                dense.start, dense.productions, dense.expansions)
+        return compiled.dense_tables['LL comb']
+
+    if 'LL' in compiled.dense_tables:
+        return compiled.dense_tables['LL']
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
+    parsing_table = create_parsing_table(compiled)
+    terminal_list = compiled.terminal_list
+    terminal_index = compiled.terminal_index
+    non_terminal_list = sorted(compiled.non_terminals)
+
+    numbering = {production: i for i, production in enumerate(compiled.productions)}
+
+    table = DenseTable(len(non_terminal_list), len(terminal_list))
+    for row, nt in enumerate(non_terminal_list):
+        for terminal, production in parsing_table[nt].items():
+            if production is not None:
+                right = '' if production == 'ε' else production
+                table.set(row, terminal_index[terminal], numbering[(nt, right)] + 1)
+
+    expansions = ll_expansions(compiled.productions, terminal_list, non_terminal_list)
+    start = len(terminal_list) + non_terminal_list.index(compiled.start_symbol)
+
+    dense = DenseLLTable(table, terminal_list, non_terminal_list,
+                         start, compiled.productions, expansions)
+    compiled.dense_tables['LL'] = dense
+
+    if stats is not None:
+        stats.phase('LL dense_table', started, cells=len(table.data), density=table.density())
+    return dense
+
+
+def parse(grammar_data, tokens, trace=None, tree=None, errors=None, compressed=False):
+    # Quiet counterpart of print_derivation: runs on the dense table cached
+    # on the compiled grammar and records steps only when a trace list is
+    # given, the syntax tree only when a SyntaxTree is given and goes on
+    # after syntax errors only when an errors list is given
+    dense = create_dense_table(grammar_data, compressed)
+    return parse_ids(dense, token_ids(tokens, dense.terminal_index), trace, tree, errors)
+
+
+def parse_comb_ids(dense, ids):
+    # parse_ids on a compressed table: cell (row, column) is value[i] for
+    # i = base[row] + column when check[i] == row, and empty otherwise
+    base = dense.table.base
+    check = dense.table.check
+    value = dense.table.value
+    terminal_count = dense.terminal_count
+    expansions = dense.expansions
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+        step_count = 0
+
+    stack = [END_MARKER, dense.start]
+    position = 0
+    length = len(ids)
+    current_input = ids[0] if length else END_MARKER
+
+    while True:
+        stack_top = stack[-1]
+        if stats is not None:
+            step_count += 1
+
+        if stack_top >= terminal_count:
+            row = stack_top - terminal_count
+            index = base[row] + current_input
+            cell = value[index] if check[index] == row else 0
+            if not cell:
+                accepted = False
+                break
+            stack.pop()
+            stack.extend(expansions[cell - 1])
+
+        elif stack_top != current_input or stack_top == END_MARKER:
+            accepted = stack_top == current_input and position >= length
+            break
+
+        else:
+            stack.pop()
+            position += 1
+            current_input = ids[position] if position < length else END_MARKER
+
+    if stats is not None:
+        stats.parsed('LL comb', started, length, step_count)
+    return accepted
+
+
+def parse_ids(dense, ids, trace=None, tree=None, errors=None):
+    if isinstance(dense.table, CombTable):
+        if trace is not None or tree is not None or errors is not None:
+            raise ValueError("A compressed table only recognizes: no trace, tree or error recovery")
+        return parse_comb_ids(dense, ids)
+
+    # With instrumentation on, every pass of the loop counts as a step
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+        step_count = 0
+
+    data = dense.table.data
+    columns = dense.table.columns
+    terminal_count = dense.terminal_count
+    expansions = dense.expansions
+
+    stack = [END_MARKER, dense.start]
+    position = 0
+    length = len(ids)
+    current_input = ids[0] if length else END_MARKER
+
+    # nodes runs parallel to stack: the tree node of each stacked symbol
+    if tree is not None:
+        tree.clear(dense)
+        tree.root = tree.add(dense.start, -1, 0, 0)
+        nodes = [-1, tree.root]
+
+    # Panic mode, when errors are collected: a non-terminal without an entry
+    # for the token is popped if the token is in its synchronizing set, and
+    # the token is skipped otherwise; a terminal that does not match is
+    # popped as if it had been read. Input left over once the stack is
+    # empty is parsed as a new sentence from the first token in FIRST of
+    # the start symbol. Every step pops, reads or starts on a symbol, so recovery costs
+    # no more than parsing. An error is only reported if a token was read
+    # since the previous one, at position quiet or later
+    failed = False
+    quiet = 0
+    if errors is not None:
+        sync, restart = recovery_sets(dense)
+
+    while True:
+        stack_top = stack[-1]
+        if stats is not None:
+            step_count += 1
+
+        if stack_top >= terminal_count:
+            cell = data[(stack_top - terminal_count) * columns + current_input]
+            if cell:
+                stack.pop()
+                stack.extend(expansions[cell - 1])
+
+                if tree is not None:
+                    nodes.extend(tree.expand(nodes.pop(), cell - 1, expansions[cell - 1], position))
+
+                if trace is not None:
+                    left, right = dense.productions[cell - 1]
+                    trace.append(("derive", (left, right or "ε"), position))
+                continue
+
+            row = stack_top - terminal_count
+            if trace is not None:
+                trace.append(("reject", dense.non_terminal_list[row], position))
+            if errors is None:
+                if stats is not None:
+                    stats.parsed('LL', started, length, step_count)
+                return False
+            if position >= quiet:
+                errors.append(ParseError(position, dense.terminal_list[current_input] if current_input else None,
+                                         expected_terminals(data, row, columns, dense.terminal_list)))
+            if current_input == END_MARKER or sync[row] >> current_input & 1:
+                step = ("pop", dense.non_terminal_list[row])
+            else:
+                step = ("skip", dense.terminal_list[current_input] if current_input else None)
+
+        elif stack_top == current_input:
+            if stack_top == END_MARKER:
+                if trace is not None:
+                    trace.append(("accept", None, position))
+                if tree is not None:
+                    tree.finish_spans()
+                if stats is not None:
+                    stats.parsed('LL', started, length, step_count)
+                return position >= length and not failed
+
+            stack.pop()
+            if tree is not None:
+                tree.match(nodes.pop(), position)
+            position += 1
+            current_input = ids[position] if position < length else END_MARKER
+
+            if trace is not None:
+                trace.append(("match", dense.terminal_list[stack_top], position - 1))
+            continue
+
+        else:
+            if trace is not None:
+                trace.append(("reject", dense.terminal_list[stack_top], position))
+            if errors is None:
+                if stats is not None:
+                    stats.parsed('LL', started, length, step_count)
+                return False
+            if position >= quiet:
+                errors.append(ParseError(position, dense.terminal_list[current_input] if current_input else None,
+                                         [dense.terminal_list[stack_top]]))
+            # Nothing can be read in place of the end marker
+            if stack_top != END_MARKER:
+                step = ("pop", dense.terminal_list[stack_top])
+            elif restart >> current_input & 1:
+                step = ("resume", dense.non_terminal_list[dense.start - terminal_count])
+            else:
+                step = ("skip", dense.terminal_list[current_input] if current_input else None)
+
+        # A tree is only built for a sentence
+        failed = True
+        if tree is not None:
+            tree.clear(dense)
+            tree = None
+
+        errors[-1].recovery.append(step)
+        if trace is not None:
+            trace.append(step + (position,))
+
+        if step[0] == "pop":
+            stack.pop()
+        elif step[0] == "resume":
+            stack.append(dense.start)
+        else:
+            position += 1
+            current_input = ids[position] if position < length else END_MARKER
+        quiet = position + 1
+
+
+class LLStreamParser:
+    # Push-style LL(1) parser: feed() any number of chunks, then finish().
+    # Only the parse stack is kept between calls; consumed input is not stored
+    def __init__(self, grammar_data):
+        self.dense = create_dense_table(grammar_data)
+        self.stack = [END_MARKER, self.dense.start]
+        self.position = 0
+        self.failed = False
+
+    def feed(self, chunk):
+        terminal_index = self.dense.terminal_index
+        return self.feed_ids(terminal_index.get(token, 0) for token in chunk)
+
+    def feed_ids(self, ids):
+        # Returns False as soon as the input can no longer be a prefix of a
+        # sentence; self.position is then the offset of the offending token
+        if self.failed:
+            return False
+
+        dense = self.dense
+        data = dense.table.data
+        columns = dense.table.columns
+        terminal_count = dense.terminal_count
+        expansions = dense.expansions
+        stack = self.stack
+        position = self.position
+
+        for current_input in ids:
+            stack_top = stack[-1]
+
+            while stack_top >= terminal_count:
+                cell = data[(stack_top - terminal_count) * columns + current_input]
+                if not cell:
+                    break
+                stack.pop()
+                stack.extend(expansions[cell - 1])
+                stack_top = stack[-1]
+
+            if stack_top != current_input or stack_top == END_MARKER:
+                self.position = position
+                self.failed = True
+                return False
+
+            stack.pop()
+            position += 1
+
+        self.position = position
+        return True
+
+    def finish(self):
+        if self.failed:
+            return False
+
+        dense = self.dense
+        data = dense.table.data
+        columns = dense.table.columns
+        terminal_count = dense.terminal_count
+        stack = self.stack
+
+        while stack[-1] >= terminal_count:
+            cell = data[(stack[-1] - terminal_count) * columns + END_MARKER]
+            if not cell:
+                self.failed = True
                 return False
-            for p2 in range(p1 + 1, len(productions)):
-                production2 = productions[p2]
-                if not FIRST(grammar_data, production1).isdisjoint(FIRST(grammar_data, production2)):
-                    return False
-    return True
\ No newline at end of file
+            stack.pop()
+            stack.extend(dense.expansions[cell - 1])
+
+        if stack[-1] != END_MARKER:
+            self.failed = True
+            return False
+
+        return True
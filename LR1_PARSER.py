@@ -0,0 +1,201 @@
+import time
+from collections import deque
+
+from COMPILED_GRAMMAR import compile_grammar
+from FIRST_FOLLOW import EPSILON
+import SLR1_PARSER as slr1
+
+
+def propagation_table(grammar_data):
+    # For every item A -> α•Bβ, the lookaheads given to B's initial items:
+    # FIRST(β) spontaneously, plus the item's own lookaheads if β is nullable
+    compiled = compile_grammar(grammar_data)
+    item_table = slr1.lr0_items(compiled)
+
+    productions_of = {nt: [] for nt in compiled.non_terminals}
+    for index, (left, _) in enumerate(item_table.productions[1:], 1):
+        productions_of[left].append(item_table.first_item[index])
+
+    propagation = {}
+    for item in item_table.items:
+        if item.next_sym in productions_of:
+            rest_first = compiled.first_mask(item.right[item.dot_pos + 1:])
+            propagation[item.id] = (productions_of[item.next_sym],
+                                    rest_first & ~EPSILON,
+                                    bool(rest_first & EPSILON))
+
+    return propagation
+
+
+def lr1_closure(kernel, propagation):
+    closure = dict(kernel)
+    worklist = list(kernel)
+
+    while worklist:
+        item_id = worklist.pop()
+        if item_id not in propagation:
+            continue
+
+        targets, spontaneous, passes_through = propagation[item_id]
+        lookaheads = spontaneous
+        if passes_through:
+            lookaheads |= closure[item_id]
+
+        for target in targets:
+            old = closure.get(target, 0)
+            if lookaheads & ~old or target not in closure:
+                closure[target] = old | lookaheads
+                worklist.append(target)
+
+    return closure
+
+
+def weakly_compatible(kernel, other):
+    # Pager's weak compatibility: merging two kernels with the same core
+    # cannot introduce a reduce/reduce conflict that LR(1) would not have
+    item_ids = list(kernel)
+
+    for i in range(len(item_ids)):
+        for j in range(i + 1, len(item_ids)):
+            a, b = item_ids[i], item_ids[j]
+            if (kernel[a] & other[b]) or (other[a] & kernel[b]):
+                if not (kernel[a] & kernel[b]) and not (other[a] & other[b]):
+                    return False
+
+    return True
+
+
+def lr1_collection(grammar_data, merge=True):
+    compiled = compile_grammar(grammar_data)
+    item_table = slr1.lr0_items(compiled)
+    items = item_table.items
+    propagation = propagation_table(compiled)
+
+    # S' -> •S with lookahead '$'
+    kernels = [{0: 1 << compiled.terminal_index['$']}]
+    closures = [None]
+    transitions = {}
+    states_by_core = {frozenset(kernels[0]): [0]}
+
+    worklist = deque([0])
+    queued = {0}
+
+    while worklist:
+        i = worklist.popleft()
+        queued.discard(i)
+
+        closure = lr1_closure(kernels[i], propagation)
+        closures[i] = closure
+
+        successors = {}
+        for item_id, lookaheads in closure.items():
+            item = items[item_id]
+            if item.next_sym is not None:
+                kernel = successors.setdefault(item.next_sym, {})
+                successor = item.successor.id
+                kernel[successor] = kernel.get(successor, 0) | lookaheads
+
+        for symbol in sorted(successors):
+            kernel = successors[symbol]
+            candidates = states_by_core.setdefault(frozenset(kernel), [])
+
+            target = None
+            for j in candidates:
+                if kernels[j] == kernel or (merge and weakly_compatible(kernels[j], kernel)):
+                    target = j
+                    break
+
+            if target is None:
+                target = len(kernels)
+                kernels.append(kernel)
+                closures.append(None)
+                candidates.append(target)
+                worklist.append(target)
+                queued.add(target)
+            else:
+                grown = False
+                for item_id, lookaheads in kernel.items():
+                    if lookaheads & ~kernels[target][item_id]:
+                        kernels[target][item_id] |= lookaheads
+                        grown = True
+
+                if grown and target not in queued:
+                    worklist.append(target)
+                    queued.add(target)
+
+            transitions[(i, symbol)] = target
+
+    # Re-propagating a merged state can redirect its transitions, so drop
+    # the states that are no longer reachable and renumber the rest
+    targets_from = {}
+    for (i, symbol), target in transitions.items():
+        targets_from.setdefault(i, []).append((symbol, target))
+
+    numbering = {0: 0}
+    order = [0]
+    for i in order:
+        for symbol, target in sorted(targets_from.get(i, ())):
+            if target not in numbering:
+                numbering[target] = len(order)
+                order.append(target)
+
+    states = [{items[item_id]: lookaheads for item_id, lookaheads in closures[i].items()}
+              for i in order]
+    renumbered = {(numbering[i], symbol): numbering[target]
+                  for (i, symbol), target in transitions.items() if i in numbering}
+
+    return states, renumbered
+
+
+def create_lr1_table(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if compiled.lr1_table is not None:
+        return compiled.lr1_table
+
+    start = time.perf_counter()
+    states, transitions = lr1_collection(compiled)
+
+    action, goto_table, conflicts = slr1.build_lr_table(
+        compiled, states, transitions,
+        lambda state, item: states[state][item])
+
+    compiled.lr1_stats = {
+        'states': len(states),
+        'build_time': time.perf_counter() - start
+    }
+    compiled.lr1_conflicts = conflicts
+    compiled.lr1_table = (action, goto_table, states)
+    return compiled.lr1_table
+
+
+def print_lr1_table(grammar_data):
+    slr1.print_slr_table(grammar_data, create_lr1_table, "LR(1)")
+
+    stats = compile_grammar(grammar_data).lr1_stats
+    print(f"\n{stats['states']} states built in {stats['build_time'] * 1000:.1f} ms")
+
+
+def print_reduction(grammar_data, input_string):
+    return slr1.print_reduction(grammar_data, input_string, create_lr1_table)
+
+
+def create_dense_table(grammar_data, compressed=False):
+    return slr1.create_dense_table(grammar_data, create_lr1_table, compressed)
+
+
+def parse(grammar_data, tokens, trace=None, tree=None, errors=None, compressed=False):
+    return slr1.parse(grammar_data, tokens, create_lr1_table, trace, tree, errors, compressed)
+
+
+def stream_parser(grammar_data):
+    return slr1.LRStreamParser(grammar_data, create_lr1_table)
+
+
+def is_lr1(grammar_data):
+
+    create_lr1_table(grammar_data)
+
+    if compile_grammar(grammar_data).lr1_conflicts:
+        return False
+
+    return True
@@ -0,0 +1,211 @@
+from array import array
+
+# Column of the end marker '$' (see FIRST_FOLLOW.intern_terminals)
+END_MARKER = 1
+
+# Terminal of token grammars that error productions are written with, as in
+# yacc: the LR drivers shift it in place of the input they had to discard.
+# Like yacc, they do not report errors found before this many tokens were
+# shifted since the previous one, which mostly follow from the recovery
+ERROR_TOKEN = 'error'
+RECOVERY_SHIFTS = 3
+
+# Dense parse tables: symbols are small ints and every cell is one machine
+# int, so the drivers index a flat array instead of hashing tuples.
+#
+# LL(1) cells hold production + 1 (0 means error).
+# LR cells hold, in the terminal columns, state + 1 for a shift and
+# -(production + 1) for a reduce, where reducing production 0 (S' -> S)
+# means accept; non-terminal columns hold goto state + 1.
+
+
+class DenseTable:
+    # data is an array('i'), or a read-only memoryview of int32 cells when
+    # the table is mapped from TABLE_CACHE
+    def __init__(self, rows, columns, data=None):
+        self.rows = rows
+        self.columns = columns
+        self.data = data if data is not None else array('i', [0]) * (rows * columns)
+
+    def get(self, row, column):
+        return self.data[row * self.columns + column]
+
+    def set(self, row, column, value):
+        self.data[row * self.columns + column] = value
+
+    def density(self):
+        if not self.data:
+            return 0.0
+        return sum(1 for value in self.data if value) / len(self.data)
+
+    def compress(self):
+        return CombTable.from_dense(self)
+
+
+class CombTable:
+    # Row displacement ("comb") compression: rows are overlaid in one array,
+    # row r starting at base[r]; check[] records which row owns each slot.
+    # create_dense_table(..., compressed=True) in the parser modules builds
+    # one, and their parse_ids then read cells from it
+    def __init__(self, rows, columns, base, check, value):
+        self.rows = rows
+        self.columns = columns
+        self.base = base
+        self.check = check
+        self.value = value
+
+    @classmethod
+    def from_dense(cls, dense):
+        base = array('i', [0]) * dense.rows
+        check = array('i')
+        value = array('i')
+        occupied = bytearray()
+
+        # Place the fullest rows first; each one goes at the first offset
+        # where none of its non-empty cells collide. Only offsets that put
+        # the row's first cell on a free slot are tried, jumping from one
+        # free slot to the next
+        entries = []
+        for row in range(dense.rows):
+            start = row * dense.columns
+            cells = [(column, dense.data[start + column])
+                     for column in range(dense.columns) if dense.data[start + column]]
+            entries.append((row, cells))
+        entries.sort(key=lambda entry: -len(entry[1]))
+
+        for row, cells in entries:
+            offset = 0
+            if cells:
+                first = cells[0][0]
+                slot = first
+                while True:
+                    slot = occupied.find(0, slot)
+                    if slot < 0:
+                        slot = max(len(occupied), first)
+                    offset = slot - first
+                    if not any(offset + column < len(occupied) and occupied[offset + column]
+                               for column, _ in cells[1:]):
+                        break
+                    slot += 1
+
+            needed = offset + dense.columns
+            if needed > len(occupied):
+                grow = needed - len(occupied)
+                occupied.extend(bytes(grow))
+                check.extend(array('i', [-1]) * grow)
+                value.extend(array('i', [0]) * grow)
+
+            for column, cell in cells:
+                occupied[offset + column] = 1
+                check[offset + column] = row
+                value[offset + column] = cell
+            base[row] = offset
+
+        return cls(dense.rows, dense.columns, base, check, value)
+
+    def get(self, row, column):
+        index = self.base[row] + column
+        if self.check[index] == row:
+            return self.value[index]
+        return 0
+
+    def decompress(self):
+        dense = DenseTable(self.rows, self.columns)
+        for row in range(self.rows):
+            for column in range(self.columns):
+                dense.set(row, column, self.get(row, column))
+        return dense
+
+
+class DenseLLTable:
+    def __init__(self, table, terminal_list, non_terminal_list, start, productions, expansions):
+        self.table = table
+        self.terminal_list = terminal_list
+        self.terminal_index = {terminal: i for i, terminal in enumerate(terminal_list)}
+        self.terminal_count = len(terminal_list)
+        self.non_terminal_list = non_terminal_list
+        # Stack symbols below terminal_count are terminals, the rest are
+        # terminal_count + row of the non-terminal
+        self.start = start
+        self.productions = productions
+        # expansions[p] is production p's right side as symbol ids, reversed
+        # so it can be pushed onto the stack directly
+        self.expansions = expansions
+        # Synchronizing sets for error recovery, made on first use by
+        # LL1_PARSER.recovery_sets
+        self.sync = None
+
+
+class DenseLRTable:
+    def __init__(self, table, terminal_list, non_terminal_list, productions,
+                 production_left, production_length, kind=None):
+        self.table = table
+        self.terminal_list = terminal_list
+        self.terminal_index = {terminal: i for i, terminal in enumerate(terminal_list)}
+        self.terminal_count = len(terminal_list)
+        self.non_terminal_list = non_terminal_list
+        self.productions = productions
+        # Column of each production's left side and length of its right side
+        self.production_left = production_left
+        self.production_length = production_length
+        # Name of the table generator (create_slr_table, create_lalr_table,
+        # create_lr1_table), with ' comb' appended for a compressed table,
+        # which INSTRUMENTATION names its phases after
+        self.kind = kind
+        # Goto targets tried by error recovery, made on first use by
+        # SLR1_PARSER.recovery_gotos
+        self.recovery = None
+
+
+def ll_expansions(productions, terminal_list, non_terminal_list):
+    symbol_ids = {terminal: i for i, terminal in enumerate(terminal_list)}
+    for row, nt in enumerate(non_terminal_list):
+        symbol_ids[nt] = len(terminal_list) + row
+
+    return [tuple(symbol_ids[symbol] for symbol in reversed(right)) for _, right in productions]
+
+
+class ParseError:
+    # One syntax error found by a driver given an errors list: position is
+    # the offset of the offending token (the input length for its end),
+    # token its name (None for a symbol the grammar lacks) and expected the
+    # terminals that had an action there. recovery lists the (action,
+    # symbol) steps taken before parsing went on: 'skip' an input token,
+    # 'pop' a stack symbol, 'resume' with a non-terminal (after it for LR,
+    # parsing a new one for LL) or shift 'error'
+    def __init__(self, position, token, expected):
+        self.position = position
+        self.token = token
+        self.expected = expected
+        self.recovery = []
+
+    def __repr__(self):
+        return f"ParseError({self.position}, {self.token!r}, {self.expected!r})"
+
+    def __str__(self):
+        def describe(symbol):
+            if symbol is None:
+                return "an unknown symbol"
+            if symbol == '$':
+                return "the end of the input"
+            return f"'{symbol}'"
+
+        message = f"Syntax error at token {self.position}: unexpected {describe(self.token)}"
+        if self.expected:
+            message += ", expected " + ", ".join(f"'{terminal}'" for terminal in self.expected)
+        if self.recovery:
+            steps = ", ".join(f"{action} {describe(symbol)}" for action, symbol in self.recovery)
+            message += f" ({steps})"
+        return message
+
+
+def expected_terminals(data, row, columns, terminal_list):
+    # Terminals (ε's column and the error token aside) with an entry in row
+    start = row * columns
+    return [terminal_list[column] for column in range(1, len(terminal_list))
+            if data[start + column] and terminal_list[column] != ERROR_TOKEN]
+
+
+def token_ids(tokens, terminal_index):
+    # Unknown symbols map to the ε column, which is empty in every table
+    return [terminal_index.get(token, 0) for token in tokens]
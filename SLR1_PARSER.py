@@ -1,70 +1,119 @@
-from FIRST_FOLLOW import FOLLOW
+from array import array
+
+import INSTRUMENTATION as instrumentation
+from COMPILED_GRAMMAR import compile_grammar, format_production, format_symbols, symbol_separator
+from FIRST_FOLLOW import digraph, mask_to_set
+from PARSE_TABLES import (END_MARKER, ERROR_TOKEN, RECOVERY_SHIFTS, CombTable, DenseLRTable,
+                          DenseTable, ParseError, expected_terminals, token_ids)
 from tabulate import tabulate
 
 
 class Item:
-    def __init__(self, left, right, dot_pos):
+    # Items are interned by LR0Items: there is exactly one object per
+    # (production, dot) pair and its id packs the two together
+    __slots__ = ('id', 'left', 'right', 'dot_pos', 'production', 'next_sym', 'successor')
+
+    def __init__(self, item_id, left, right, dot_pos, production):
+        self.id = item_id
         self.left = left
         self.right = right
         self.dot_pos = dot_pos
-
-    def __eq__(self, other):
-        return (self.left == other.left and
-                self.right == other.right and
-                self.dot_pos == other.dot_pos)
+        self.production = production
+        self.next_sym = right[dot_pos] if dot_pos < len(right) else None
+        self.successor = None
 
     def __hash__(self):
-        return hash((self.left, self.right, self.dot_pos))
+        return self.id
 
     def __str__(self):
         right_with_dot = list(self.right)
         if self.dot_pos <= len(self.right):
             right_with_dot.insert(self.dot_pos, '•')
-        return f"{self.left} -> {''.join(right_with_dot)}"
+        # Tuple right sides come from token grammars, whose symbols are names
+        separator = ' ' if isinstance(self.right, tuple) and self.production else ''
+        return f"{self.left} -> {format_symbols(right_with_dot, separator)}"
 
     def next_symbol(self):
-        if self.dot_pos < len(self.right):
-            return self.right[self.dot_pos]
-        return None
+        return self.next_sym
 
     def advance(self):
-        return Item(self.left, self.right, self.dot_pos + 1)
+        return self.successor
 
 
-def compute_closure(grammar_data, items):
-    grammar = grammar_data['grammar']
-    closure = set(items)
+class LR0Items:
+    def __init__(self, grammar_data):
+        compiled = compile_grammar(grammar_data)
+        non_terminals = compiled.non_terminals
 
-    changed = True
-    while changed:
-        changed = False
-        new_items = set()
+        # Production 0 is the augmented S' -> S
+        self.productions = compiled.productions
 
-        for item in closure:
-            next_sym = item.next_symbol()
+        # Item ids are first_item[production] + dot_pos
+        self.items = []
+        self.first_item = []
+        for index, (left, right) in enumerate(self.productions):
+            self.first_item.append(len(self.items))
+            for dot_pos in range(len(right) + 1):
+                self.items.append(Item(len(self.items), left, right, dot_pos, index))
 
-            if next_sym in grammar_data['non_terminals']:
-                for production in grammar[next_sym]:
-                    if production == 'ε':
-                        # For epsilon productions, create an item with empty string
-                        new_item = Item(next_sym, '', 0)
-                    else:
-                        new_item = Item(next_sym, production, 0)
+        for item in self.items:
+            if item.next_sym is not None:
+                item.successor = self.items[item.id + 1]
+
+        # closure_masks[A] is the set (as a bitmask of item ids) of initial
+        # items added by closing over A, including A's own productions
+        closure_masks = {nt: 0 for nt in non_terminals}
+        leftmost = {nt: set() for nt in non_terminals}
+        for index, (left, right) in enumerate(self.productions[1:], 1):
+            closure_masks[left] |= 1 << self.first_item[index]
+            if right and right[0] in non_terminals:
+                leftmost[left].add(right[0])
+
+        digraph(non_terminals, leftmost, closure_masks)
+
+        self.nt_closure = {}
+        for nt, mask in closure_masks.items():
+            closure = []
+            while mask:
+                lowest = mask & -mask
+                closure.append(self.items[lowest.bit_length() - 1])
+                mask ^= lowest
+            self.nt_closure[nt] = tuple(closure)
 
-                    if new_item not in closure:
-                        new_items.add(new_item)
-                        changed = True
+    def closure(self, kernel):
+        closure = set(kernel)
+        nt_closure = self.nt_closure
 
-        closure.update(new_items)
+        for item in kernel:
+            if item.next_sym in nt_closure:
+                closure.update(nt_closure[item.next_sym])
 
-    return closure
+        return closure
+
+
+def lr0_items(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if compiled.lr0_items is None:
+        stats = instrumentation.active
+        if stats is not None:
+            started = stats.start()
+
+        compiled.lr0_items = LR0Items(compiled)
+
+        if stats is not None:
+            stats.phase('lr0_items', started, items=len(compiled.lr0_items.items))
+    return compiled.lr0_items
+
+
+def compute_closure(grammar_data, items):
+    return lr0_items(grammar_data).closure(items)
 
 
 def goto(grammar_data, items, symbol):
     next_items = set()
     for item in items:
-        if item.next_symbol() == symbol:
-            next_items.add(item.advance())
+        if item.next_sym == symbol:
+            next_items.add(item.successor)
 
     if next_items:
         return compute_closure(grammar_data, next_items)
@@ -73,72 +122,137 @@ def goto(grammar_data, items, symbol):
 
 
 def canonical_collection(grammar_data):
-    grammar = grammar_data['grammar']
-    symbols = grammar_data['terminals'].union(grammar_data['non_terminals']) - {'ε'}
+    compiled = compile_grammar(grammar_data)
+    if compiled.lr0_automaton is not None:
+        return compiled.lr0_automaton
 
-    start_symbol = list(grammar.keys())[0]
-    initial_item = Item("S'", start_symbol, 0)
+    # With instrumentation on, closure and goto calls are counted where
+    # they are made
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+        closures = 1
+        gotos = 0
 
-    initial_state = compute_closure(grammar_data, {initial_item})
+    item_table = lr0_items(compiled)
+    initial_item = item_table.items[0]
+
+    initial_state = item_table.closure({initial_item})
 
     states = [initial_state]
     transitions = {}
 
+    # States are identified by their kernel: two item sets are equal exactly
+    # when their kernels are, so a dict lookup replaces scanning the list
+    state_index = {frozenset({initial_item}): 0}
+
     i = 0
     while i < len(states):
         current_state = states[i]
 
-        for symbol in symbols:
-            next_state = goto(grammar_data, current_state, symbol)
+        # Only symbols that follow a dot in this state have a non-empty goto
+        kernels = {}
+        for item in current_state:
+            next_sym = item.next_sym
+            if next_sym is not None:
+                kernels.setdefault(next_sym, set()).add(item.successor)
 
-            if next_state and next_state not in states:
-                states.append(next_state)
+        if stats is not None:
+            gotos += len(kernels)
 
-            if next_state:
-                transitions[(i, symbol)] = states.index(next_state)
+        for symbol in sorted(kernels):
+            kernel = frozenset(kernels[symbol])
+
+            if kernel not in state_index:
+                state_index[kernel] = len(states)
+                states.append(item_table.closure(kernel))
+                if stats is not None:
+                    closures += 1
+
+            transitions[(i, symbol)] = state_index[kernel]
 
         i += 1
 
-    return states, transitions
+    if stats is not None:
+        stats.phase('canonical_collection', started, states=len(states),
+                    closures=closures, gotos=gotos)
 
+    compiled.lr0_automaton = (states, transitions)
+    return compiled.lr0_automaton
 
-def create_slr_table(grammar_data):
-    grammar = grammar_data['grammar']
+
+class Conflict:
+    # One clash in an action table cell: existing is the action already in
+    # the cell (and kept there), incoming the one that lost. str() gives the
+    # message the table builders have always reported
+    def __init__(self, state, terminal, existing, incoming):
+        self.state = state
+        self.terminal = terminal
+        self.existing = existing
+        self.incoming = incoming
+
+    @property
+    def actions(self):
+        return self.existing, self.incoming
+
+    @property
+    def kind(self):
+        return '/'.join(sorted([self.existing[0], self.incoming[0]], reverse=True))
+
+    def __repr__(self):
+        return f"Conflict({self.state}, {self.terminal!r}, {self.existing!r}, {self.incoming!r})"
+
+    def __str__(self):
+        act, value = self.incoming
+        if act == 'reduce':
+            left, right = value
+            incoming = f"('Reduce', '{left} → {format_production(right)}')"
+        else:
+            incoming = str(self.incoming)
+        return f"Conflict in state {self.state}, terminal '{self.terminal}': {self.existing} vs {incoming}"
+
+
+def build_lr_table(grammar_data, states, transitions, reduce_lookaheads, rows=None):
+    # Fills the action/goto tables of an LR(0)-based automaton; the LR
+    # variants only differ in reduce_lookaheads(state, item), the bitmask of
+    # terminals on which a completed item is reduced. rows limits the work
+    # to those state numbers
+    compiled = compile_grammar(grammar_data)
+    grammar_data = compiled.grammar_data
     terminals = grammar_data['terminals'].copy() - {'ε'}
     terminals.add('$')
     non_terminals = grammar_data['non_terminals']
-
-    states, transitions = canonical_collection(grammar_data)
+    terminal_list = compiled.terminal_list
 
     action = {}
     goto_table = {}
 
-    start_symbol = list(grammar.keys())[0]
-
     # To record conflicts
-    grammar_data['conflicts'] = []
+    conflicts = []
 
-    for i, state in enumerate(states):
-        for item in state:
+    if rows is None:
+        rows = range(len(states))
+
+    for i in rows:
+        for item in states[i]:
             next_sym = item.next_symbol()
 
             # Case 1: Dot is at the end of production
             if next_sym is None:
                 # Special case for accept state
-                if item.left == "S'" and item.right == start_symbol:
+                if item.production == 0:
+                    # Accept wins, but a reduction seen first is still a conflict
+                    if (i, '$') in action:
+                        conflicts.append(Conflict(i, '$', ('accept', ''), action[(i, '$')]))
                     action[(i, '$')] = ('accept', '')
                 else:
-                    # For reductions, we need the FOLLOW set
-                    follow_set = FOLLOW(grammar_data, item.left)
+                    lookahead_set = mask_to_set(reduce_lookaheads(i, item), terminal_list)
 
-                    for terminal in follow_set:
+                    for terminal in lookahead_set:
                         if (i, terminal) in action:
                             # Record conflict
-                            current_action = action[(i, terminal)]
-                            grammar_data['conflicts'].append(
-                                f"Conflict in state {i}, terminal '{terminal}': "
-                                f"{current_action} vs ('Reduce', '{item.left} → {item.right}')"
-                            )
+                            conflicts.append(Conflict(i, terminal, action[(i, terminal)],
+                                                      ('reduce', (item.left, item.right))))
                         else:
                             action[(i, terminal)] = ('reduce', (item.left, item.right))
 
@@ -149,11 +263,8 @@ def create_slr_table(grammar_data):
 
                     if (i, next_sym) in action and action[(i, next_sym)][1] != next_state:
                         # Record conflict
-                        current_action = action[(i, next_sym)]
-                        grammar_data['conflicts'].append(
-                            f"Conflict in state {i}, terminal '{next_sym}': "
-                            f"{current_action} vs ('shift', {next_state})"
-                        )
+                        conflicts.append(Conflict(i, next_sym, action[(i, next_sym)],
+                                                  ('shift', next_state)))
                     else:
                         action[(i, next_sym)] = ('shift', next_state)
 
@@ -162,14 +273,42 @@ def create_slr_table(grammar_data):
                 if (i, next_sym) in transitions:
                     goto_table[(i, next_sym)] = transitions[(i, next_sym)]
 
-    return action, goto_table, states
+    return action, goto_table, conflicts
+
+
+def create_slr_table(grammar_data):
+    compiled = compile_grammar(grammar_data)
+    if compiled.slr_table is not None:
+        return compiled.slr_table
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
 
+    states, transitions = canonical_collection(compiled)
 
-def print_slr_table(grammar_data):
+    # For reductions, we need the FOLLOW set
+    action, goto_table, conflicts = build_lr_table(
+        compiled, states, transitions,
+        lambda state, item: compiled.follow_mask(item.left))
+
+    compiled.grammar_data['conflicts'] = conflicts
+    compiled.slr_conflicts = conflicts
+    compiled.slr_table = (action, goto_table, states)
+
+    if stats is not None:
+        cells = len(states) * (len(compiled.terminal_list) - 1 + len(compiled.non_terminals))
+        stats.phase('slr_table', started, states=len(states), conflicts=len(conflicts), cells=cells,
+                    density=(len(action) + len(goto_table)) / cells if cells else 0.0)
+    return compiled.slr_table
+
+
+def print_slr_table(grammar_data, create_table=create_slr_table, title="SLR(1)"):
+    grammar_data = compile_grammar(grammar_data).grammar_data
     terminals = sorted(grammar_data['terminals'].copy() - {'ε'}) + ['$']
     non_terminals = sorted(grammar_data['non_terminals'])
 
-    action, goto_table, states = create_slr_table(grammar_data)
+    action, goto_table, states = create_table(grammar_data)
 
     headers = ["State"] + terminals + non_terminals
     table = []
@@ -184,8 +323,7 @@ def print_slr_table(grammar_data):
                     cell = f"s{value}"
                 elif act == 'reduce':
                     left, right = value
-                    right_str = right if right else 'ε'
-                    cell = f"r({left}→{right_str})"
+                    cell = f"r({left}→{format_production(right)})"
                 elif act == 'accept':
                     cell = "acc"
                 else:
@@ -202,7 +340,7 @@ def print_slr_table(grammar_data):
 
         table.append(row)
 
-    print("\nSLR(1) Analysis Table:")
+    print(f"\n{title} Analysis Table:")
     print(tabulate(table, headers=headers, tablefmt="grid"))
 
     print("\nStates:")
@@ -211,32 +349,51 @@ def print_slr_table(grammar_data):
         for item in state:
             print(f"  {item}")
 
-def print_reduction(grammar_data, input_string):
+def print_reduction(grammar_data, input_string, create_table=create_slr_table):
 
-    action, goto_table, _ = create_slr_table(grammar_data)
+    action, goto_table, _ = create_table(grammar_data)
+    separator = symbol_separator(grammar_data)
 
     stack = [0]  # State stack
     symbols = ['$']  # Symbol stack
-    input_string = input_string + '$'
+    input_string = list(input_string) + ['$']
     input_pos = 0
 
     steps = []
 
+    # Syntax errors are recovered from as in parse_ids, so that one run
+    # lists all of them
+    gotos = {}
+    for (state, nt), target in sorted(goto_table.items()):
+        gotos.setdefault(state, []).append((nt, target))
+    errors = []
+    quiet = 0
+    resumed = -1
+
+    def resumes(state, terminal):
+        # The first goto of state after which terminal is shifted
+        for nt, target in gotos.get(state, ()):
+            if action.get((target, terminal), ('',))[0] in ('shift', 'accept'):
+                return nt, target
+        return None
+
+    def finish(accepted):
+        steps.append([stack_str, symbols_str, input_str, "Accept" if accepted else "Reject"])
+        print(tabulate(steps, headers=["States", "Symbols", "Input", "Action"], tablefmt="grid"))
+        for error in errors:
+            print(error)
+        return accepted
+
     while True:
         state = stack[-1]
         current_input = input_string[input_pos]
 
         stack_str = ' '.join(map(str, stack))
-        symbols_str = ''.join(symbols)
-        input_str = input_string[input_pos:]
+        symbols_str = format_symbols(symbols, separator)
+        input_str = format_symbols(input_string[input_pos:], separator)
 
         # Check if there's an action defined for current state and input symbol
-        if (state, current_input) not in action:
-            steps.append([stack_str, symbols_str, input_str, "Reject"])
-            print(tabulate(steps, headers=["States", "Symbols", "Input", "Action"], tablefmt="grid"))
-            return False
-
-        act, value = action[(state, current_input)]
+        act, value = action.get((state, current_input), (None, None))
 
         if act == 'shift':
             # Shift: Add state and symbol to stacks
@@ -247,48 +404,471 @@ def print_reduction(grammar_data, input_string):
 
             steps.append(
                 [stack_str, symbols_str, input_str, f"Shift {next_state}"])
+            continue
 
         elif act == 'reduce':
             # Reduce: Apply a production rule
             left, right = value
             right_len = len(right) if right != 'ε' else 0
 
-            # Pop symbols and states of reduced productions
-            for _ in range(right_len):
-                stack.pop()
-                symbols.pop()
+            # Get the state below the handle and check there's a transition
+            top_state = stack[len(stack) - 1 - right_len]
+            if (top_state, left) in goto_table:
+                # Pop symbols and states of reduced productions
+                for _ in range(right_len):
+                    stack.pop()
+                    symbols.pop()
+
+                # Perform GOTO transition
+                goto_state = goto_table[(top_state, left)]
+                stack.append(goto_state)
+                symbols.append(left)
 
-            # Get state from top of stack
-            top_state = stack[-1]
+                action_msg = f"Reduce {left} -> {format_production(right)}"
 
-            # Check if there's a defined transition
-            if (top_state, left) not in goto_table:
-                steps.append([stack_str, symbols_str, input_str, "Reject"])
-                print(tabulate(steps, headers=["States", "Symbols", "Input", "Action"], tablefmt="grid"))
+                steps.append([stack_str, symbols_str, input_str, action_msg])
+                continue
+
+        elif act == 'accept':
+            # Accept: String is valid, unless errors were recovered from
+            return finish(not errors)
+
+        # Syntax error: recover and note the steps taken in one row
+        recovery = []
+        if input_pos == resumed:
+            if current_input == '$':
+                return finish(False)
+            recovery.append(('skip', current_input))
+            input_pos += 1
+        else:
+            if input_pos >= quiet:
+                expected = sorted(terminal for (s, terminal) in action
+                                  if s == state and terminal != ERROR_TOKEN)
+                errors.append(ParseError(input_pos, current_input, expected))
+
+            depth = len(stack)
+            while depth and action.get((stack[depth - 1], ERROR_TOKEN), ('',))[0] != 'shift':
+                depth -= 1
+
+            if depth:
+                while len(stack) > depth:
+                    stack.pop()
+                    recovery.append(('pop', symbols.pop()))
+                stack.append(action[(stack[-1], ERROR_TOKEN)][1])
+                symbols.append(ERROR_TOKEN)
+                recovery.append(('shift', ERROR_TOKEN))
+            else:
+                while not any(resumes(s, input_string[input_pos]) for s in stack):
+                    if input_string[input_pos] == '$':
+                        return finish(False)
+                    recovery.append(('skip', input_string[input_pos]))
+                    input_pos += 1
+
+                while not resumes(stack[-1], input_string[input_pos]):
+                    stack.pop()
+                    recovery.append(('pop', symbols.pop()))
+                nt, target = resumes(stack[-1], input_string[input_pos])
+                stack.append(target)
+                symbols.append(nt)
+                recovery.append(('resume', nt))
+
+        errors[-1].recovery.extend(recovery)
+        described = ", ".join(f"{step} '{symbol}'" for step, symbol in recovery)
+        steps.append([stack_str, symbols_str, input_str, f"Error: {described}"])
+        resumed = input_pos
+        quiet = input_pos + RECOVERY_SHIFTS
+
+def create_dense_table(grammar_data, create_table=create_slr_table, compressed=False):
+    # compressed=True gives the same table with its rows overlaid in a
+    # CombTable, for grammars whose table is large and sparse
+    compiled = compile_grammar(grammar_data)
+    key = create_table.__name__
+    if compressed:
+        comb_key = f'{key} comb'
+        if comb_key not in compiled.dense_tables:
+            dense = create_dense_table(compiled, create_table)
+            compiled.dense_tables[comb_key] = DenseLRTable(
+                dense.table.compress(), dense.terminal_list, dense.non_terminal_list,
+                dense.productions, dense.production_left, dense.production_length, comb_key)
+        return compiled.dense_tables[comb_key]
+
+    if key in compiled.dense_tables:
+        return compiled.dense_tables[key]
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+
+    action, goto_table, states = create_table(compiled)
+    terminal_list = compiled.terminal_list
+    terminal_index = compiled.terminal_index
+    terminal_count = len(terminal_list)
+    non_terminal_list = sorted(compiled.non_terminals)
+    non_terminal_column = {nt: terminal_count + row for row, nt in enumerate(non_terminal_list)}
+
+    numbering = {production: i for i, production in enumerate(compiled.productions)}
+
+    table = DenseTable(len(states), terminal_count + len(non_terminal_list))
+    for (state, terminal), (act, value) in action.items():
+        if act == 'shift':
+            cell = value + 1
+        elif act == 'reduce':
+            cell = -(numbering[value] + 1)
+        else:
+            # Accept is a reduce by production 0, S' -> S
+            cell = -1
+        table.set(state, terminal_index[terminal], cell)
+
+    for (state, nt), target in goto_table.items():
+        table.set(state, non_terminal_column[nt], target + 1)
+
+    production_left = array('i', [non_terminal_column.get(left, 0) for left, _ in compiled.productions])
+    production_length = array('i', [len(right) for _, right in compiled.productions])
+
+    dense = DenseLRTable(table, terminal_list, non_terminal_list, compiled.productions,
+                         production_left, production_length, key)
+    compiled.dense_tables[key] = dense
+
+    if stats is not None:
+        stats.phase(f'{key} dense_table', started, cells=len(table.data), density=table.density())
+    return dense
+
+
+def recovery_gotos(dense):
+    # Per state, the (goto state, non-terminal column, terminal mask) triples
+    # error recovery can resume with: the non-terminals the state has a goto
+    # on, each with the terminals its goto state shifts (or accepts), so
+    # that resuming always reads a token; a reduction could run into the
+    # same error again. Also the union of those masks per state and the
+    # symbol every state is entered on, to name the states recovery pops
+    if dense.recovery is None:
+        data = dense.table.data
+        columns = dense.table.columns
+        terminal_count = dense.terminal_count
+        error = dense.terminal_index.get(ERROR_TOKEN, 0)
+        symbols = dense.terminal_list + dense.non_terminal_list
+
+        actions = []
+        accessing = [None] * dense.table.rows
+        for state in range(dense.table.rows):
+            start = state * columns
+            mask = 0
+            for column in range(1, columns):
+                cell = data[start + column]
+                if (cell > 0 or cell == -1) and column < terminal_count and column != error:
+                    mask |= 1 << column
+                if cell > 0:
+                    accessing[cell - 1] = symbols[column]
+            actions.append(mask)
+
+        gotos = []
+        reach = []
+        for state in range(dense.table.rows):
+            start = state * columns
+            targets = []
+            for column in range(terminal_count, columns):
+                target = data[start + column] - 1
+                if target >= 0 and actions[target]:
+                    targets.append((target, column, actions[target]))
+            gotos.append(targets)
+            mask = 0
+            for _, _, actions_mask in targets:
+                mask |= actions_mask
+            reach.append(mask)
+
+        dense.recovery = (gotos, reach, accessing)
+    return dense.recovery
+
+
+def parse(grammar_data, tokens, create_table=create_slr_table, trace=None, tree=None, errors=None,
+          compressed=False):
+    # Quiet counterpart of print_reduction: runs on the dense table cached
+    # on the compiled grammar and records steps only when a trace list is
+    # given, the syntax tree only when a SyntaxTree is given and goes on
+    # after syntax errors only when an errors list is given
+    dense = create_dense_table(grammar_data, create_table, compressed)
+    return parse_ids(dense, token_ids(tokens, dense.terminal_index), trace, tree, errors)
+
+
+def parse_comb_ids(dense, ids):
+    # parse_ids on a compressed table: cell (row, column) is value[i] for
+    # i = base[row] + column when check[i] == row, and empty otherwise
+    base = dense.table.base
+    check = dense.table.check
+    value = dense.table.value
+    production_left = dense.production_left
+    production_length = dense.production_length
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+        step_count = 0
+
+    stack = [0]
+    position = 0
+    length = len(ids)
+    current_input = ids[0] if length else END_MARKER
+
+    while True:
+        state = stack[-1]
+        index = base[state] + current_input
+        cell = value[index] if check[index] == state else 0
+        if stats is not None:
+            step_count += 1
+
+        if cell > 0:
+            stack.append(cell - 1)
+            position += 1
+            current_input = ids[position] if position < length else END_MARKER
+            continue
+
+        if cell < -1:
+            production = -cell - 1
+            right_len = production_length[production]
+            if right_len:
+                del stack[-right_len:]
+
+            state = stack[-1]
+            index = base[state] + production_left[production]
+            if check[index] == state and value[index]:
+                stack.append(value[index] - 1)
+                continue
+
+        accepted = cell == -1 and position >= length
+        break
+
+    if stats is not None:
+        stats.parsed(dense.kind, started, length, step_count)
+    return accepted
+
+
+def parse_ids(dense, ids, trace=None, tree=None, errors=None):
+    # With instrumentation on, every pass of the loop counts as a step, and
+    # so does every recovery step
+    if isinstance(dense.table, CombTable):
+        if trace is not None or tree is not None or errors is not None:
+            raise ValueError("A compressed table only recognizes: no trace, tree or error recovery")
+        return parse_comb_ids(dense, ids)
+
+    stats = instrumentation.active
+    if stats is not None:
+        started = stats.start()
+        step_count = 0
+
+    data = dense.table.data
+    columns = dense.table.columns
+    production_left = dense.production_left
+    production_length = dense.production_length
+
+    stack = [0]
+    position = 0
+    length = len(ids)
+    current_input = ids[0] if length else END_MARKER
+
+    # nodes runs parallel to stack above its bottom state
+    if tree is not None:
+        tree.clear(dense)
+        nodes = []
+
+    # Recovery, when errors are collected. As in yacc, states are popped
+    # down to one that shifts the error token of an error production, if
+    # the grammar has any. Otherwise (Aho et al. 4.8.3) tokens are skipped
+    # until one some state on the stack can resume on after a goto, and
+    # the stack is popped down to that state. An error before anything was
+    # shifted since the last recovery skips the token instead; one before
+    # position quiet is recovered from without being reported
+    failed = False
+    quiet = 0
+    resumed = -1
+    if errors is not None:
+        gotos, reach, accessing = recovery_gotos(dense)
+        error_token = dense.terminal_index.get(ERROR_TOKEN, 0)
+
+    while True:
+        cell = data[stack[-1] * columns + current_input]
+        if stats is not None:
+            step_count += 1
+
+        if cell > 0:
+            if trace is not None:
+                trace.append(('shift', cell - 1, position))
+            if tree is not None:
+                nodes.append(tree.leaf(current_input, position))
+
+            stack.append(cell - 1)
+            position += 1
+            current_input = ids[position] if position < length else END_MARKER
+            continue
+
+        if cell < -1:
+            production = -cell - 1
+            right_len = production_length[production]
+            if right_len:
+                del stack[-right_len:]
+
+            goto_state = data[stack[-1] * columns + production_left[production]]
+            if goto_state:
+                stack.append(goto_state - 1)
+
+                if tree is not None:
+                    children = nodes[len(nodes) - right_len:]
+                    del nodes[len(nodes) - right_len:]
+                    nodes.append(tree.reduce(production_left[production], production, children, position))
+
+                if trace is not None:
+                    trace.append(('reduce', dense.productions[production], position))
+                continue
+
+        elif cell == -1:
+            if trace is not None:
+                trace.append(('accept', None, position))
+            if tree is not None:
+                tree.root = nodes[-1]
+            if stats is not None:
+                stats.parsed(dense.kind, started, length, step_count)
+            return position >= length and not failed
+
+        if trace is not None:
+            trace.append(('reject', None, position))
+        if errors is None:
+            if stats is not None:
+                stats.parsed(dense.kind, started, length, step_count)
+            return False
+
+        # A tree is only built for a sentence
+        failed = True
+        if tree is not None:
+            tree.clear(dense)
+            tree = None
+
+        steps = []
+        if position == resumed:
+            if current_input == END_MARKER:
+                if stats is not None:
+                    stats.parsed(dense.kind, started, length, step_count + len(steps))
                 return False
+            steps.append(('skip', dense.terminal_list[current_input] if current_input else None))
+            position += 1
+        else:
+            if position >= quiet:
+                errors.append(ParseError(position, dense.terminal_list[current_input] if current_input else None,
+                                         expected_terminals(data, stack[-1], columns, dense.terminal_list)))
+
+            depth = len(stack) if error_token else 0
+            while depth and data[stack[depth - 1] * columns + error_token] <= 0:
+                depth -= 1
+
+            if depth:
+                for state in reversed(stack[depth:]):
+                    steps.append(('pop', accessing[state]))
+                del stack[depth:]
+                stack.append(data[stack[-1] * columns + error_token] - 1)
+                steps.append(('shift', ERROR_TOKEN))
+            else:
+                mask = 0
+                for state in stack:
+                    mask |= reach[state]
+                while not mask >> current_input & 1:
+                    if current_input == END_MARKER:
+                        if stats is not None:
+                            stats.parsed(dense.kind, started, length, step_count + len(steps))
+                        return False
+                    steps.append(('skip', dense.terminal_list[current_input] if current_input else None))
+                    position += 1
+                    current_input = ids[position] if position < length else END_MARKER
+
+                while not reach[stack[-1]] >> current_input & 1:
+                    steps.append(('pop', accessing[stack.pop()]))
+                for target, column, mask in gotos[stack[-1]]:
+                    if mask >> current_input & 1:
+                        stack.append(target)
+                        steps.append(('resume', dense.non_terminal_list[column - dense.terminal_count]))
+                        break
+
+        current_input = ids[position] if position < length else END_MARKER
+        errors[-1].recovery.extend(steps)
+        if stats is not None:
+            step_count += len(steps)
+        if trace is not None:
+            trace.extend(step + (position,) for step in steps)
+        resumed = position
+        quiet = position + RECOVERY_SHIFTS
+
+class LRStreamParser:
+    # Push-style LR parser: feed() any number of chunks, then finish().
+    # Only the state stack is kept between calls; consumed input is not stored
+    def __init__(self, grammar_data, create_table=create_slr_table):
+        self.dense = create_dense_table(grammar_data, create_table)
+        self.stack = [0]
+        self.position = 0
+        self.failed = False
+
+    def feed(self, chunk):
+        terminal_index = self.dense.terminal_index
+        return self.feed_ids(terminal_index.get(token, 0) for token in chunk)
+
+    def feed_ids(self, ids):
+        # Returns False as soon as the input can no longer be a prefix of a
+        # sentence; self.position is then the offset of the offending token
+        if self.failed:
+            return False
 
-            # Perform GOTO transition
-            goto_state = goto_table[(top_state, left)]
-            stack.append(goto_state)
-            symbols.append(left)
+        position = self.position
+        for current_input in ids:
+            if current_input == END_MARKER or not self._shift(current_input):
+                self.position = position
+                self.failed = True
+                return False
+            position += 1
 
-            right_str = right if right else 'ε'
-            action_msg = f"Reduce {left} -> {right_str}"
+        self.position = position
+        return True
 
-            steps.append([stack_str, symbols_str, input_str, action_msg])
+    def finish(self):
+        if self.failed:
+            return False
 
-        elif act == 'accept':
-            # Accept: String is valid
-            steps.append([stack_str, symbols_str, input_str, "Accept"])
-            print(tabulate(steps, headers=["States", "Symbols", "Input", "Action"], tablefmt="grid"))
-            return True
+        accepted = self._shift(END_MARKER)
+        self.failed = not accepted
+        return accepted
+
+    def _shift(self, current_input):
+        # Reduces as far as current_input allows, then shifts it. For the end
+        # marker, returns whether the input is accepted
+        dense = self.dense
+        data = dense.table.data
+        columns = dense.table.columns
+        stack = self.stack
+
+        while True:
+            cell = data[stack[-1] * columns + current_input]
+
+            if cell > 0:
+                stack.append(cell - 1)
+                return True
+
+            if cell == -1:
+                return True
+
+            if cell == 0:
+                return False
+
+            production = -cell - 1
+            right_len = dense.production_length[production]
+            if right_len:
+                del stack[-right_len:]
+
+            goto_state = data[stack[-1] * columns + dense.production_left[production]]
+            if not goto_state:
+                return False
+            stack.append(goto_state - 1)
 
 def is_slr1(grammar_data):
 
-    # Create the SLR table and check for conflicts
-    create_slr_table(grammar_data.copy())
+    # Create the SLR table (built once per grammar) and check for conflicts
+    create_slr_table(grammar_data)
 
-    if 'conflicts' in grammar_data and grammar_data['conflicts']:
+    if compile_grammar(grammar_data).slr_conflicts:
         return False
 
     return True
\ No newline at end of file
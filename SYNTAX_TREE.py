@@ -0,0 +1,159 @@
+from array import array
+
+NO_NODE = -1
+
+
+class SyntaxTree:
+    # Concrete syntax tree kept as parallel int arrays indexed by node id
+    # instead of one Python object per node. symbol[n] uses the dense table
+    # ids: terminals first, then terminal_count + row of each non-terminal.
+    # production[n] is the production a non-terminal was expanded with (-1
+    # for leaves) and [start[n], end[n]) is its span of token positions
+    def __init__(self):
+        self.clear()
+
+    def clear(self, dense=None):
+        self.symbol_names = []
+        self.terminal_count = 0
+        if dense is not None:
+            self.symbol_names = list(dense.terminal_list) + list(dense.non_terminal_list)
+            self.terminal_count = dense.terminal_count
+
+        self.symbol = array('i')
+        self.production = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.start = array('i')
+        self.end = array('i')
+        self.root = NO_NODE
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def add(self, symbol, production, start, end):
+        self.symbol.append(symbol)
+        self.production.append(production)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.start.append(start)
+        self.end.append(end)
+        return len(self.symbol) - 1
+
+    def expand(self, node, production, expansion, position):
+        # Top-down step: gives node one child per symbol of expansion (the
+        # reversed right side, as pushed on the LL stack) and returns the
+        # children in the same order. Spans are completed by finish_spans()
+        self.production[node] = production
+        self.start[node] = position
+        self.end[node] = position
+
+        # Children are appended last to first, each linked to the one
+        # added before it
+        symbol = self.symbol
+        children = []
+        next_node = NO_NODE
+        for child_symbol in expansion:
+            child = len(symbol)
+            symbol.append(child_symbol)
+            self.production.append(NO_NODE)
+            self.first_child.append(NO_NODE)
+            self.next_sibling.append(next_node)
+            self.start.append(position)
+            self.end.append(position)
+            next_node = child
+            children.append(child)
+
+        self.first_child[node] = next_node
+        return children
+
+    def match(self, node, position):
+        self.start[node] = position
+        self.end[node] = position + 1
+
+    def finish_spans(self):
+        # After a top-down parse, children always have larger ids than their
+        # parent, so one backwards pass sees every child before its parent
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        end = self.end
+
+        for node in range(len(self.symbol) - 1, -1, -1):
+            child = first_child[node]
+            if child == NO_NODE:
+                continue
+            while next_sibling[child] != NO_NODE:
+                child = next_sibling[child]
+            end[node] = end[child]
+
+    def leaf(self, symbol, position):
+        return self.add(symbol, NO_NODE, position, position + 1)
+
+    def reduce(self, symbol, production, children, position):
+        # Bottom-up step: a new node over the already built children
+        if not children:
+            return self.add(symbol, production, position, position)
+
+        node = self.add(symbol, production, self.start[children[0]], self.end[children[-1]])
+        self.first_child[node] = children[0]
+        for child, sibling in zip(children, children[1:]):
+            self.next_sibling[child] = sibling
+        return node
+
+    def name(self, node):
+        return self.symbol_names[self.symbol[node]]
+
+    def is_leaf(self, node):
+        return self.symbol[node] < self.terminal_count
+
+    def span(self, node):
+        return self.start[node], self.end[node]
+
+    def children(self, node):
+        child = self.first_child[node]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def walk(self, node=None):
+        # Yields (node, depth) in preorder, without recursion
+        if node is None:
+            node = self.root
+        if node == NO_NODE:
+            return
+
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        stack = [(node, 0)]
+
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+
+            # Push the children last to first so the first is visited next
+            child = first_child[node]
+            pending = []
+            while child != NO_NODE:
+                pending.append(child)
+                child = next_sibling[child]
+            for child in reversed(pending):
+                stack.append((child, depth + 1))
+
+    def preorder(self, node=None):
+        for node, _ in self.walk(node):
+            yield node
+
+    def leaves(self, node=None):
+        for node in self.preorder(node):
+            if self.symbol[node] < self.terminal_count:
+                yield node
+
+    def format(self, node=None, tokens=None):
+        # Indented outline of the tree; leaves show their token when the
+        # token list the tree was built from is given
+        lines = []
+        for node, depth in self.walk(node):
+            text = self.name(node)
+            if tokens is not None and self.is_leaf(node):
+                text = f"{text} {tokens[self.start[node]]!r}"
+            lines.append("  " * depth + text)
+        return "\n".join(lines)
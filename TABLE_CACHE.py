@@ -0,0 +1,205 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from COMPILED_GRAMMAR import compile_grammar
+import LALR1_PARSER as lalr1
+import LL1_PARSER as ll1
+import LR1_PARSER as lr1
+from PARSE_TABLES import DenseLLTable, DenseLRTable, DenseTable, ll_expansions
+import SLR1_PARSER as slr1
+
+# Bump whenever table construction or the file layout changes, so that
+# stale cache files are never read back
+GENERATOR_VERSION = 3
+
+CACHE_DIR = ".table_cache"
+MAGIC = b"PTAB"
+HEADER = struct.Struct("<4sII")
+
+# Parser name -> (CompiledGrammar.dense_tables key, grammar check, dense table builder)
+GENERATORS = {
+    "LL(1)": ("LL", ll1.is_ll1, ll1.create_dense_table),
+    "SLR(1)": ("create_slr_table", slr1.is_slr1, slr1.create_dense_table),
+    "LALR(1)": ("create_lalr_table", lalr1.is_lalr1, lalr1.create_dense_table),
+    "LR(1)": ("create_lr1_table", lr1.is_lr1, lr1.create_dense_table),
+}
+
+
+class CachedTables:
+    def __init__(self, valid, tables):
+        # valid[name] tells whether the grammar is in that class; tables[name]
+        # holds the dense table for each class the grammar belongs to
+        self.valid = valid
+        self.tables = tables
+
+
+def grammar_hash(grammar_data):
+    # Production order matters (it fixes production numbers), so the
+    # normalized form keeps the grammar's own ordering
+    normalized = [[nt, list(productions)] for nt, productions in grammar_data['grammar'].items()]
+    text = json.dumps([GENERATOR_VERSION, normalized], ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_path(grammar_data, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, grammar_hash(grammar_data) + ".tables")
+
+
+def write_tables(path, valid, tables):
+    # Layout: header, JSON metadata, then every int array back to back,
+    # starting at an 8-byte aligned offset
+    arrays = []
+    offset = 0
+
+    def place(values):
+        nonlocal offset
+        arrays.append(values)
+        start = offset
+        offset += len(values) * values.itemsize
+        return [start, len(values)]
+
+    shared = next(iter(tables.values()), None)
+    metadata = {
+        'byteorder': sys.byteorder,
+        'itemsize': array('i').itemsize,
+        'valid': valid,
+        'terminal_list': shared.terminal_list if shared else [],
+        'non_terminal_list': shared.non_terminal_list if shared else [],
+        'productions': shared.productions if shared else [],
+        'tables': {}
+    }
+
+    for name, dense in tables.items():
+        entry = {
+            'rows': dense.table.rows,
+            'columns': dense.table.columns,
+            'data': place(dense.table.data)
+        }
+        if isinstance(dense, DenseLLTable):
+            entry['start'] = dense.start
+        else:
+            entry['production_left'] = place(dense.production_left)
+            entry['production_length'] = place(dense.production_length)
+        metadata['tables'][name] = entry
+
+    metadata_bytes = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+    data_start = aligned(HEADER.size + len(metadata_bytes))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, GENERATOR_VERSION, len(metadata_bytes)))
+        file.write(metadata_bytes)
+        file.write(bytes(data_start - HEADER.size - len(metadata_bytes)))
+        for values in arrays:
+            values.tofile(file)
+
+    # Readers never see a half-written file
+    os.replace(temporary, path)
+
+
+def aligned(size):
+    return (size + 7) & ~7
+
+
+def read_tables(path, mapped=True):
+    # With mapped=True the file is mmap'ed and every table is a memoryview
+    # into it, so processes loading the same file share one physical copy
+    # through the page cache instead of each holding its own
+    try:
+        with open(path, 'rb') as file:
+            if mapped:
+                blob = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                blob = memoryview(file.read())
+    except (OSError, ValueError):
+        return None
+
+    if len(blob) < HEADER.size:
+        return None
+
+    magic, version, metadata_size = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != GENERATOR_VERSION:
+        return None
+
+    # A damaged file reads as a cache miss, so the tables are rebuilt and
+    # the file rewritten
+    try:
+        return decode_tables(blob, metadata_size)
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def decode_tables(blob, metadata_size):
+    data_start = aligned(HEADER.size + metadata_size)
+    if data_start > len(blob):
+        return None
+
+    metadata = json.loads(bytes(blob[HEADER.size:HEADER.size + metadata_size]).decode("utf-8"))
+    if metadata['byteorder'] != sys.byteorder or metadata['itemsize'] != array('i').itemsize:
+        return None
+
+    def ints(location, expected=None):
+        # Slicing past the end of the blob would give a short view, so every
+        # array has to lie inside it and, for a table, fill all its cells
+        start, count = location
+        offset = data_start + start
+        end = offset + count * metadata['itemsize']
+        if start < 0 or count < 0 or end > len(blob) or (expected is not None and count != expected):
+            raise ValueError("Damaged table cache file")
+        return blob[offset:end].cast('i')
+
+    terminal_list = metadata['terminal_list']
+    non_terminal_list = metadata['non_terminal_list']
+    # JSON turns tuple right sides into lists
+    productions = [(left, right if isinstance(right, str) else tuple(right))
+                   for left, right in metadata['productions']]
+
+    tables = {}
+    for name, entry in metadata['tables'].items():
+        table = DenseTable(entry['rows'], entry['columns'],
+                           ints(entry['data'], entry['rows'] * entry['columns']))
+        if 'start' in entry:
+            expansions = ll_expansions(productions, terminal_list, non_terminal_list)
+            tables[name] = DenseLLTable(table, terminal_list, non_terminal_list,
+                                        entry['start'], productions, expansions)
+        else:
+            tables[name] = DenseLRTable(table, terminal_list, non_terminal_list, productions,
+                                        ints(entry['production_left'], len(productions)),
+                                        ints(entry['production_length'], len(productions)),
+                                        GENERATORS[name][0])
+
+    return CachedTables(metadata['valid'], tables)
+
+
+def load_or_build(grammar_data, cache_dir=CACHE_DIR):
+    path = cache_path(grammar_data, cache_dir)
+    cached = read_tables(path)
+
+    if cached is None:
+        compiled = compile_grammar(grammar_data)
+        valid = {}
+        tables = {}
+        for name, (_, is_valid, create_dense_table) in GENERATORS.items():
+            valid[name] = is_valid(compiled)
+            if valid[name]:
+                tables[name] = create_dense_table(compiled)
+
+        try:
+            write_tables(path, valid, tables)
+        except OSError as e:
+            print(f"Warning: could not write the table cache: {e}")
+
+        return CachedTables(valid, tables)
+
+    # Let the quiet parse() functions pick up the cached tables as well
+    dense_tables = compile_grammar(grammar_data).dense_tables
+    for name, dense in cached.tables.items():
+        dense_tables.setdefault(GENERATORS[name][0], dense)
+
+    return cached
@@ -0,0 +1,523 @@
+import argparse
+import heapq
+
+from FIRST_FOLLOW import compute_nullable, strongly_connected_components
+
+# Grammar transformations towards LL(1): removal of useless symbols, of left
+# recursion (direct and indirect) and left factoring. Each one returns a new
+# grammar dict whose productions are tuples of symbol names, so that new
+# non-terminals can be called E', E'' and so on. Every stage that changes the
+# shape of derivations is listed in 'transforms' and can put a tree of its
+# output grammar back into the shape of its input (see restore_tree), and
+# 'origins' maps each non-terminal to the original one it was split from.
+#
+# Trees are nested [symbol, children] lists; children is None for terminals
+
+# Paull's algorithm can blow a grammar up exponentially. A component of the
+# left-corner relation whose substitutions copy more than this many times
+# its original number of productions keeps its left recursion
+GROWTH_LIMIT = 20
+
+
+def productions_of(grammar_data):
+    # Right sides as tuples, () for ε, without repeated alternatives
+    rules = {}
+    for nt, productions in grammar_data['grammar'].items():
+        rights = rules.setdefault(nt, [])
+        for production in productions:
+            right = () if production == 'ε' else tuple(production)
+            if right not in rights:
+                rights.append(right)
+
+    return rules
+
+
+def make_grammar_data(grammar_data, rules, stages=(), origins=None):
+    grammar = {}
+    symbols = set()
+    for nt, productions in rules.items():
+        grammar[nt] = [production if production else 'ε' for production in productions]
+        for production in productions:
+            symbols.update(production if production else ('ε',))
+
+    non_terminals = set(grammar)
+    terminals = symbols - non_terminals
+
+    previous = grammar_data.get('origins', {})
+    if origins is None:
+        origins = {}
+
+    result = {
+        'grammar': grammar,
+        'terminals': terminals,
+        'non_terminals': non_terminals,
+        'transforms': grammar_data.get('transforms', []) + list(stages),
+        'origins': {nt: previous.get(origins.get(nt, nt), origins.get(nt, nt)) for nt in grammar},
+    }
+    if 'tokens' in grammar_data:
+        result['tokens'] = [(name, pattern) for name, pattern in grammar_data['tokens']
+                            if name in terminals]
+
+    return result
+
+
+def fresh_name(base, used):
+    name = base + "'"
+    while name in used:
+        name += "'"
+    used.add(name)
+    return name
+
+
+def witnesses(rules, allow_terminals):
+    # The non-terminals deriving a string of terminals (or, without
+    # allow_terminals, the empty string), each with the production that first
+    # proved it. Counts the unproven non-terminals of every production, as
+    # compute_nullable does, so a witness only uses symbols proven before it
+    pending = []
+    occurrences = {nt: [] for nt in rules}
+    worklist = []
+
+    for nt, productions in rules.items():
+        for production in productions:
+            index = len(pending)
+            count = 0
+            for symbol in production:
+                if symbol in rules:
+                    occurrences[symbol].append(index)
+                    count += 1
+                elif not allow_terminals:
+                    count = -1
+                    break
+
+            pending.append([nt, production, count])
+            if count == 0:
+                worklist.append(index)
+
+    proven = {}
+    while worklist:
+        index = worklist.pop()
+        nt, production, _ = pending[index]
+        if nt in proven:
+            continue
+        proven[nt] = production
+
+        for other in occurrences[nt]:
+            entry = pending[other]
+            if entry[2] <= 0:
+                continue
+            entry[2] -= 1
+            if entry[2] == 0 and entry[0] not in proven:
+                worklist.append(other)
+
+    return proven
+
+
+def useful_rules(rules, start):
+    # Drops productions using non-terminals that derive no terminal string,
+    # then the non-terminals unreachable from the start. The start symbol is
+    # always kept, without productions if its language is empty
+    productive = witnesses(rules, True)
+
+    kept = {}
+    stack = [start]
+    while stack:
+        nt = stack.pop()
+        kept[nt] = [production for production in rules[nt]
+                    if all(symbol in productive or symbol not in rules for symbol in production)]
+        for production in kept[nt]:
+            for symbol in production:
+                if symbol in rules and symbol not in kept:
+                    kept[symbol] = None
+                    stack.append(symbol)
+
+    return {nt: kept[nt] for nt in rules if nt in kept}
+
+
+def remove_useless_symbols(grammar_data):
+    rules = productions_of(grammar_data)
+    start = next(iter(rules))
+    return make_grammar_data(grammar_data, useful_rules(rules, start))
+
+
+def left_corners(rules, nullable):
+    # A -> B when some production A -> αBβ has a nullable α. hidden holds the
+    # edges that skip a nullable prefix
+    corners = {nt: set() for nt in rules}
+    hidden = set()
+
+    for nt, productions in rules.items():
+        for production in productions:
+            for position, symbol in enumerate(production):
+                if symbol not in rules:
+                    break
+                corners[nt].add(symbol)
+                if position:
+                    hidden.add((nt, symbol))
+                if symbol not in nullable:
+                    break
+
+    return corners, hidden
+
+
+def left_recursive_components(rules, corners):
+    # Members in grammar order, which is the order Paull's algorithm uses
+    order = {nt: i for i, nt in enumerate(rules)}
+    components = []
+    for component in strongly_connected_components(list(rules), corners):
+        if len(component) > 1 or component[0] in corners[component[0]]:
+            components.append(sorted(component, key=order.get))
+
+    return components
+
+
+class EpsilonRemoval:
+    # marks[(A, right)] = (original right, positions of the nullable symbols
+    # that were left out). new_start is (S', S) when the start symbol was
+    # nullable and S' -> S | ε took its place
+    def __init__(self, marks, empty, new_start):
+        self.marks = marks
+        self.empty = empty
+        self.new_start = new_start
+
+    def empty_tree(self, nt):
+        return [nt, [self.empty_tree(symbol) for symbol in self.empty[nt]]]
+
+    def restore(self, node):
+        symbol, children = node
+        if self.new_start and symbol == self.new_start[0]:
+            return children[0] if children else self.empty_tree(self.new_start[1])
+
+        mark = self.marks.get((symbol, tuple(child[0] for child in children)))
+        if mark is None:
+            return node
+
+        right, dropped = mark
+        restored = iter(children)
+        dropped = set(dropped)
+        return [symbol, [self.empty_tree(right[i]) if i in dropped else next(restored)
+                         for i in range(len(right))]]
+
+
+def remove_epsilon_productions(rules, start, used):
+    nullable = compute_nullable({'grammar': rules, 'non_terminals': set(rules)})
+    empty = witnesses(rules, False)
+
+    marks = {}
+    new_rules = {}
+    for nt, productions in rules.items():
+        rights = []
+        for production in productions:
+            positions = [i for i, symbol in enumerate(production) if symbol in nullable]
+            # Every way of leaving out some of the nullable symbols, keeping
+            # the production itself first
+            for choice in range(1 << len(positions)):
+                dropped = [position for bit, position in enumerate(positions) if choice >> bit & 1]
+                right = tuple(symbol for i, symbol in enumerate(production) if i not in dropped)
+                if not right or right == (nt,) or right in rights:
+                    continue
+                rights.append(right)
+                if dropped:
+                    marks[(nt, right)] = (production, dropped)
+        new_rules[nt] = rights
+
+    new_start = None
+    if start in nullable:
+        new_start = (fresh_name(start, used), start)
+        new_rules = {new_start[0]: [(start,), ()], **new_rules}
+
+    return new_rules, EpsilonRemoval(marks, empty, new_start)
+
+
+class LeftRecursionRemoval:
+    # tails[A'] = A for every A -> β A', A' -> α A' | ε that replaced
+    # A -> A α | β, groups[A'] = A for every A -> A' that took the place of
+    # several alternatives A -> β, and marks[(A, δγ)] = (B, len(δ), Bγ) for
+    # every production made by substituting B -> δ into A -> Bγ
+    def __init__(self, marks, tails, groups):
+        self.marks = marks
+        self.tails = tails
+        self.groups = groups
+
+    def regroup(self, node):
+        symbol, children = node
+        while True:
+            mark = self.marks.get((symbol, tuple(child[0] for child in children)))
+            if mark is None:
+                break
+            inner, length, _ = mark
+            children = [self.restore([inner, children[:length]])] + children[length:]
+
+        if len(children) == 1 and self.groups.get(children[0][0]) == symbol:
+            return [symbol, children[0][1]]
+        return [symbol, children]
+
+    def restore(self, node):
+        symbol, children = node
+        if not children or self.tails.get(children[-1][0]) != symbol:
+            return self.regroup(node)
+
+        # A(β, A'(α1, A'(α2, A'()))) becomes A(A(A(β), α1), α2)
+        tree = self.regroup([symbol, children[:-1]])
+        tail = children[-1][1]
+        while tail:
+            tree = self.regroup([symbol, [tree] + tail[:-1]])
+            tail = tail[-1][1]
+
+        return tree
+
+
+def remove_component_recursion(rules, component, used):
+    # Paull's algorithm on one strongly connected component of the
+    # left-corner relation, members taken in grammar order: productions of a
+    # member starting with an earlier one get that one's alternatives
+    # substituted, then its direct left recursion is removed. Returns the new
+    # productions with their LeftRecursionRemoval entries, or None once the
+    # substitutions have copied more than GROWTH_LIMIT times the component's
+    # productions
+    members = {(nt,) for nt in component}
+    position = {nt: i for i, nt in enumerate(component)}
+    limit = GROWTH_LIMIT * sum(len(rules[nt]) for nt in component)
+    copied = 0
+
+    new_rules = {}
+    marks = {}
+    tails = {}
+    groups = {}
+    for i, nt in enumerate(component):
+        productions = rules[nt]
+
+        # Alternatives that cannot lead back into the component are put under
+        # one non-terminal, so each later substitution copies one of them
+        plain = [production for production in productions if production[:1] not in members]
+        if len(plain) > 1 and i < len(component) - 1:
+            group = fresh_name(nt, used)
+            groups[group] = nt
+            new_rules[group] = plain
+            productions = [(group,)] + [production for production in productions
+                                        if production[:1] in members]
+
+        # Substitute the earlier members leading a production, lowest first:
+        # their own alternatives only start with later ones
+        waiting = [position[production[0]] for production in productions
+                   if production[:1] in members and position[production[0]] < i]
+        heapq.heapify(waiting)
+        done = -1
+        while waiting:
+            j = heapq.heappop(waiting)
+            if j <= done:
+                continue
+            done = j
+            inner = component[j]
+
+            substituted = []
+            seen = set()
+            for production in productions:
+                if production[:1] != (inner,):
+                    rights = [(production, None)]
+                else:
+                    rights = [(expansion + production[1:], expansion) for expansion in new_rules[inner]]
+                for right, expansion in rights:
+                    if right in seen:
+                        continue
+                    seen.add(right)
+                    substituted.append(right)
+                    if expansion is None:
+                        continue
+                    marks[(nt, right)] = (inner, len(expansion), production)
+                    if right[:1] in members and j < position[right[0]] < i:
+                        heapq.heappush(waiting, position[right[0]])
+            productions = substituted
+            copied += len(productions)
+            if copied > limit:
+                return None
+
+        recursive = [production[1:] for production in productions
+                     if production[:1] == (nt,) and len(production) > 1]
+        if not recursive:
+            new_rules[nt] = [production for production in productions if production != (nt,)]
+            continue
+
+        tail = fresh_name(nt, used)
+        tails[tail] = nt
+        new_rules[nt] = [production + (tail,) for production in productions
+                         if production[:1] != (nt,)]
+        new_rules[tail] = [production + (tail,) for production in recursive] + [()]
+
+    return new_rules, marks, tails, groups
+
+
+def eliminate_left_recursion(grammar_data):
+    rules = productions_of(grammar_data)
+    start = next(iter(rules))
+    rules = useful_rules(rules, start)
+    used = set(rules) | grammar_data['terminals']
+
+    nullable = compute_nullable({'grammar': rules, 'non_terminals': set(rules)})
+    corners, hidden = left_corners(rules, nullable)
+    components = left_recursive_components(rules, corners)
+    if not components:
+        return make_grammar_data(grammar_data, rules)
+
+    stages = []
+    origins = {}
+
+    # Recursion hidden behind a nullable prefix, or through a nullable
+    # non-terminal, only shows up once the ε-productions are gone
+    member = {nt: i for i, component in enumerate(components) for nt in component}
+    if (any(nt in nullable for nt in member)
+            or any(member.get(nt, -1) == member.get(symbol, -2) for nt, symbol in hidden)):
+        rules, removal = remove_epsilon_productions(rules, start, used)
+        if removal.new_start:
+            start = removal.new_start[0]
+            origins[start] = removal.new_start[1]
+        rules = useful_rules(rules, start)
+        stages.append(removal)
+        corners, _ = left_corners(rules, set())
+        components = left_recursive_components(rules, corners)
+
+    # The rest of the grammar has no left recursion and is left as it is
+    removal = LeftRecursionRemoval({}, {}, {})
+    for component in components:
+        result = remove_component_recursion(rules, component, used)
+        if result is None:
+            continue
+        new_rules, marks, tails, groups = result
+        removal.marks.update(marks)
+        removal.tails.update(tails)
+        removal.groups.update(groups)
+        for nt in new_rules:
+            origins[nt] = tails.get(nt) or groups.get(nt) or nt
+        rules.update(new_rules)
+
+    stages.append(removal)
+    return make_grammar_data(grammar_data, useful_rules(rules, start), stages, origins)
+
+
+class LeftFactoring:
+    # factored holds the non-terminals A' of every A -> α A', A' -> β1 | β2
+    # that replaced A -> α β1 | α β2
+    def __init__(self, factored):
+        self.factored = factored
+
+    def restore(self, node):
+        symbol, children = node
+        if children and children[-1][0] in self.factored:
+            return [symbol, children[:-1] + children[-1][1]]
+        return node
+
+
+def common_prefix(productions):
+    first = min(productions)
+    last = max(productions)
+    length = 0
+    while length < len(first) and first[length] == last[length]:
+        length += 1
+    return first[:length]
+
+
+def left_factor(grammar_data):
+    rules = productions_of(grammar_data)
+    used = set(rules) | grammar_data['terminals']
+    factored = set()
+    origins = {}
+
+    work = list(rules)
+    while work:
+        nt = work.pop()
+        groups = {}
+        for production in rules[nt]:
+            groups.setdefault(production[:1], []).append(production)
+        if all(len(group) == 1 for group in groups.values()):
+            continue
+
+        productions = []
+        for group in groups.values():
+            if len(group) == 1:
+                productions.extend(group)
+                continue
+            prefix = common_prefix(group)
+            name = fresh_name(nt, used)
+            factored.add(name)
+            origins[name] = origins.get(nt, nt)
+            rules[name] = [production[len(prefix):] for production in group]
+            productions.append(prefix + (name,))
+            work.append(name)
+        rules[nt] = productions
+
+    stages = [LeftFactoring(factored)] if factored else []
+    return make_grammar_data(grammar_data, rules, stages, origins)
+
+
+def transform_grammar(grammar_data):
+    return left_factor(eliminate_left_recursion(grammar_data))
+
+
+def restore_tree(grammar_data, tree):
+    # Undoes the stages of a transformed grammar, last first, on a tree of
+    # its derivation. Nodes are rebuilt bottom-up without recursion, so
+    # the long right-recursive chains made from left recursion are safe
+    for stage in reversed(grammar_data.get('transforms', [])):
+        holder = [tree]
+        order = [(holder, 0)]
+        for siblings, index in order:
+            children = siblings[index][1]
+            if children:
+                order.extend((children, i) for i in range(len(children)))
+
+        for siblings, index in reversed(order):
+            if siblings[index][1] is not None:
+                siblings[index] = stage.restore(siblings[index])
+        tree = holder[0]
+
+    return tree
+
+
+def nested_tree(syntax_tree, node=None):
+    # A SyntaxTree as nested [symbol, children] lists
+    if node is None:
+        node = syntax_tree.root
+
+    root = [syntax_tree.name(node), None if syntax_tree.is_leaf(node) else []]
+    stack = [(node, root)]
+    while stack:
+        node, nested = stack.pop()
+        for child in syntax_tree.children(node):
+            entry = [syntax_tree.name(child), None if syntax_tree.is_leaf(child) else []]
+            nested[1].append(entry)
+            if entry[1] is not None:
+                stack.append((child, entry))
+
+    return root
+
+
+def main(argv=None):
+    import main as menu
+    import LL1_PARSER as ll1
+
+    parser = argparse.ArgumentParser(
+        description="Remove left recursion and left-factor a grammar from grammars.txt.")
+    parser.add_argument("grammar", type=int, help="grammar number, as listed by main.py")
+    args = parser.parse_args(argv)
+
+    menu.read_grammars()
+    if not 1 <= args.grammar <= len(menu.grammars):
+        parser.error(f"grammar must be between 1 and {len(menu.grammars)}")
+
+    transformed = transform_grammar(menu.grammars[args.grammar - 1])
+    for line in menu.format_grammar_for_display(transformed['grammar']):
+        print(line)
+    print()
+
+    conflicts = ll1.ll1_conflicts(transformed)
+    if not conflicts:
+        print("The transformed grammar is LL(1).")
+        return
+
+    print("The transformed grammar is not LL(1):")
+    for conflict in conflicts:
+        print(f"  {conflict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
+from COMPILED_GRAMMAR import format_production
+import DIAGNOSTICS as diagnostics
+import EARLEY_PARSER as earley
+import GLR_PARSER as glr
+import LALR1_PARSER as lalr1
+from LEXER import LexerError, tokenize
 import LL1_PARSER as ll1
+import LR1_PARSER as lr1
 import SLR1_PARSER as slr1
+import TABLE_CACHE as table_cache
 grammars = []
 
 
@@ -14,7 +22,11 @@ def read_grammars():
             line_index = 1
 
             for g in range(num_grammars):
-                num_productions = int(lines[line_index])
+                # "N tokens" marks a grammar whose symbols are space-separated
+                # names and whose alternatives are separated by '|'
+                header = lines[line_index].split()
+                num_productions = int(header[0])
+                tokenized = header[1:] == ['tokens']
                 line_index += 1
 
                 grammar = {}
@@ -30,25 +42,41 @@ def read_grammars():
                     left = left.strip()
                     non_terminals.add(left)
 
-                    productions = right.strip().split()
+                    if tokenized:
+                        productions = [tuple(alternative.split()) for alternative in right.split('|')]
+                        productions = ['ε' if prod == ('/eps',) else prod for prod in productions]
+                    else:
+                        productions = right.strip().split()
+                        productions = [prod.replace("/eps", "ε") for prod in productions]
+
                     if left not in grammar:
                         non_terminals.add(left)
                         grammar[left] = []
 
-                    productions = [prod.replace("/eps", "ε") for prod in productions]
                     grammar[left].extend(productions)
 
                     for prod in productions:
                         for symbol in prod:
                             symbols.add(symbol)
 
+                # "%token name regex" lines give the pattern of a token;
+                # tokens without one match their own spelling
+                token_definitions = []
+                while line_index < len(lines) and lines[line_index].startswith('%token'):
+                    _, name, pattern = lines[line_index].split(None, 2)
+                    token_definitions.append((name, pattern))
+                    line_index += 1
+
                 terminals = symbols - non_terminals
 
-                grammars.append({
+                grammar_data = {
                     'grammar': grammar,
                     'terminals': terminals,
                     'non_terminals': non_terminals
-                })
+                }
+                if tokenized:
+                    grammar_data['tokens'] = token_definitions
+                grammars.append(grammar_data)
 
     except FileNotFoundError:
         print(f"Error: The file 'grammars.txt' was not found.")
@@ -59,7 +87,7 @@ def format_grammar_for_display(grammar):
     formatted_lines = []
 
     for nt, productions in grammar.items():
-        line = f"{nt} -> {' | '.join(productions)}"
+        line = f"{nt} -> {' | '.join(format_production(prod) for prod in productions)}"
         formatted_lines.append(line)
 
     return formatted_lines
@@ -83,8 +111,10 @@ def print_grammars():
             if choice == 0:
                 break
             elif 1 <= choice <= len(grammars):
-                is_grammar_ll1 = ll1.is_ll1(grammars[choice - 1])
-                is_grammar_slr1 = slr1.is_slr1(grammars[choice - 1])
+                # Grammar classes come from the on-disk table cache when possible
+                tables = table_cache.load_or_build(grammars[choice - 1])
+                is_grammar_ll1 = tables.valid["LL(1)"]
+                is_grammar_slr1 = tables.valid["SLR(1)"]
 
                 if is_grammar_ll1 and is_grammar_slr1:
                     while True:
@@ -112,9 +142,26 @@ def print_grammars():
                     print("Grammar is SLR(1).")
                     slr1.print_slr_table(grammars[choice - 1])
                     parse_strings(grammars[choice - 1], slr1.print_reduction)
+
+                elif tables.valid["LALR(1)"]:
+
+                    print("Grammar is LALR(1).")
+                    lalr1.print_lalr_table(grammars[choice - 1])
+                    parse_strings(grammars[choice - 1], lalr1.print_reduction)
+
+                elif tables.valid["LR(1)"]:
+
+                    print("Grammar is LR(1).")
+                    lr1.print_lr1_table(grammars[choice - 1])
+                    parse_strings(grammars[choice - 1], lr1.print_reduction)
                 else:
 
-                    print("Grammar is neither LL(1) nor SLR(1).")
+                    print("Grammar is neither LL(1) nor LR(1).")
+                    diagnostics.print_conflicts(grammars[choice - 1], 'R')
+
+                    # Conflicting actions are all followed by the GLR parser
+                    print("\nParsing with GLR over the SLR(1) automaton instead.")
+                    parse_strings(grammars[choice - 1], glr.print_parse)
 
                 break
             else:
@@ -135,6 +182,14 @@ def parse_strings(grammar_data, parse_function):
             if input_string == "/eps":
                 input_string = ""
 
+            if 'tokens' in grammar_data:
+                try:
+                    input_string = tokenize(grammar_data, input_string)
+                except LexerError as e:
+                    print(e)
+                    print("no")
+                    continue
+
             if parse_function(grammar_data, input_string):
                 print("yes")
             else:
@@ -206,6 +261,12 @@ def add_grammar():
 
     except Exception as e:
         print(f"An error occurred while updating the file: {e}")
+        return
+
+    # The Earley parser needs no table, so strings can be tried right away
+    answer = input("Try strings on it with the Earley parser? (y/n): ").strip().lower()
+    if answer == 'y':
+        parse_strings(grammars[-1], earley.print_parse)
 
 def menu():
     while True:
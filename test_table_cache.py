@@ -0,0 +1,45 @@
+import os
+
+import BATCH_PARSER as batch
+import SLR1_PARSER as slr1
+import TABLE_CACHE as table_cache
+
+GRAMMAR = {
+    'grammar': {'E': ['E+T', 'T'], 'T': ['T*F', 'F'], 'F': ['(E)', 'i']},
+    'terminals': {'+', '*', '(', ')', 'i'},
+    'non_terminals': {'E', 'T', 'F'},
+}
+
+
+def fresh():
+    return {key: value for key, value in GRAMMAR.items()}
+
+
+def cached_file(tmp_path):
+    table_cache.load_or_build(fresh(), str(tmp_path))
+    path = table_cache.cache_path(GRAMMAR, str(tmp_path))
+    with open(path, 'rb') as file:
+        return path, file.read()
+
+
+def test_truncated_file_is_a_miss(tmp_path):
+    path, contents = cached_file(tmp_path)
+
+    for size in (table_cache.HEADER.size + 5, len(contents) // 2, len(contents) - 1):
+        with open(path, 'wb') as file:
+            file.write(contents[:size])
+        assert table_cache.read_tables(path) is None
+
+        grammar_data = fresh()
+        table_cache.load_or_build(grammar_data, str(tmp_path))
+        assert slr1.parse(grammar_data, "i+i*(i)")
+        assert os.path.getsize(path) == len(contents)
+
+
+def test_worker_rebuilds_a_damaged_table(tmp_path):
+    path, contents = cached_file(tmp_path)
+    with open(path, 'wb') as file:
+        file.write(contents[:len(contents) // 2])
+
+    batch.init_worker((path, fresh()), 'B')
+    assert batch.validate_chunk(["i+i*(i)", "i+"]) == [True, False]